@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput of N concurrent sessions with one Mediapipe graph each (HandProcessor)
+compared with the batched backend (BatchedHandProcessor), where the landmark network
+runs on the hand crops of all sessions at once and palm detection only on lost hands.
+Every session runs on its own thread and takes its turn from an InferenceScheduler, as
+in-process sessions do: SCHEDULER_CONCURRENCY frames at once for the Mediapipe graphs,
+and as many as a batch holds for the batched backend (inference_concurrency), or
+--concurrency for both.
+
+Also reports the mean batch size reached, the palm detection rate and how far the
+batched landmarks are from Mediapipe's.
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_batched_landmarks [--archive data] [--video clip.mp4] [--sessions 1 4 8 16]
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from constants import (ARCHIVE_DIR, HAND_BATCH_MAX_DELAY_MS, HAND_BATCH_MAX_SIZE, HAND_BATCH_MODEL,
+                       HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE, SCHEDULER_CONCURRENCY)
+from mediapipe_helpers.batched_landmarks import BatchedHandProcessor
+from mediapipe_helpers.hand_processor import HandProcessor
+from mediapipe_helpers.utils import calc_landmark_list
+from model import BatchingClassifier, HandLandmarkModel
+from model.hand_landmark.hand_landmark_model import mediapipe_model_path
+from server_scheduler import InferenceScheduler
+from benchmarks.bench_tracker_affinity import concurrent_streams
+from benchmarks.recordings import load_sessions
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="Archive folder with one folder per session", default=ARCHIVE_DIR)
+    parser.add_argument("--video", help="Video file to use instead of the archive", default=None)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Frames processed at once, instead of the servers' defaults")
+    return parser.parse_args()
+
+
+def run(streams, processors, concurrency):
+    """
+    Processes every stream on its own thread, concurrency frames at a time. Returns the
+    landmarks per stream and frame, and the wall clock seconds.
+    """
+    landmarks = [[] for _ in streams]
+    scheduler = InferenceScheduler(concurrency)
+
+    def session(index):
+        for frame in streams[index]:
+            scheduler.acquire(index).result()
+            try:
+                results = processors[index].process(frame, is_rgb=True)
+            finally:
+                scheduler.release()
+            landmarks[index].append(calc_landmark_list(frame, results.multi_hand_landmarks[0])
+                                    if results.multi_hand_landmarks else None)
+
+    threads = [threading.Thread(target=session, args=(index,)) for index in range(len(streams))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return landmarks, time.perf_counter() - start
+
+
+def distance(reference, landmarks):
+    # Mean landmark distance in pixels over frames where both found a hand
+    distances = [np.linalg.norm(np.subtract(a, b), axis=1).mean()
+                 for stream_a, stream_b in zip(reference, landmarks)
+                 for a, b in zip(stream_a, stream_b) if a is not None and b is not None]
+    return float(np.mean(distances)) if distances else float("nan")
+
+
+def main():
+    args = get_args()
+    recordings = load_sessions(args.archive, args.video, max_frames=args.max_frames)
+    if not recordings:
+        print("No recorded sessions found")
+        return
+
+    graph_concurrency = args.concurrency or SCHEDULER_CONCURRENCY
+    batched_concurrency = args.concurrency or max(SCHEDULER_CONCURRENCY, HAND_BATCH_MAX_SIZE)
+    print(f"Frames at once: {graph_concurrency} with graphs, {batched_concurrency} batched")
+    print(f"{'sessions':>8}{'graphs fps':>12}{'batched fps':>13}{'mean batch':>12}{'det. rate':>11}{'px':>8}")
+    for count in args.sessions:
+        streams = concurrent_streams(recordings, count)
+        frames = sum(len(frames) for frames in streams)
+
+        graphs = [HandProcessor(HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE)
+                  for _ in streams]
+        reference, graph_seconds = run(streams, graphs, graph_concurrency)
+
+        # A fresh batching model per run so its batch size statistics are this run's only
+        landmark_model = BatchingClassifier(HandLandmarkModel(mediapipe_model_path(HAND_BATCH_MODEL)),
+                                            HAND_BATCH_MAX_DELAY_MS, HAND_BATCH_MAX_SIZE)
+        batched = [BatchedHandProcessor(landmark_model,
+                                        HandProcessor(HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE,
+                                                      static_image_mode=True),
+                                        HAND_MIN_TRACKING_CONFIDENCE)
+                   for _ in streams]
+        landmarks, batched_seconds = run(streams, batched, batched_concurrency)
+
+        detections = sum(processor.detections for processor in batched)
+        print(f"{count:>8}{frames / graph_seconds:>12.1f}{frames / batched_seconds:>13.1f}"
+              f"{landmark_model.stats()['mean_batch_size']:>12.2f}{detections / frames:>10.1%}"
+              f"{distance(reference, landmarks):>8.2f}")
+
+        for processor in graphs + batched:
+            processor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the per-frame wire size and server-side decode cost of the raw BGR
+path against NV21, JPEG and WebP payloads.
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_frame_decode [--image data/frame.png] [--iterations 500]
+"""
+import argparse
+import base64
+import time
+
+import cv2
+import numpy as np
+
+from constants import WIDTH, HEIGHT
+from server_image_conversion import decode_base64, decode_frame
+from server_protocol import PIXEL_FORMAT_BGR, PIXEL_FORMAT_JPEG, PIXEL_FORMAT_NV21, PIXEL_FORMAT_WEBP
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", help="BGR image to encode (default: synthetic frame)", default=None)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--qualities", type=int, nargs="+", default=[50, 75, 90])
+    return parser.parse_args()
+
+
+def load_frame(image_path):
+    if image_path is None:
+        # Smooth gradient plus noise, roughly as compressible as a camera frame
+        ys, xs = np.mgrid[0:HEIGHT, 0:WIDTH]
+        frame = np.dstack([xs % 256, ys * 255 // HEIGHT, (xs + ys) % 256]).astype(np.uint8)
+        noise = np.random.default_rng(0).integers(0, 16, frame.shape, dtype=np.uint8)
+        return cv2.add(frame, noise)
+    frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    return cv2.resize(frame, (WIDTH, HEIGHT))
+
+
+def to_nv21(frame):
+    # I420 keeps U and V in separate planes; NV21 interleaves them as VU
+    i420 = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420).ravel()
+    y_size = WIDTH * HEIGHT
+    u = i420[y_size:y_size * 5 // 4]
+    v = i420[y_size * 5 // 4:]
+    return np.concatenate([i420[:y_size], np.dstack([v, u]).ravel()]).tobytes()
+
+
+def time_decode(decode, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode()
+    return (time.perf_counter() - start) * 1000.0 / iterations
+
+
+def main():
+    args = get_args()
+    frame = load_frame(args.image)
+    raw = frame.tobytes()
+    text = base64.b64encode(raw).decode("ascii")
+    nv21 = to_nv21(frame)
+
+    rows = [
+        ("base64 bgr", len(text),
+         time_decode(lambda: decode_frame(decode_base64(text), PIXEL_FORMAT_BGR, WIDTH, HEIGHT), args.iterations)),
+        ("binary bgr", len(raw),
+         time_decode(lambda: decode_frame(raw, PIXEL_FORMAT_BGR, WIDTH, HEIGHT), args.iterations)),
+        ("binary nv21", len(nv21),
+         time_decode(lambda: decode_frame(nv21, PIXEL_FORMAT_NV21, WIDTH, HEIGHT), args.iterations)),
+    ]
+
+    for quality in args.qualities:
+        for name, pixel_format, ext, flag in (
+                ("jpeg", PIXEL_FORMAT_JPEG, ".jpg", cv2.IMWRITE_JPEG_QUALITY),
+                ("webp", PIXEL_FORMAT_WEBP, ".webp", cv2.IMWRITE_WEBP_QUALITY)):
+            ok, encoded = cv2.imencode(ext, frame, [flag, quality])
+            if not ok:
+                print(f"Skipping {name}: encoder not available")
+                continue
+            payload = encoded.tobytes()
+            decode_ms = time_decode(lambda: decode_frame(payload, pixel_format, WIDTH, HEIGHT), args.iterations)
+            rows.append((f"{name} q{quality}", len(payload), decode_ms))
+
+    print(f"{'payload':<14}{'bytes/frame':>12}{'vs raw':>9}{'decode ms':>11}")
+    for name, size, decode_ms in rows:
+        print(f"{name:<14}{size:>12}{len(raw) / size:>8.1f}x{decode_ms:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the hand landmark backends on recorded sessions: the legacy
+mp.solutions.hands graph (HandProcessor) and the MediaPipe Tasks HandLandmarker in
+VIDEO and LIVE_STREAM mode (HandLandmarkerProcessor).
+
+For each backend it reports the time a process() call blocks the caller, how often
+a hand was found, palm detections per frame, and how far its landmarks are from the
+legacy ones on frames where both found a hand. LIVE_STREAM results belong to an
+earlier frame, so its distance also shows what the lag costs.
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_hand_backends [--archive data] [--video clip.mp4] [--model path]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from constants import ARCHIVE_DIR, HAND_LANDMARKER_MODEL
+from mediapipe_helpers.hand_landmarker import LIVE_STREAM, VIDEO, HandLandmarkerProcessor
+from mediapipe_helpers.hand_processor import HandProcessor
+from mediapipe_helpers.utils import calc_landmark_list
+from benchmarks.recordings import load_sessions
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="Archive folder with one folder per session", default=ARCHIVE_DIR)
+    parser.add_argument("--video", help="Video file to use instead of the archive", default=None)
+    parser.add_argument("--model", help="hand_landmarker.task model bundle", default=HAND_LANDMARKER_MODEL)
+    parser.add_argument("--max-sessions", type=int, default=None)
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=30.0,
+                        help="Frame rate LIVE_STREAM frames are fed at, as a phone would send them")
+    return parser.parse_args()
+
+
+def landmarks_of(frame, results):
+    if not results.multi_hand_landmarks:
+        return None
+    return calc_landmark_list(frame, results.multi_hand_landmarks[0])
+
+
+def run(recordings, create, interval_s=0.0):
+    """
+    Returns the landmarks per frame of every recording and the per-call timings.
+    """
+    landmarks = []
+    timings = []
+    detections = 0
+    for frames in recordings:
+        processor = create()  # A fresh instance per recording, like one per session
+        session_landmarks = []
+        for frame in frames:
+            start = time.perf_counter()
+            results = processor.process(frame, is_rgb=True)
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            session_landmarks.append(landmarks_of(frame, results))
+            if interval_s > elapsed:
+                time.sleep(interval_s - elapsed)
+        detections += processor.detections
+        landmarks.append(session_landmarks)
+        processor.close()
+    return landmarks, np.array(timings) * 1000, detections
+
+
+def distance(reference, landmarks):
+    # Mean landmark distance in pixels over frames where both found a hand
+    distances = [np.linalg.norm(np.subtract(a, b), axis=1).mean()
+                 for session_a, session_b in zip(reference, landmarks)
+                 for a, b in zip(session_a, session_b) if a is not None and b is not None]
+    return float(np.mean(distances)) if distances else float("nan")
+
+
+def main():
+    args = get_args()
+    recordings = load_sessions(args.archive, args.video, args.max_sessions, args.max_frames)
+    if not recordings:
+        print("No recorded sessions found")
+        return
+    frames = sum(len(session) for session in recordings)
+
+    backends = [
+        ("solutions", lambda: HandProcessor(), 0.0),
+        ("tasks video", lambda: HandLandmarkerProcessor(args.model, VIDEO), 0.0),
+        ("tasks live_stream", lambda: HandLandmarkerProcessor(args.model, LIVE_STREAM), 1.0 / args.fps),
+    ]
+
+    reference = None
+    print(f"{'backend':>18}{'ms/call':>9}{'p95':>8}{'found':>8}{'det./frame':>12}{'px vs solutions':>17}")
+    for name, create, interval_s in backends:
+        landmarks, timings_ms, detections = run(recordings, create, interval_s)
+        if reference is None:
+            reference = landmarks
+        found = sum(hand is not None for session in landmarks for hand in session) / frames
+        print(f"{name:>18}{timings_ms.mean():>9.2f}{np.percentile(timings_ms, 95):>8.2f}"
+              f"{found:>8.1%}{detections / frames:>12.3f}{distance(reference, landmarks):>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Connect-to-first-result latency with and without the HandProcessorPool. Every
+simulated connection gets a hand processor, runs its first frame and disconnects;
+reported are the time until that first result and how long the disconnect blocks
+the caller (which, in the asyncio server, is the event loop).
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_hand_pool [--archive data] [--video clip.mp4] [--connections 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from constants import ARCHIVE_DIR
+from mediapipe_helpers.hand_processor import create_hand_processor
+from mediapipe_helpers.hand_processor_pool import create_hand_processor_pool
+from benchmarks.recordings import load_sessions
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="Archive folder with one folder per session", default=ARCHIVE_DIR)
+    parser.add_argument("--video", help="Video file to use instead of the archive", default=None)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--gap-s", type=float, default=0.2,
+                        help="Time between connections, for the pool to reset and top up")
+    return parser.parse_args()
+
+
+def connect(acquire, release, frame, connections, gap_s):
+    first_result_ms, disconnect_ms = [], []
+    for _ in range(connections):
+        start = time.perf_counter()
+        processor = acquire()
+        processor.process(frame, is_rgb=True)
+        first_result_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        release(processor)
+        disconnect_ms.append((time.perf_counter() - start) * 1000)
+        time.sleep(gap_s)
+    return np.array(first_result_ms), np.array(disconnect_ms)
+
+
+def report(name, first_result_ms, disconnect_ms):
+    print(f"{name:>10}{np.median(first_result_ms):>10.1f}{np.percentile(first_result_ms, 95):>9.1f}"
+          f"{np.max(first_result_ms):>9.1f}{np.median(disconnect_ms):>13.2f}{np.max(disconnect_ms):>9.2f}")
+
+
+def main():
+    args = get_args()
+    recordings = load_sessions(args.archive, args.video, max_sessions=1, max_frames=1)
+    if not recordings:
+        print("No recorded sessions found")
+        return
+    frame = recordings[0][0]
+
+    print(f"{'':>10}{'first ms':>10}{'p95':>9}{'max':>9}{'release ms':>13}{'max':>9}")
+    report("cold", *connect(create_hand_processor, lambda processor: processor.close(),
+                            frame, args.connections, args.gap_s))
+
+    pool = create_hand_processor_pool()
+    time.sleep(2.0)  # Let the pool warm up, as the server does at start-up
+    report("pooled", *connect(pool.acquire, lambda lease: lease.release(),
+                              frame, args.connections, args.gap_s))
+    print(pool.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Accuracy versus keyframe interval of the optical flow keyframe mode. Every recorded
+session is run once with Mediapipe on every frame (the reference) and once per
+interval N; reported are the mean landmark distance to the reference, how often
+the hand sign agrees with it, and the processing time per frame.
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_landmark_flow [--archive data] [--video clip.mp4] [--intervals 2 3 5 8]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from constants import ARCHIVE_DIR, LANDMARK_FLOW_MAX_FB_ERROR, LANDMARK_FLOW_MIN_CONFIDENCE
+from main import GesturePipeline
+from mediapipe_helpers.landmark_flow import LandmarkFlowTracker
+from benchmarks.recordings import load_sessions
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="Archive folder with one folder per session", default=ARCHIVE_DIR)
+    parser.add_argument("--video", help="Video file to use instead of the archive", default=None)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[2, 3, 5, 8])
+    parser.add_argument("--max-sessions", type=int, default=10)
+    parser.add_argument("--max-frames", type=int, default=600)
+    return parser.parse_args()
+
+
+def run(frames, keyframe_interval=None):
+    """
+    Returns per-frame (hand_sign, landmarks), the seconds spent and the tracker stats.
+    """
+    tracker = None
+    if keyframe_interval is not None:
+        tracker = LandmarkFlowTracker(keyframe_interval, LANDMARK_FLOW_MIN_CONFIDENCE,
+                                      LANDMARK_FLOW_MAX_FB_ERROR)
+    pipeline = GesturePipeline(landmark_tracker=tracker)
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        result = pipeline.process_image(frame, is_rgb=True)
+        outputs.append((result["hand_sign"], pipeline.last_landmarks))
+    return outputs, time.perf_counter() - start, tracker.stats() if tracker is not None else None
+
+
+def compare(reference, outputs):
+    """
+    Returns the mean landmark distance in pixels over frames where both found a hand,
+    and the fraction of frames with the same hand sign.
+    """
+    distances = []
+    agree = 0
+    for (ref_sign, ref_landmarks), (sign, landmarks) in zip(reference, outputs):
+        agree += ref_sign == sign
+        if ref_landmarks is not None and landmarks is not None:
+            difference = np.asarray(ref_landmarks, dtype=float) - np.asarray(landmarks, dtype=float)
+            distances.append(np.linalg.norm(difference, axis=1).mean())
+    mean_distance = float(np.mean(distances)) if distances else float("nan")
+    return mean_distance, agree / max(1, len(reference))
+
+
+def main():
+    args = get_args()
+    sessions = load_sessions(args.archive, args.video, args.max_sessions, args.max_frames)
+    if not sessions:
+        print("No recorded sessions found")
+        return
+    frame_count = sum(len(frames) for frames in sessions)
+    print(f"{len(sessions)} sessions, {frame_count} frames")
+
+    references = []
+    reference_seconds = 0.0
+    for frames in sessions:
+        outputs, seconds, _ = run(frames)
+        references.append(outputs)
+        reference_seconds += seconds
+
+    print(f"{'N':>3}{'landmark px':>13}{'sign agree':>12}{'ms/frame':>10}{'tracked':>9}")
+    print(f"{1:>3}{0.0:>13.2f}{1.0:>11.1%}{reference_seconds * 1000 / frame_count:>10.2f}{0.0:>8.1%}")
+    for interval in args.intervals:
+        distances, agreements, seconds, tracked = [], [], 0.0, 0
+        for frames, reference in zip(sessions, references):
+            outputs, run_seconds, stats = run(frames, interval)
+            distance, agreement = compare(reference, outputs)
+            if not np.isnan(distance):
+                distances.append(distance)
+            agreements.append(agreement * len(frames))
+            seconds += run_seconds
+            tracked += stats["tracked"]
+        mean_distance = float(np.mean(distances)) if distances else float("nan")
+        print(f"{interval:>3}{mean_distance:>13.2f}{sum(agreements) / frame_count:>11.1%}"
+              f"{seconds * 1000 / frame_count:>10.2f}{tracked / frame_count:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
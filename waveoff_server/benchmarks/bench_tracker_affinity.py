@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shows how often Mediapipe falls back to palm detection when several phones share one
+HandProcessor (frames interleaved, as before sessions owned their pipeline) compared
+with one HandProcessor per session.
+
+Run from the waveoff_server directory:
+    python -m benchmarks.bench_tracker_affinity [--archive data] [--video clip.mp4] [--sessions 1 2 4 8]
+"""
+import argparse
+import time
+
+from constants import ARCHIVE_DIR
+from mediapipe_helpers.hand_processor import HandProcessor
+from benchmarks.recordings import load_sessions
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", help="Archive folder with one folder per session", default=ARCHIVE_DIR)
+    parser.add_argument("--video", help="Video file to use instead of the archive", default=None)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-frames", type=int, default=300)
+    return parser.parse_args()
+
+
+def concurrent_streams(recordings, count):
+    # Reuse recordings, shifted in time, when there are fewer than sessions
+    streams = []
+    for index in range(count):
+        frames = recordings[index % len(recordings)]
+        shift = (index // len(recordings)) * 7 % len(frames)
+        streams.append(frames[shift:] + frames[:shift])
+    return streams
+
+
+def interleave(streams):
+    # Round robin, the order frames of concurrent phones reach the server in
+    for frame_index in range(min(len(frames) for frames in streams)):
+        for session_index, frames in enumerate(streams):
+            yield session_index, frames[frame_index]
+
+
+def run(streams, shared):
+    processors = [HandProcessor()] if shared else [HandProcessor() for _ in streams]
+    start = time.perf_counter()
+    frames = 0
+    for session_index, frame in interleave(streams):
+        processors[0 if shared else session_index].process(frame, is_rgb=True)
+        frames += 1
+    seconds = time.perf_counter() - start
+    detections = sum(processor.detections for processor in processors)
+    return detections / max(1, frames), seconds * 1000 / max(1, frames)
+
+
+def main():
+    args = get_args()
+    recordings = load_sessions(args.archive, args.video, max_frames=args.max_frames)
+    if not recordings:
+        print("No recorded sessions found")
+        return
+
+    print(f"{'sessions':>8}{'shared det.':>13}{'ms/frame':>10}{'own det.':>10}{'ms/frame':>10}")
+    for count in args.sessions:
+        streams = concurrent_streams(recordings, count)
+        shared_rate, shared_ms = run(streams, shared=True)
+        own_rate, own_ms = run(streams, shared=False)
+        print(f"{count:>8}{shared_rate:>12.1%}{shared_ms:>10.2f}{own_rate:>9.1%}{own_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Loads recorded sessions for the benchmarks: segments written by server_archive
+(one folder of .npz segments per session), or a video file.
+
+Archive segments hold mirrored RGB frames. Benchmarks that need consecutive frames
+need a recording made with ARCHIVE_EVERY_N = 1 in constants.py.
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from constants import WIDTH, HEIGHT
+
+
+def load_archive_session(session_folder, max_frames=None):
+    """
+    Returns the frames of one archived session, oldest segment first.
+    """
+    frames = []
+    segments = sorted(glob.glob(os.path.join(session_folder, "*.npz")),
+                      key=lambda path: int(os.path.splitext(os.path.basename(path))[0]))
+    for path in segments:
+        with np.load(path) as segment:
+            frames.extend(segment["frames"])
+        if max_frames is not None and len(frames) >= max_frames:
+            return frames[:max_frames]
+    return frames
+
+
+def load_video(path, max_frames=None):
+    """
+    Returns the frames of a video as mirrored RGB frames of the streaming size.
+    """
+    frames = []
+    capture = cv2.VideoCapture(path)
+    while max_frames is None or len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frame = cv2.resize(frame, (WIDTH, HEIGHT), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB))
+    capture.release()
+    return frames
+
+
+def load_sessions(archive_dir=None, video=None, max_sessions=None, max_frames=None):
+    """
+    Returns a list of recorded sessions, each a list of mirrored RGB frames.
+    """
+    if video is not None:
+        return [load_video(video, max_frames)]
+    folders = sorted(path for path in glob.glob(os.path.join(archive_dir, "*")) if os.path.isdir(path))
+    sessions = [load_archive_session(folder, max_frames) for folder in folders[:max_sessions]]
+    return [frames for frames in sessions if frames]
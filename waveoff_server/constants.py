@@ -1,2 +1,143 @@
 WIDTH = 256
-HEIGHT = 144
\ No newline at end of file
+HEIGHT = 144
+
+# Largest frame a client may send (binary header); larger headers are rejected before any buffer is allocated
+MAX_FRAME_WIDTH = 1280
+MAX_FRAME_HEIGHT = 1280
+
+# Encoder quality (10-100) suggested to clients sending JPEG/WebP frames
+DEFAULT_FRAME_QUALITY = 75
+
+# Frame archive (background writer, see server_archive.py)
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = "data"
+ARCHIVE_EVERY_N = 30            # Keep every Nth frame (0 disables periodic sampling)
+ARCHIVE_ON_CHANGE = True        # Also keep frames whose result differs from the previous one
+ARCHIVE_QUEUE_SIZE = 256        # Frames waiting for the writer; new frames are dropped when full
+ARCHIVE_SEGMENT_FRAMES = 64     # Frames per .npz segment
+ARCHIVE_MAX_SEGMENTS_PER_SESSION = 20
+ARCHIVE_MAX_BYTES = 2 * 1024 ** 3
+
+# Asyncio server mode (server_async.py)
+ASYNC_HOST = "0.0.0.0"
+ASYNC_PORT = 5000
+ASYNC_INFERENCE_THREADS = 4     # Executor threads for gesture recognition (each session owns its pipeline)
+ASYNC_MAX_MESSAGE_BYTES = 1024 * 1024
+
+# Interval between per-session stats messages sent to the client (seconds)
+STATS_INTERVAL_S = 5.0
+
+# Sessions that send nothing for this long are closed and evicted (seconds)
+SESSION_IDLE_TIMEOUT_S = 30.0
+
+# Inference worker processes (server_workers.py); 0 runs gesture recognition in-process
+INFERENCE_WORKERS = 0
+WORKER_REBALANCE_DEPTH = 4      # In-flight frames at which a worker counts as saturated
+WORKER_RESULT_TIMEOUT_S = 5.0   # A session gives up on a frame sent to a worker after this long
+WORKER_HEALTH_CHECK_S = 1.0     # How often crashed workers are looked for and replaced
+
+# Cross-session batching of the keypoint / point history classifiers (in-process sessions only)
+CLASSIFIER_BATCHING = True
+CLASSIFIER_BATCH_MAX_DELAY_MS = 2.0
+CLASSIFIER_BATCH_MAX_SIZE = 64
+
+# Outbound result queue per subscriber (server_observer.QueuedSubscriber)
+SUBSCRIBER_QUEUE_SIZE = 8
+SUBSCRIBER_MAX_OVERFLOWS = 3    # Consecutive overflows before a slow client is disconnected
+
+# Result delivery (server_observer.Observer); clients may override both in their hello
+RESULT_MIN_INTERVAL_MS = 100    # Result changes within this window are coalesced into one message
+RESULT_HEARTBEAT_MS = 1000      # Heartbeat with the current result while it is unchanged (0 disables)
+RESULT_MAX_INTERVAL_MS = 60000  # Upper bound for both values a client may request
+
+# Adaptive client frame rate (server_rate_control.FrameRateController)
+RATE_IDLE_FPS = 5               # While no hand has been seen for RATE_IDLE_AFTER_S
+RATE_ACTIVE_FPS = 30            # While a hand is in view
+RATE_MIN_FPS = 2
+RATE_IDLE_AFTER_S = 1.0
+RATE_MAX_QUEUE_DEPTH = 2        # Frames piled up in front of inference before backing off
+RATE_OVERLOAD_FPS = 15          # Below this rate active sessions are also asked for smaller frames
+RATE_OVERLOAD_SCALE = 0.5
+RATE_CONTROL_INTERVAL_S = 1.0   # Minimum time between load driven changes
+
+# Scheduling of gesture recognition across sessions (server_scheduler.InferenceScheduler)
+SCHEDULER_CONCURRENCY = 4       # Frames processed at once; at least INFERENCE_WORKERS when workers are used
+SCHEDULER_ACTIVE_WEIGHT = 2.0   # Fair share of sessions with a hand in view
+SCHEDULER_IDLE_WEIGHT = 1.0     # Fair share of idle sessions; ringing sessions always go first
+
+# Region of interest mode (mediapipe_helpers.roi.RoiTracker)
+ROI_ENABLED = True              # Process only a crop around the previous hand while one is tracked
+ROI_PADDING = 0.5               # Space around the hand box, relative to its longer side
+ROI_MIN_SIZE = 64               # Smallest crop side in pixels
+ROI_CLIENT_CROP_SIZE = 192      # Size clients that negotiated "roi" send their crops at
+
+# Motion gate (utils.motion_gate.MotionGate): reuse the last result on static frames
+MOTION_GATE_ENABLED = True
+MOTION_GATE_THUMB_SIZE = (32, 18)       # Grayscale thumbnail frames are compared at
+MOTION_GATE_PIXEL_THRESHOLD = 12        # Gray level change for a thumbnail pixel to count as changed
+MOTION_GATE_CHANGED_FRACTION = 0.01     # Changed pixels for a frame to count as moving
+MOTION_GATE_MAX_SKIPS = 10              # Static frames in a row before one is processed anyway
+
+# Frame quality gate (utils.quality_gate.QualityGate): no palm detection on unusable frames
+QUALITY_GATE_ENABLED = True
+QUALITY_THUMB_SIZE = (128, 72)  # Grayscale frame the checks run on
+QUALITY_MIN_LUMINANCE = 25      # Mean gray level below which a frame is too dark (pocket, face down)
+QUALITY_MAX_LUMINANCE = 250     # Mean gray level above which a frame is washed out
+QUALITY_MIN_CONTRAST = 8.0      # Gray level standard deviation below which a frame is flat (covered)
+QUALITY_MIN_SHARPNESS = 20.0    # Laplacian variance below which a frame is too blurred
+RATE_POOR_QUALITY_FPS = 1       # Frame rate asked for while frames stay unusable
+RATE_POOR_QUALITY_AFTER_S = 1.0
+
+# Keyframe mode (mediapipe_helpers.landmark_flow.LandmarkFlowTracker): Mediapipe every
+# LANDMARK_FLOW_KEYFRAME_INTERVAL frames, Lucas-Kanade optical flow in between.
+# Tune the interval with benchmarks/bench_landmark_flow.py before enabling.
+LANDMARK_FLOW_ENABLED = False
+LANDMARK_FLOW_KEYFRAME_INTERVAL = 3
+LANDMARK_FLOW_MIN_CONFIDENCE = 0.9      # Reliably tracked landmarks needed to skip a keyframe
+LANDMARK_FLOW_MAX_FB_ERROR = 1.0        # Forward-backward error (pixels) of a reliable landmark
+
+# Hand landmark backend (mediapipe_helpers.hand_processor.create_hand_processor)
+HAND_BACKEND = "solutions"      # "solutions" (mp.solutions.hands), "tasks" (MediaPipe Tasks HandLandmarker)
+                                # or "batched" (landmark network shared across sessions, see below)
+HAND_LANDMARKER_MODE = "video"  # Tasks only: "video" (synchronous) or "live_stream" (never blocks, results lag a frame)
+HAND_LANDMARKER_MODEL = "model/hand_landmarker/hand_landmarker.task"  # See mediapipe_helpers.hand_landmarker.MODEL_URL
+HAND_MODEL_COMPLEXITY = 1          # solutions only: 0 lite, 1 full landmark model
+HAND_MIN_DETECTION_CONFIDENCE = 0.7
+HAND_MIN_PRESENCE_CONFIDENCE = 0.5  # Tasks only
+HAND_MIN_TRACKING_CONFIDENCE = 0.5
+
+# Batched landmark backend (mediapipe_helpers.batched_landmarks.BatchedHandProcessor): the hand
+# crops of all in-process sessions go through the landmark network in one invoke, and
+# Mediapipe's palm detection only runs for sessions that lost their hand. Inference workers
+# run one frame at a time and call the network directly, without batching.
+HAND_BATCH_MODEL = "full"           # Landmark network shipped with mediapipe: "full" or "lite"
+HAND_BATCH_MAX_DELAY_MS = 2.0
+HAND_BATCH_MAX_SIZE = 16            # In-process servers also run this many frames at once (inference_concurrency)
+
+# Pre-initialized Mediapipe Hands instances (mediapipe_helpers.hand_processor_pool.HandProcessorPool)
+HAND_POOL_SIZE = 4                  # Idle instances kept warm for new connections
+HAND_POOL_LITE_SIZE = 2             # Idle lite (model_complexity 0) instances for sessions stepped down by QoS
+HAND_POOL_MAX_MEMORY_MB = 1024      # Ceiling for all instances; above it idle sessions' instances are reused
+HAND_POOL_INSTANCE_MEMORY_MB = 40   # Estimate per instance until the first one has been measured
+
+# Quality-of-service degradation ladder (server_qos.QosController, main.QosProfile).
+# A session steps down one level while its frames miss the deadline and back up once
+# there is headroom again. Fields: (model_complexity, inference_scale,
+# keyframe_interval, point_history); level 0 is full quality. Mediapipe resizes every
+# frame to its fixed 192 x 192 palm and 224 x 224 landmark inputs, so a lower inference_scale
+# mostly saves the color conversion and copies of larger frames and client crops: last rung.
+QOS_ENABLED = True
+QOS_LADDER = (
+    (HAND_MODEL_COMPLEXITY, 1.0, 1, True),
+    (HAND_MODEL_COMPLEXITY, 1.0, 1, False),     # Skip the point history classifier
+    (0, 1.0, 1, False),                         # Lite landmark model
+    (0, 1.0, 2, False),                         # Mediapipe every 2nd frame, optical flow in between
+    (0, 1.0, 3, False),
+    (0, 0.75, 3, False),                        # Reduced inference resolution
+)
+QOS_DEADLINE_MS = 66            # Time a frame may take from leaving the mailbox to its result
+QOS_MISS_RATIO = 0.3            # Share of the window over the deadline that steps a level down
+QOS_HEADROOM = 0.5              # Share of the deadline the whole window must stay under to step up
+QOS_WINDOW = 10                 # Frames each decision looks at
+QOS_HOLD_S = 2.0                # Minimum time at a level before stepping back up
+QOS_MIN_INFERENCE_SIDE = 96     # Frames are not scaled below this shorter side
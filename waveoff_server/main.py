@@ -1,129 +1,331 @@
+import time
 import cv2 as cv
-from collections import deque, Counter
+from collections import deque, Counter, namedtuple
 import numpy as np
-from mediapipe_helpers.hand_processor import HandProcessor
+from constants import QOS_LADDER, QOS_MIN_INFERENCE_SIDE
+from mediapipe_helpers.hand_processor import create_hand_processor
+from mediapipe_helpers.landmark_flow import create_landmark_tracker
+from mediapipe_helpers.roi import crop
 from model import KeyPointClassifier, PointHistoryClassifier
 from utils.cvfpscalc import CvFpsCalc
 from utils.pre_processing import pre_process_landmark, pre_process_point_history
-from mediapipe_helpers.utils import calc_bounding_rect, calc_landmark_list
+from mediapipe_helpers.utils import calc_bounding_rect, calc_landmark_bounding_rect, calc_landmark_list
 
 
-# Initialize components
-hand_processor = HandProcessor()
-keypoint_classifier = KeyPointClassifier()
-point_history_classifier = PointHistoryClassifier()
-fps_calc = CvFpsCalc(buffer_len=10)
-
 # Load labels
-keypoint_labels = keypoint_classifier.load_labels()
-gesture_labels = point_history_classifier.load_labels()
-
-# Shared data structures
-point_history = deque(maxlen=16)
-finger_gesture_history = deque(maxlen=16)
+keypoint_labels = KeyPointClassifier.load_labels()
+gesture_labels = PointHistoryClassifier.load_labels()
 
-def process_image(input_data, width=None, height=None):
-    """
-    Processes an image (either from byte data or camera frame) and detects gestures.
+# How much work a pipeline spends per frame, one level of QOS_LADDER in constants.py
+QosProfile = namedtuple("QosProfile", ["model_complexity", "inference_scale", "keyframe_interval",
+                                       "point_history"])
 
-    Parameters:
-        input_data: np.ndarray (camera frame) or bytes (byte data)
-        width: int (optional) - Width of image (required for byte data)
-        height: int (optional) - Height of image (required for byte data)
 
+def qos_profile(level):
+    """
     Returns:
-        dict: Hand sign, gesture type, bounding box, and FPS.
+        QosProfile: Profile of a level of the degradation ladder, 0 being full quality.
     """
-    # Determine input type
-    if isinstance(input_data, bytes):
-        # Case: Byte data
-        if width is None or height is None:
-            raise ValueError("Width and height must be provided for byte data.")
-        img_array = np.frombuffer(input_data, dtype=np.uint8)
-        image = img_array.reshape((height, width, 3))
-
-        # Flip image for mirroring effect
-        image = cv.flip(image, 1)
-        
-    elif isinstance(input_data, (np.ndarray,)):
-        # Case: Camera frame
-        image = input_data
-    else:
-        raise TypeError("Unsupported input type. Must be bytes or numpy.ndarray.")
-
-    # Process image with Mediapipe
-    results = hand_processor.process(image)
-
-    specific_gesture_type = 'None'
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            # Calculate bounding box and landmarks
-            brect = calc_bounding_rect(image, hand_landmarks)
-            landmark_list = calc_landmark_list(image, hand_landmarks)
-
-            # Pre-process landmarks and point history
-            pre_processed_landmark_list = pre_process_landmark(landmark_list)
-            pre_processed_point_history_list = pre_process_point_history(image, point_history)
-
-            if len(landmark_list) < 21:  # Ensure valid landmarks are present
-                print("RAHMANIA - Insufficient landmarks detected.")
-                continue
-
-            # Hand sign classification
-            hand_sign_id = keypoint_classifier(pre_processed_landmark_list)
-
-            print(f"RAHMANIA - Before update: point_history = {list(point_history)}") # Debugging line
-
-            # Update point history
-            if hand_sign_id == 0:  # All fingers extended
-                point_history.extend([landmark_list[i] for i in [4, 8, 12, 16, 20]])
-            elif hand_sign_id == 3:  # Index finger extended
-                point_history.append(landmark_list[8])
+    return QosProfile(*QOS_LADDER[min(max(level, 0), len(QOS_LADDER) - 1)])
+
+
+class GesturePipeline:
+    def __init__(self, keypoint_classifier=None, point_history_classifier=None, roi_tracker=None,
+                 motion_gate=None, quality_gate=None, landmark_tracker=None, hand_processor=None,
+                 profile=None):
+        """
+        Hand tracker, classifiers and gesture histories of one camera stream.
+        Every session owns its own pipeline, so landmarks of different phones never
+        mix and sessions can be processed in parallel without locks.
+
+        Parameters:
+            keypoint_classifier: callable (optional) - Shared classifier, e.g. a BatchingClassifier;
+                a private KeyPointClassifier is created if omitted
+            point_history_classifier: callable (optional) - Same for the point history classifier
+            roi_tracker: RoiTracker (optional) - Enables ROI mode: while a hand is tracked only a
+                crop around it is processed, falling back to the full frame on a miss
+            motion_gate: MotionGate (optional) - Reuses the last result for frames that barely
+                differ from the last processed one instead of running Mediapipe
+            quality_gate: QualityGate (optional) - Answers "None" without running Mediapipe on
+                frames too dark, flat or blurred to contain a hand
+            landmark_tracker: LandmarkFlowTracker (optional) - Keyframe mode: Mediapipe only runs on
+                keyframes, in between landmarks follow the optical flow
+            hand_processor: HandProcessor (optional) - e.g. a HandProcessorLease from a pool of
+                warm instances; one of the configured backend is created if omitted
+            profile: QosProfile (optional) - Quality profile to start at; full quality if omitted
+        """
+        self.hand_processor = hand_processor or create_hand_processor()
+        self.keypoint_classifier = keypoint_classifier or KeyPointClassifier()
+        self.point_history_classifier = point_history_classifier or PointHistoryClassifier()
+        self.roi_tracker = roi_tracker
+        self.motion_gate = motion_gate
+        self.quality_gate = quality_gate
+        self.landmark_tracker = landmark_tracker
+        self.last_result = None
+        self.last_landmarks = None  # Landmarks behind last_result, in frame coordinates
+        self.fps_calc = CvFpsCalc(buffer_len=10)
+
+        self.point_history = deque(maxlen=16)
+        self.finger_gesture_history = deque(maxlen=16)
+
+        # Region of the frame the last Mediapipe input showed (None: full frame) and whether
+        # Mediapipe found a hand in it, i.e. will follow that hand on the next frame
+        self._input_roi = None
+        self._hand_in_input = False
+        self.server_crops = 0        # Frames cropped around the previous hand
+        self.roi_fallbacks = 0       # Of those, lost the hand and ran Mediapipe again on the full frame
+        self.roi_fallback_ms = 0.0   # Time spent on these second runs
+        self.tracking_resets = 0     # Mediapipe tracking reset because a crop was anchored
+
+        # Keyframe interval configured for the tracker; profiles may only raise it
+        self._keyframe_interval = landmark_tracker.keyframe_interval if landmark_tracker is not None else 1
+        self.profile = None
+        self.set_profile(profile or qos_profile(0))
+
+    def set_profile(self, profile):
+        """
+        Switches to another quality profile, e.g. when the session is stepped down the
+        degradation ladder. Takes effect from the next frame.
+
+        Parameters:
+            profile: QosProfile - Landmark model, inference scale, keyframe interval and
+                whether the point history classifier runs
+        """
+        if profile == self.profile:
+            return
+        self.profile = profile
+        self.hand_processor.set_model_complexity(profile.model_complexity)
+
+        interval = max(self._keyframe_interval, profile.keyframe_interval)
+        if self.landmark_tracker is None and interval > 1:
+            # None if the hand backend does not allow optical flow keyframes
+            self.landmark_tracker = create_landmark_tracker(interval)
+        if self.landmark_tracker is not None:
+            self.landmark_tracker.keyframe_interval = interval
+
+    @property
+    def roi(self):
+        """
+        Region of the frame that the next frame is cropped to, or None in full frame mode.
+        """
+        return self.roi_tracker.roi if self.roi_tracker is not None else None
+
+    def process_image(self, input_data, width=None, height=None, is_rgb=False, crop_roi=None):
+        """
+        Processes an image (either from byte data or camera frame) and detects gestures.
+
+        Parameters:
+            input_data: np.ndarray (camera frame) or bytes-like (byte data, e.g. a memoryview
+                over a binary WebSocket frame, which is wrapped without copying)
+            width: int (optional) - Width of image (required for byte data)
+            height: int (optional) - Height of image (required for byte data)
+            is_rgb: bool (optional) - True if the frame is already RGB (e.g. converted from NV21),
+                which skips the BGR to RGB conversion before Mediapipe
+            crop_roi: Roi (optional) - Region of the full frame that input_data shows, when the
+                client sent only a crop; landmarks are mapped back to full frame coordinates
+
+        Returns:
+            dict: Hand sign, gesture type, bounding box, and FPS.
+        """
+        # Determine input type
+        if isinstance(input_data, (bytes, bytearray, memoryview)):
+            # Case: Byte data
+            if width is None or height is None:
+                raise ValueError("Width and height must be provided for byte data.")
+            img_array = np.frombuffer(input_data, dtype=np.uint8)
+            image = img_array.reshape((height, width, 3))
+
+            # Flip image for mirroring effect
+            image = cv.flip(image, 1)
+
+        elif isinstance(input_data, (np.ndarray,)):
+            # Case: Camera frame
+            image = input_data
+        else:
+            raise TypeError("Unsupported input type. Must be bytes-like or numpy.ndarray.")
+
+        # Frames that cannot contain a hand skip palm detection altogether
+        if self.quality_gate is not None and self.quality_gate.check(image, is_rgb) is not None:
+            if self.roi_tracker is not None:
+                self.roi_tracker.reset()
+            if self.landmark_tracker is not None:
+                self.landmark_tracker.reset()
+            self.last_landmarks = None
+            self.last_result = {"hand_sign": "None"}
+            return self.last_result
+
+        # Skip Mediapipe and the classifiers on frames that barely changed
+        if self.last_result is not None and self.motion_gate is not None \
+                and self.motion_gate.is_static(image, is_rgb):
+            return self.last_result
+
+        self.last_result = self._recognize(image, is_rgb, crop_roi)
+        return self.last_result
+
+    def _recognize(self, image, is_rgb, crop_roi):
+        # Between keyframes, move the landmarks of the last frame along the optical flow
+        tracker = self.landmark_tracker
+        if tracker is not None:
+            if crop_roi is not None:
+                tracker.reset()  # Client crops are not comparable from frame to frame
             else:
-                point_history.append([0, 0])  # Placeholder
-
-            print(f"RAHMANIA - After update: point_history = {list(point_history)}") # Debugging line
-
-            # Before calling pre_process_point_history, ensure point_history is valid
-            if len(point_history) == 0:
-                print("RAHMANIA - Point history is empty. Skipping processing.")
-                return {
-                    "hand_sign": "None",
-                    "gesture_type": "None",
-                    "bounding_box": None,
-                    "fps": fps_calc.get(),
-                }
-
-            # Gesture classification
-            finger_gesture_id = 0
-            if len(pre_processed_point_history_list) == (16 * 2):
-                finger_gesture_id = point_history_classifier(pre_processed_point_history_list)
-            finger_gesture_history.append(finger_gesture_id)
-            most_common_fg_id = Counter(finger_gesture_history).most_common()
-
-            # Map gesture ID to gesture type
-            if finger_gesture_id == 0:
-                specific_gesture_type = "Stop"
-            elif finger_gesture_id == 1:
-                specific_gesture_type = "Normal Wave"
-            elif finger_gesture_id == 2:
-                specific_gesture_type = "Index Wave"
-
-            # Return results
+                landmark_list = tracker.track(image, is_rgb)
+                if landmark_list is not None:
+                    frame_size = (image.shape[1], image.shape[0])
+                    if self.roi_tracker is not None:
+                        self.roi_tracker.update(calc_landmark_bounding_rect(landmark_list), *frame_size)
+                    return self._classify(image, landmark_list, frame_size)
+
+        # Process image with Mediapipe: the client's crop, the crop around the previous
+        # hand (only that part is color converted), or the full frame
+        roi = crop_roi if crop_roi is not None else self.roi
+        hand_image = image if crop_roi is not None or roi is None else crop(image, roi)
+        if crop_roi is None and roi is not None:
+            self.server_crops += 1
+        results = self._detect(hand_image, is_rgb, roi)
+        if not results.multi_hand_landmarks and crop_roi is None and roi is not None:
+            # Lost the hand in the crop: look at the whole frame again, a second Mediapipe run
+            start = time.perf_counter()
+            roi = None
+            results = self._detect(image, is_rgb, None)
+            self.roi_fallbacks += 1
+            self.roi_fallback_ms += (time.perf_counter() - start) * 1000.0
+        frame_size = (roi.frame_width, roi.frame_height) if roi is not None \
+            else (image.shape[1], image.shape[0])
+
+        if results.multi_hand_landmarks:
+            for hand_landmarks in results.multi_hand_landmarks:
+                # Calculate bounding box and landmarks in full frame coordinates
+                brect = calc_bounding_rect(image, hand_landmarks, roi)
+                landmark_list = calc_landmark_list(image, hand_landmarks, roi)
+                if self.roi_tracker is not None:
+                    self.roi_tracker.update(brect, *frame_size)
+                if tracker is not None and crop_roi is None:
+                    tracker.start(landmark_list)  # This frame is the new keyframe
+                return self._classify(image, landmark_list, frame_size)
+
+        # If no hands are detected
+        if self.roi_tracker is not None:
+            self.roi_tracker.reset()
+        if tracker is not None:
+            tracker.reset()
+        self.last_landmarks = None
+        return {
+            "hand_sign": "None",
+            #"gesture_type": "None",
+            #"bounding_box": None,
+            #"fps": self.fps_calc.get(),
+        }
+
+    def _detect(self, image, is_rgb, roi):
+        # Mediapipe follows the previous hand in the previous input's normalized coordinates:
+        # once the input shows another region it would look for the hand in the wrong place,
+        # so start over with palm detection. The ROI stays put while a hand is tracked, so
+        # this only happens when a crop is anchored on a hand found on the full frame.
+        if roi != self._input_roi:
+            if self._hand_in_input:
+                self.hand_processor.reset_tracking()
+                self.tracking_resets += 1
+            self._input_roi = roi
+
+        # Landmarks are normalized, so a downscaled image maps back to the same coordinates
+        scale = self.profile.inference_scale
+        if scale < 1.0 and min(image.shape[:2]) * scale >= QOS_MIN_INFERENCE_SIDE:
+            image = cv.resize(image, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA)
+        results = self.hand_processor.process(image, is_rgb=is_rgb)
+        self._hand_in_input = bool(results.multi_hand_landmarks)
+        return results
+
+    def roi_stats(self):
+        """
+        Returns:
+            dict: Frames cropped around the previous hand, how many of them lost the hand
+                and cost a second Mediapipe run on the full frame (and the time that took),
+                and Mediapipe tracking resets because a crop was anchored on the hand.
+        """
+        return {
+            "server_crops": self.server_crops,
+            "fallbacks": self.roi_fallbacks,
+            "fallback_rate": round(self.roi_fallbacks / self.server_crops, 3) if self.server_crops else 0.0,
+            "fallback_ms": round(self.roi_fallback_ms / self.roi_fallbacks, 2) if self.roi_fallbacks else 0.0,
+            "tracking_resets": self.tracking_resets,
+        }
+
+    def _classify(self, image, landmark_list, frame_size):
+        """
+        Classifies the hand sign and finger gesture of 21 landmarks in frame coordinates.
+        """
+        self.last_landmarks = landmark_list
+        specific_gesture_type = 'None'
+
+        # Pre-process landmarks and point history
+        pre_processed_landmark_list = pre_process_landmark(landmark_list)
+        pre_processed_point_history_list = []
+        if self.profile.point_history:
+            pre_processed_point_history_list = pre_process_point_history(image, self.point_history,
+                                                                         frame_size)
+
+        if len(landmark_list) < 21:  # Ensure valid landmarks are present
+            print("RAHMANIA - Insufficient landmarks detected.")
+            return {"hand_sign": "None"}
+
+        # Hand sign classification
+        hand_sign_id = self.keypoint_classifier(pre_processed_landmark_list)
+
+        # Update point history
+        if hand_sign_id == 0:  # All fingers extended
+            self.point_history.extend([landmark_list[i] for i in [4, 8, 12, 16, 20]])
+        elif hand_sign_id == 3:  # Index finger extended
+            self.point_history.append(landmark_list[8])
+        else:
+            self.point_history.append([0, 0])  # Placeholder
+
+        # Before calling pre_process_point_history, ensure point_history is valid
+        if len(self.point_history) == 0:
+            print("RAHMANIA - Point history is empty. Skipping processing.")
             return {
-                "hand_sign": keypoint_labels[hand_sign_id],
-                #"gesture_type": specific_gesture_type,
-                #"bounding_box": brect,
-                #"fps": fps_calc.get(),
+                "hand_sign": "None",
+                "gesture_type": "None",
+                "bounding_box": None,
+                "fps": self.fps_calc.get(),
             }
 
-    # If no hands are detected
-    return {
-        "hand_sign": "None",
-        #"gesture_type": "None",
-        #"bounding_box": None,
-        #"fps": fps_calc.get(),
-    }
+        # Gesture classification (skipped by degraded profiles)
+        finger_gesture_id = 0
+        if len(pre_processed_point_history_list) == (16 * 2):
+            finger_gesture_id = self.point_history_classifier(pre_processed_point_history_list)
+        self.finger_gesture_history.append(finger_gesture_id)
+        most_common_fg_id = Counter(self.finger_gesture_history).most_common()
+
+        # Map gesture ID to gesture type
+        if finger_gesture_id == 0:
+            specific_gesture_type = "Stop"
+        elif finger_gesture_id == 1:
+            specific_gesture_type = "Normal Wave"
+        elif finger_gesture_id == 2:
+            specific_gesture_type = "Index Wave"
+
+        # Return results
+        return {
+            "hand_sign": keypoint_labels[hand_sign_id],
+            #"gesture_type": specific_gesture_type,
+            #"bounding_box": brect,
+            #"fps": self.fps_calc.get(),
+        }
+
+
+# Pipeline used by the module-level process_image (local camera, scripts)
+_default_pipeline = None
+
+
+def process_image(input_data, width=None, height=None, is_rgb=False):
+    """
+    Processes an image with a module-wide pipeline. See GesturePipeline.process_image.
+    """
+    global _default_pipeline
+    if _default_pipeline is None:
+        _default_pipeline = GesturePipeline()
+    return _default_pipeline.process_image(input_data, width, height, is_rgb)
 
 
 def process_camera_stream(video_source=0):
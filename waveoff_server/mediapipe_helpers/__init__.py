@@ -1,2 +1,6 @@
-from mediapipe_helpers.hand_processor import HandProcessor
-from mediapipe_helpers.utils import calc_bounding_rect, calc_landmark_list
\ No newline at end of file
+from mediapipe_helpers.hand_processor import HandProcessor, create_hand_processor
+from mediapipe_helpers.utils import calc_bounding_rect, calc_landmark_bounding_rect, calc_landmark_list
+from mediapipe_helpers.roi import Roi, RoiTracker, create_roi_tracker, crop
+from mediapipe_helpers.landmark_flow import LandmarkFlowTracker
+from mediapipe_helpers.hand_processor_pool import HandProcessorLease, HandProcessorPool
+from mediapipe_helpers.batched_landmarks import BatchedHandProcessor
@@ -0,0 +1,185 @@
+import threading
+
+import cv2 as cv
+import numpy as np
+
+from constants import (HAND_BATCH_MAX_DELAY_MS, HAND_BATCH_MAX_SIZE, HAND_BATCH_MODEL,
+                       HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE, HAND_MODEL_COMPLEXITY)
+from mediapipe_helpers.hand_processor import HandProcessor
+from mediapipe_helpers.utils import HandLandmarks, HandResults, Landmark
+
+# Landmarks the hand crop is derived from (wrist, finger bases), as in Mediapipe's
+# hand_landmark_landmarks_to_roi: fingertips move too much to keep the crop steady
+ROI_LANDMARKS = [0, 1, 2, 3, 5, 6, 9, 10, 13, 14, 17, 18]
+ROI_SCALE = 2.0
+ROI_SHIFT_Y = -0.1
+
+
+def hand_crop(landmarks):
+    """
+    Square region of the next frame to run the landmark network on, rotated so the
+    hand points up: the box around the previous landmarks in the hand's own
+    orientation, shifted towards the fingers and doubled in size.
+
+    Args:
+        landmarks (np.ndarray): 21 x 2 landmarks in pixels.
+
+    Returns:
+        tuple: (center, size, axes) - center and side of the square in pixels, and the
+            2 x 2 matrix whose columns are the hand's x and y axes in the image.
+    """
+    points = landmarks[ROI_LANDMARKS]
+    wrist, middle = landmarks[0], landmarks[9]
+    rotation = np.pi / 2 - np.arctan2(wrist[1] - middle[1], middle[0] - wrist[0])
+    cos, sin = np.cos(rotation), np.sin(rotation)
+    axes = np.array([[cos, -sin], [sin, cos]])  # Columns: the hand's x and y axes in the image
+
+    local = points @ axes
+    low, high = local.min(axis=0), local.max(axis=0)
+    width, height = high - low
+    center = axes @ ((low + high) / 2 + [0.0, ROI_SHIFT_Y * height])
+    return center, max(width, height) * ROI_SCALE, axes
+
+
+class BatchedHandProcessor:
+    asynchronous = False
+
+    def __init__(self, landmark_model, detector, min_presence=0.5):
+        """
+        HandProcessor that tracks the hand with a shared landmark network instead of a
+        Mediapipe graph per session: the crop around the previous hand goes to
+        landmark_model, which batches the crops of all sessions into one invoke.
+        Palm detection (the Mediapipe graph of detector) only runs while no hand is tracked.
+
+        Args:
+            landmark_model (callable): Returns (21 x 3 landmarks in crop pixels, presence)
+                for a square RGB crop, e.g. a BatchingClassifier around a HandLandmarkModel.
+            detector (HandProcessor): Finds a hand when tracking is lost.
+            min_presence (float): Hand presence score below which tracking counts as lost.
+        """
+        self.landmark_model = landmark_model
+        self.detector = detector
+        self.min_presence = min_presence
+        self.input_size = getattr(getattr(landmark_model, "classifier", landmark_model), "input_size", 224)
+
+        self._landmarks = None  # 21 x 2 landmarks of the previous frame, normalized to it
+        self.detections = 0
+        self.tracked = 0
+        self.used = False
+
+    def process(self, image, is_rgb=False):
+        """
+        Args:
+            image (np.ndarray): Input image.
+            is_rgb (bool): True if the image is already RGB, False if it is BGR.
+
+        Returns:
+            HandResults: Landmarks normalized to the image, in the structure of the
+                Mediapipe result object.
+        """
+        image_rgb = image if is_rgb else cv.cvtColor(image, cv.COLOR_BGR2RGB)
+        self.used = True
+        height, width = image_rgb.shape[:2]
+
+        if self._landmarks is not None:
+            center, size, axes = hand_crop(self._landmarks * [width, height])
+            # Image to crop: crop pixel d shows image point center + axes @ (d - S / 2) * scale
+            scale = size / self.input_size
+            to_crop = np.hstack([axes.T / scale, (self.input_size / 2 - axes.T @ center / scale)[:, None]])
+            crop = cv.warpAffine(image_rgb, to_crop, (self.input_size, self.input_size),
+                                 flags=cv.INTER_LINEAR, borderMode=cv.BORDER_CONSTANT)
+            landmarks, presence = self.landmark_model(crop)
+            if presence >= self.min_presence:
+                self.tracked += 1
+                points = center + (landmarks[:, :2] - self.input_size / 2) * scale @ axes.T
+                self._landmarks = points / [width, height]
+                return HandResults([HandLandmarks([
+                    Landmark(x, y, z * scale / width)
+                    for (x, y), z in zip(self._landmarks.tolist(), landmarks[:, 2].tolist())])], None)
+            self._landmarks = None
+
+        # No hand to follow: palm detection and landmarks from the Mediapipe graph
+        self.detections += 1
+        results = self.detector.process(image_rgb, is_rgb=True)
+        if results.multi_hand_landmarks:
+            self._landmarks = np.array([[point.x, point.y]
+                                        for point in results.multi_hand_landmarks[0].landmark])
+        return results
+
+    @property
+    def model_complexity(self):
+        return self.detector.model_complexity
+
+    def set_model_complexity(self, model_complexity):
+        # The shared network is fixed by HAND_BATCH_MODEL; only the detector switches
+        self.detector.set_model_complexity(model_complexity)
+
+    def reset_tracking(self):
+        self._landmarks = None
+
+    def reset(self):
+        self._landmarks = None
+        self.detections = 0
+        self.tracked = 0
+        self.used = False
+
+    def close(self):
+        self.detector.close()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Calls that ran palm detection vs. only the shared landmark network.
+        """
+        calls = self.detections + self.tracked
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "detection_rate": round(self.detections / calls, 3) if calls else 0.0,
+        }
+
+
+# Landmark network shared by every BatchedHandProcessor of this process, created on first use
+_landmark_model = None
+_landmark_model_lock = threading.Lock()
+_landmark_batching = True
+
+
+def disable_landmark_batching():
+    """
+    Runs every crop through the landmark network on its own. For processes that handle
+    one frame at a time (inference workers), where no batch can form and waiting for
+    one only adds HAND_BATCH_MAX_DELAY_MS. Call before the first processor is created.
+    """
+    global _landmark_batching
+    _landmark_batching = False
+
+
+def shared_landmark_model():
+    """
+    Returns:
+        BatchingClassifier or HandLandmarkModel: The hand landmark network, batching crops
+            across sessions unless disable_landmark_batching() was called.
+    """
+    global _landmark_model
+    with _landmark_model_lock:
+        if _landmark_model is None:
+            from model import BatchingClassifier, HandLandmarkModel
+            from model.hand_landmark.hand_landmark_model import mediapipe_model_path
+            _landmark_model = HandLandmarkModel(mediapipe_model_path(HAND_BATCH_MODEL))
+            if _landmark_batching:
+                _landmark_model = BatchingClassifier(_landmark_model, HAND_BATCH_MAX_DELAY_MS, HAND_BATCH_MAX_SIZE)
+        return _landmark_model
+
+
+def create_batched_hand_processor(model_complexity=HAND_MODEL_COMPLEXITY):
+    """
+    Args:
+        model_complexity (int): Landmark model of the palm detection graph.
+
+    Returns:
+        BatchedHandProcessor: Processor on the shared landmark network, configured from constants.py.
+    """
+    detector = HandProcessor(HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE,
+                             model_complexity, static_image_mode=True)
+    return BatchedHandProcessor(shared_landmark_model(), detector, HAND_MIN_TRACKING_CONFIDENCE)
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+
+import cv2 as cv
+import mediapipe as mp
+from mediapipe.tasks.python import BaseOptions
+from mediapipe.tasks.python.vision import HandLandmarker, HandLandmarkerOptions, RunningMode
+
+from mediapipe_helpers.utils import NO_HANDS, HandLandmarks, HandResults
+
+VIDEO = "video"
+LIVE_STREAM = "live_stream"
+
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/latest/hand_landmarker.task"
+
+
+def _to_results(result):
+    if result is None or not result.hand_landmarks:
+        return NO_HANDS
+    return HandResults([HandLandmarks(hand) for hand in result.hand_landmarks], result.handedness)
+
+
+class HandLandmarkerProcessor:
+    def __init__(self, model_path, mode=VIDEO, min_detection_confidence=0.7,
+                 min_presence_confidence=0.5, min_tracking_confidence=0.5):
+        """
+        HandProcessor backed by the MediaPipe Tasks HandLandmarker instead of the legacy
+        mp.solutions.hands graph. Returns results with the same landmark structure.
+
+        Args:
+            model_path (str): hand_landmarker.task model bundle (see MODEL_URL).
+            mode (str): VIDEO runs each frame synchronously with monotonic timestamps.
+                LIVE_STREAM only queues the frame and returns the newest result delivered
+                by the landmarker's callback, so process() never waits for inference;
+                results lag at least one frame and busy frames are dropped by Mediapipe.
+            min_detection_confidence (float): Palm detection score to accept a hand.
+            min_presence_confidence (float): Landmark presence score below which the hand
+                counts as lost and palm detection runs again.
+            min_tracking_confidence (float): Tracking score to keep following a hand.
+        """
+        if mode not in (VIDEO, LIVE_STREAM):
+            raise ValueError(f"Unknown HandLandmarker mode: {mode}")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"HandLandmarker model not found at {model_path}, download it from {MODEL_URL}")
+        with open(model_path, "rb") as model_file:
+            self._model = model_file.read()  # Kept in memory so reset() does not read the file again
+
+        self.mode = mode
+        self.asynchronous = mode == LIVE_STREAM
+        self._confidences = (min_detection_confidence, min_presence_confidence, min_tracking_confidence)
+
+        self._lock = threading.Lock()
+        self._generation = 0        # Results of a landmarker replaced by reset() are ignored
+        self._last_timestamp_ms = -1
+        self._latest = NO_HANDS     # LIVE_STREAM: newest result delivered by the callback
+        self.landmarker = self._create()
+
+        # Tasks do not report when palm detection ran; as with HandProcessor, a frame
+        # following one without a hand counts as a detection
+        self._had_hand = False
+        self.detections = 0
+        self.tracked = 0
+        self._submitted = 0  # LIVE_STREAM frames queued and results delivered
+        self._delivered = 0
+        self.used = False
+
+    def _create(self):
+        detection, presence, tracking = self._confidences
+        generation = self._generation
+        options = HandLandmarkerOptions(
+            base_options=BaseOptions(model_asset_buffer=self._model),
+            running_mode=RunningMode.LIVE_STREAM if self.asynchronous else RunningMode.VIDEO,
+            num_hands=1,
+            min_hand_detection_confidence=detection,
+            min_hand_presence_confidence=presence,
+            min_tracking_confidence=tracking,
+            result_callback=(lambda result, image, timestamp_ms: self._deliver(generation, result))
+            if self.asynchronous else None,
+        )
+        return HandLandmarker.create_from_options(options)
+
+    def _timestamp_ms(self):
+        # Tasks reject timestamps that do not increase, even across sessions sharing an instance
+        timestamp_ms = max(int(time.monotonic() * 1000), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    def _count(self, results):
+        if self._had_hand:
+            self.tracked += 1
+        else:
+            self.detections += 1
+        self._had_hand = bool(results.multi_hand_landmarks)
+
+    def _deliver(self, generation, result):
+        # Called on a Mediapipe thread in LIVE_STREAM mode
+        results = _to_results(result)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._latest = results
+            self._delivered += 1
+            self._count(results)
+
+    def process(self, image, is_rgb=False):
+        """
+        Processes the image with the HandLandmarker to extract hand landmarks.
+
+        Args:
+            image (np.ndarray): Input image.
+            is_rgb (bool): True if the image is already RGB, False if it is BGR.
+
+        Returns:
+            HandResults: Hands found in this frame (VIDEO), or the newest result
+                available from an earlier frame (LIVE_STREAM).
+        """
+        image_rgb = image if is_rgb else cv.cvtColor(image, cv.COLOR_BGR2RGB)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+        self.used = True
+
+        if self.asynchronous:
+            with self._lock:
+                landmarker = self.landmarker
+                timestamp_ms = self._timestamp_ms()
+                self._submitted += 1
+                results = self._latest
+            landmarker.detect_async(mp_image, timestamp_ms)
+            return results
+
+        results = _to_results(self.landmarker.detect_for_video(mp_image, self._timestamp_ms()))
+        self._count(results)
+        return results
+
+    def set_model_complexity(self, model_complexity):
+        """
+        A .task bundle holds a single landmark model: nothing to switch.
+        """
+
+    def reset_tracking(self):
+        """
+        Replaces the landmarker so the next frame runs palm detection instead of
+        following the previous hand, keeping the stats.
+        """
+        with self._lock:
+            old = self.landmarker
+            self._generation += 1
+            self._latest = NO_HANDS
+            self._had_hand = False
+            self._submitted = self._delivered  # Frames in flight belong to the old landmarker
+        old.close()
+        landmarker = self._create()
+        with self._lock:
+            self.landmarker = landmarker
+
+    def reset(self):
+        """
+        Replaces the landmarker so the next frame starts without a tracked hand. Tasks
+        have no reset of their own; the model is rebuilt from memory, not from disk.
+        """
+        with self._lock:
+            old = self.landmarker
+            self._generation += 1
+            self._latest = NO_HANDS
+            self._had_hand = False
+            self.detections = 0
+            self.tracked = 0
+            self._submitted = 0
+            self._delivered = 0
+            self.used = False
+        old.close()
+        landmarker = self._create()
+        with self._lock:
+            self.landmarker = landmarker
+
+    def close(self):
+        self.landmarker.close()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Calls that ran palm detection vs. only tracked the previous hand, and in
+                LIVE_STREAM mode the frames dropped while the landmarker was busy.
+        """
+        with self._lock:
+            calls = self.detections + self.tracked
+            stats = {
+                "detections": self.detections,
+                "tracked": self.tracked,
+                "detection_rate": round(self.detections / calls, 3) if calls else 0.0,
+            }
+            if self.asynchronous:
+                # Frames in flight are not dropped yet, hence the lower bound of 0
+                stats["dropped"] = max(0, self._submitted - self._delivered - 1)
+            return stats
@@ -1,27 +1,168 @@
 import mediapipe as mp
 import cv2 as cv
 
+from constants import (HAND_BACKEND, HAND_BATCH_MAX_SIZE, HAND_LANDMARKER_MODE, HAND_LANDMARKER_MODEL,
+                       HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_PRESENCE_CONFIDENCE,
+                       HAND_MIN_TRACKING_CONFIDENCE, HAND_MODEL_COMPLEXITY)
+
 mp_hands = mp.solutions.hands
 
 
 class HandProcessor:
-    def __init__(self):
-        self.hands = mp_hands.Hands(
-            static_image_mode=False,
+    asynchronous = False  # Results always belong to the frame just processed
+
+    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.5, model_complexity=1,
+                 static_image_mode=False):
+        self.static_image_mode = static_image_mode  # Palm detection on every frame
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.model_complexity = model_complexity
+        self.hands = self._create_hands()
+
+        # With static_image_mode=False the palm detector only runs when there is no hand
+        # from the previous frame to track, so a call after a miss counts as a detection
+        self._had_hand = False
+        self.detections = 0
+        self.tracked = 0
+        self.used = False  # Processed a frame since the last reset
+
+    def _create_hands(self):
+        return mp_hands.Hands(
+            static_image_mode=self.static_image_mode,
             max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5,
+            model_complexity=self.model_complexity,
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
         )
 
-    def process(self, image):
+    def set_model_complexity(self, model_complexity):
+        """
+        Switches between the lite (0) and full (1) landmark model. The graph is rebuilt,
+        so the next frame runs palm detection again; a no-op if nothing changes.
+        """
+        if model_complexity == self.model_complexity:
+            return
+        self.hands.close()
+        self.model_complexity = model_complexity
+        self.hands = self._create_hands()
+        self._had_hand = False
+
+    def process(self, image, is_rgb=False):
         """
         Processes the image with Mediapipe to extract hand landmarks.
 
         Args:
             image (np.ndarray): Input image.
+            is_rgb (bool): True if the image is already RGB, False if it is BGR.
 
         Returns:
             mediapipe.python.solutions.hands.Hands.process: Mediapipe result object.
         """
-        image_rgb = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-        return self.hands.process(image_rgb)
\ No newline at end of file
+        image_rgb = image if is_rgb else cv.cvtColor(image, cv.COLOR_BGR2RGB)
+        results = self.hands.process(image_rgb)
+        self.used = True
+
+        if self._had_hand:
+            self.tracked += 1
+        else:
+            self.detections += 1
+        self._had_hand = bool(results.multi_hand_landmarks)
+        return results
+
+    def reset_tracking(self):
+        """
+        Restarts the Mediapipe graph so the next frame runs palm detection instead of
+        following the previous hand, e.g. when the next frame is cropped differently.
+        """
+        self.hands.reset()
+        self._had_hand = False
+
+    def reset(self):
+        """
+        Restarts the Mediapipe graph so the next frame starts without a tracked hand,
+        without loading the models again. Used before an instance moves to another session.
+        """
+        self.reset_tracking()
+        self.detections = 0
+        self.tracked = 0
+        self.used = False
+
+    def close(self):
+        self.hands.close()
+
+    @staticmethod
+    def empty_stats():
+        return {"detections": 0, "tracked": 0, "detection_rate": 0.0}
+
+    def stats(self):
+        """
+        Returns:
+            dict: Calls that ran palm detection vs. only tracked the previous hand.
+        """
+        calls = self.detections + self.tracked
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "detection_rate": round(self.detections / calls, 3) if calls else 0.0,
+        }
+
+
+def asynchronous_backend():
+    """
+    Returns:
+        bool: True if the configured backend returns results of earlier frames (Tasks in
+            LIVE_STREAM mode). Crops and optical flow must not be derived from them.
+    """
+    return HAND_BACKEND == "tasks" and HAND_LANDMARKER_MODE == "live_stream"
+
+
+def crops_hand():
+    """
+    Returns:
+        bool: True if the configured backend follows the hand with a crop of its own
+            (batched landmarks), which needs full frames rather than the pipeline's ROI.
+    """
+    return HAND_BACKEND == "batched"
+
+
+def inference_concurrency(concurrency):
+    """
+    Args:
+        concurrency (int): Frames to process at once with the other backends.
+
+    Returns:
+        int: At least HAND_BATCH_MAX_SIZE with the batched backend: its frames mostly wait
+            for the shared landmark batch, and fewer frames in flight would cap every batch.
+    """
+    return max(concurrency, HAND_BATCH_MAX_SIZE) if crops_hand() else concurrency
+
+
+def switches_model_complexity():
+    """
+    Returns:
+        bool: True if the configured backend has a lite and a full landmark model to switch
+            between. A Tasks .task bundle holds a single one.
+    """
+    return HAND_BACKEND != "tasks"
+
+
+def create_hand_processor(model_complexity=HAND_MODEL_COMPLEXITY):
+    """
+    Args:
+        model_complexity (int): 0 lite, 1 full landmark model; ignored by the Tasks backend.
+
+    Returns:
+        HandProcessor, HandLandmarkerProcessor or BatchedHandProcessor: Backend selected by
+            HAND_BACKEND in constants.py.
+    """
+    if HAND_BACKEND == "tasks":
+        from mediapipe_helpers.hand_landmarker import HandLandmarkerProcessor
+        return HandLandmarkerProcessor(HAND_LANDMARKER_MODEL, HAND_LANDMARKER_MODE,
+                                       HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_PRESENCE_CONFIDENCE,
+                                       HAND_MIN_TRACKING_CONFIDENCE)
+    if HAND_BACKEND == "batched":
+        from mediapipe_helpers.batched_landmarks import create_batched_hand_processor
+        return create_batched_hand_processor(model_complexity)
+    if HAND_BACKEND != "solutions":
+        raise ValueError(f"Unknown HAND_BACKEND: {HAND_BACKEND}")
+    return HandProcessor(HAND_MIN_DETECTION_CONFIDENCE, HAND_MIN_TRACKING_CONFIDENCE, model_complexity)
@@ -0,0 +1,292 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+from constants import (HAND_MODEL_COMPLEXITY, HAND_POOL_INSTANCE_MEMORY_MB, HAND_POOL_LITE_SIZE,
+                       HAND_POOL_MAX_MEMORY_MB, HAND_POOL_SIZE, QOS_ENABLED)
+from helper.Logger import Logger
+from mediapipe_helpers.hand_processor import HandProcessor, create_hand_processor, switches_model_complexity
+
+
+def _rss_bytes():
+    # Resident memory of this process, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class HandProcessorLease:
+    def __init__(self, pool):
+        """
+        A session's claim on a HandProcessor of the pool. Used in place of a HandProcessor.
+        If the pool hands the instance to another session while this one is idle, the
+        next frame checks out a warm instance again.
+        """
+        self._pool = pool
+        self._processor = None
+        self._busy = False
+        self._model_complexity = None  # Landmark model the session asked for, None for the default
+        self._reset_tracking = False
+
+    def set_model_complexity(self, model_complexity):
+        """
+        Switches to the lite (0) or full (1) landmark model. Rather than rebuilding the
+        graph, the next frame swaps to a warm instance of that model; while the pool has
+        none, frames keep the current instance and the swap is tried again.
+        """
+        self._model_complexity = model_complexity
+
+    def process(self, image, is_rgb=False):
+        processor = self._pool._begin(self)
+        try:
+            if self._reset_tracking:
+                self._reset_tracking = False
+                processor.reset_tracking()  # The pool had no warm instance to swap in
+            return processor.process(image, is_rgb)
+        finally:
+            self._pool._end(self)
+
+    def reset_tracking(self):
+        # Applied on the next frame: swaps to a warm instance, which follows no hand, and
+        # the old one is reset in the background instead of restarting its graph inline
+        self._reset_tracking = True
+
+    def stats(self):
+        processor = self._processor
+        return processor.stats() if processor is not None else HandProcessor.empty_stats()
+
+    def release(self):
+        """
+        Give the instance back to the pool, e.g. when the session disconnects.
+        """
+        self._pool._release(self)
+
+
+class HandProcessorPool:
+    def __init__(self, size=4, max_memory_mb=1024, instance_memory_mb=40, factory=create_hand_processor,
+                 sizes=None):
+        """
+        Pool of pre-initialized HandProcessors, so a new connection does not pay for
+        loading the Mediapipe graph on its first frame.
+        Sessions check an instance out on connect and give it back on disconnect; its
+        tracking state is reset on the pool's thread, so a disconnect never waits for
+        the Mediapipe graph to restart. Once the memory ceiling is reached, the instance
+        of the least recently active session is handed over instead.
+        Idle instances are kept per landmark model, so a session switching between the
+        full and lite model swaps instances instead of rebuilding its graph.
+        :param size: Idle instances kept warm for new sessions.
+        :param max_memory_mb: Memory all instances together may use.
+        :param instance_memory_mb: Memory of one instance until it has been measured.
+        :param factory: Creates a HandProcessor of the configured backend for a model_complexity.
+        :param sizes: Idle instances kept warm per model_complexity; the first one is the
+                      default for new sessions. Defaults to size instances of HAND_MODEL_COMPLEXITY.
+        """
+        self.sizes = dict(sizes or {HAND_MODEL_COMPLEXITY: size})
+        self.default_complexity = next(iter(self.sizes))
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.instance_memory = instance_memory_mb * 1024 * 1024
+        self._factory = factory
+        self._logger = Logger()
+
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._idle = {complexity: deque() for complexity in self.sizes}  # Warm instances, reset
+        self._returned = deque()       # Released instances waiting to be reset in the background
+        self._leases = OrderedDict()   # Checked out leases, least recently used first
+        self._instances = 0            # Created or being created
+
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.swapped = 0
+        self.tracking_swaps = 0
+
+    @property
+    def max_instances(self):
+        return max(1, self.max_memory // self.instance_memory)
+
+    def start(self):
+        """
+        Warm up the idle instances in the background and keep them topped up.
+        """
+        threading.Thread(target=self._keep_warm, name="hand-processor-pool", daemon=True).start()
+        self._refill.set()
+        return self
+
+    def acquire(self):
+        """
+        :return: HandProcessorLease holding a warm instance (created on the spot only
+                 if the pool has none left).
+        """
+        lease = HandProcessorLease(self)
+        with self._lock:
+            processor = self._take(lease, self.default_complexity)
+        lease._processor = self._prepare(processor, self.default_complexity)
+        return lease
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": {complexity: len(idle) for complexity, idle in self._idle.items()},
+                "returned": len(self._returned),
+                "leased": len(self._leases),
+                "instances": self._instances,
+                "max_instances": self.max_instances,
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "swapped": self.swapped,
+                "tracking_swaps": self.tracking_swaps,
+            }
+
+    def _key(self, model_complexity):
+        # Backends with a single model (Tasks) only have the default key
+        return model_complexity if model_complexity in self.sizes else self.default_complexity
+
+    def _complexity(self, processor):
+        return self._key(getattr(processor, "model_complexity", None))
+
+    def _take(self, lease, complexity):
+        # Called with the lock held; None means a new instance has to be created
+        self._leases[lease] = None
+        self._refill.set()
+        if self._idle[complexity]:
+            self.reused += 1
+            return self._idle[complexity].popleft()
+        if self._returned:
+            self.reused += 1
+            return self._returned.popleft()  # Not reset yet: _prepare does it
+        if self._instances < self.max_instances:
+            self._instances += 1
+            return None
+        for idle in self._idle.values():
+            if idle:
+                self.reused += 1
+                return idle.popleft()  # Other landmark model: the next frame swaps it if it can
+
+        # At the ceiling: take over the instance of the least recently active session
+        for victim in self._leases:
+            if victim is not lease and victim._processor is not None and not victim._busy:
+                processor, victim._processor = victim._processor, None
+                self.evicted += 1
+                return processor
+
+        # Every instance is busy right now: go over the ceiling rather than stall a call
+        self._logger.log("RAHMANIA - Hand processor pool above its memory ceiling.")
+        self._instances += 1
+        return None
+
+    def _prepare(self, processor, complexity):
+        if processor is None:
+            processor = self._create(complexity)
+        elif processor.used:
+            processor.reset()  # Taken from another session: forget its hand
+        return processor
+
+    def _create(self, complexity):
+        before = _rss_bytes()
+        processor = self._factory(complexity)
+        after = _rss_bytes()
+        with self._lock:
+            self.created += 1
+            if before is not None and after is not None and after > before and self.created == 2:
+                # Measure the second instance: the first one also pays for one-off runtime
+                # start-up, and later ones may overlap with other allocations
+                self.instance_memory = after - before
+        return processor
+
+    def _begin(self, lease):
+        with self._lock:
+            complexity = self._key(lease._model_complexity)
+            processor = lease._processor
+            if processor is None:
+                processor = self._take(lease, complexity)
+                lease._reset_tracking = False  # Idle or reset by _prepare
+            elif self._complexity(processor) != complexity:
+                # Swap for a warm instance of the requested model; the old one is reset in
+                # the background. Without one, keep going and try again on the next frame.
+                if self._idle[complexity]:
+                    self._returned.append(processor)
+                    lease._processor = processor = self._idle[complexity].popleft()
+                    lease._reset_tracking = False
+                    self.swapped += 1
+                self._refill.set()
+            elif lease._reset_tracking and self._idle[complexity]:
+                self._returned.append(processor)
+                lease._processor = processor = self._idle[complexity].popleft()
+                lease._reset_tracking = False
+                self.tracking_swaps += 1
+                self._refill.set()
+            lease._busy = True
+            self._leases[lease] = None
+            self._leases.move_to_end(lease)
+        if lease._processor is None:
+            lease._processor = processor = self._prepare(processor, complexity)
+        return processor
+
+    def _end(self, lease):
+        with self._lock:
+            lease._busy = False
+
+    def _release(self, lease):
+        with self._lock:
+            processor, lease._processor = lease._processor, None
+            self._leases.pop(lease, None)
+            if processor is None:
+                return
+            surplus = self._instances > self.max_instances
+            if surplus:
+                self._instances -= 1
+            else:
+                self._returned.append(processor)
+        if surplus:
+            processor.close()
+        else:
+            self._refill.set()  # Reset and made idle by _keep_warm
+
+    def _missing(self):
+        # Called with the lock held: the model an idle instance is needed for, or None
+        if self._instances >= self.max_instances:
+            return None
+        for complexity, size in self.sizes.items():
+            if len(self._idle[complexity]) < size:
+                return complexity
+        return None
+
+    def _keep_warm(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            while True:
+                with self._lock:
+                    if not self._returned:
+                        break
+                    processor = self._returned.popleft()
+                processor.reset()
+                with self._lock:
+                    self._idle[self._complexity(processor)].append(processor)
+            while True:
+                with self._lock:
+                    complexity = self._missing()
+                    if complexity is None:
+                        break
+                    self._instances += 1
+                processor = self._create(complexity)
+                with self._lock:
+                    self._idle[complexity].append(processor)
+
+
+def create_hand_processor_pool():
+    """
+    Returns:
+        HandProcessorPool: Pool configured from constants.py, warming up in the background.
+            With QoS on, lite instances are kept warm as well for sessions stepped down
+            to model_complexity 0.
+    """
+    sizes = {HAND_MODEL_COMPLEXITY: HAND_POOL_SIZE}
+    if QOS_ENABLED and switches_model_complexity() and HAND_MODEL_COMPLEXITY != 0:
+        sizes[0] = HAND_POOL_LITE_SIZE
+    return HandProcessorPool(HAND_POOL_SIZE, HAND_POOL_MAX_MEMORY_MB, HAND_POOL_INSTANCE_MEMORY_MB,
+                             sizes=sizes).start()
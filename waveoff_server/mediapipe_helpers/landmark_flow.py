@@ -0,0 +1,130 @@
+import cv2 as cv
+import numpy as np
+
+from constants import (LANDMARK_FLOW_ENABLED, LANDMARK_FLOW_KEYFRAME_INTERVAL,
+                       LANDMARK_FLOW_MAX_FB_ERROR, LANDMARK_FLOW_MIN_CONFIDENCE)
+from mediapipe_helpers.hand_processor import asynchronous_backend
+
+
+class LandmarkFlowTracker:
+    def __init__(self, keyframe_interval=3, min_confidence=0.9, max_fb_error=1.0,
+                 win_size=(15, 15), max_level=2):
+        """
+        Moves the 21 hand landmarks of the last keyframe along the pyramidal Lucas-Kanade
+        optical flow, so Mediapipe only has to run every keyframe_interval frames.
+
+        Args:
+            keyframe_interval (int): Frames per full Mediapipe inference (1 tracks nothing).
+            min_confidence (float): Fraction of landmarks that must be tracked reliably;
+                below it the frame becomes a keyframe.
+            max_fb_error (float): Forward-backward error in pixels above which a landmark
+                counts as lost.
+            win_size (tuple): Search window of calcOpticalFlowPyrLK.
+            max_level (int): Pyramid levels of calcOpticalFlowPyrLK.
+        """
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence
+        self.max_fb_error = max_fb_error
+        self.lk_params = dict(winSize=win_size, maxLevel=max_level,
+                              criteria=(cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, 10, 0.03))
+
+        self._gray = None       # Grayscale frame of the current call
+        self._prev_gray = None  # Grayscale frame the points belong to
+        self._points = None     # N x 1 x 2 float32 landmarks in full frame coordinates
+        self._since_keyframe = 0
+
+        self.keyframes = 0
+        self.tracked = 0
+        self.lost = 0
+
+    def reset(self):
+        self._points = None
+
+    def track(self, image, is_rgb=False):
+        """
+        Converts the frame to grayscale and, unless a keyframe is due, tracks the
+        landmarks into it.
+
+        Args:
+            image (np.ndarray): Full frame, BGR or RGB.
+            is_rgb (bool): True if the frame is RGB.
+
+        Returns:
+            list: 21 [x, y] landmarks in frame coordinates, or None if this frame must
+                go through Mediapipe (call start() with its landmarks afterwards).
+        """
+        if self.keyframe_interval <= 1:
+            # Every frame is a keyframe; forget the last gray frame so tracking
+            # restarts cleanly if the interval is raised again
+            self._gray = None
+            return None
+
+        # The frame before last is no longer needed: convert into its buffer
+        buffer = self._prev_gray
+        if buffer is not None and buffer.shape != image.shape[:2]:
+            buffer = None
+        self._prev_gray = self._gray
+        self._gray = cv.cvtColor(image, cv.COLOR_RGB2GRAY if is_rgb else cv.COLOR_BGR2GRAY, dst=buffer)
+
+        if self._points is None or self._since_keyframe + 1 >= self.keyframe_interval \
+                or self._prev_gray is None or self._prev_gray.shape != self._gray.shape:
+            return None
+
+        points, status, _ = cv.calcOpticalFlowPyrLK(self._prev_gray, self._gray, self._points, None,
+                                                    **self.lk_params)
+        back, back_status, _ = cv.calcOpticalFlowPyrLK(self._gray, self._prev_gray, points, None,
+                                                       **self.lk_params)
+        fb_error = np.linalg.norm((back - self._points).reshape(-1, 2), axis=1)
+        reliable = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.max_fb_error)
+        if np.count_nonzero(reliable) < self.min_confidence * len(reliable):
+            # Tracking confidence dropped: fall back to a keyframe
+            self.lost += 1
+            self._points = None
+            return None
+
+        self._points = points
+        self._since_keyframe += 1
+        self.tracked += 1
+        height, width = self._gray.shape
+        return [[min(max(int(x), 0), width - 1), min(max(int(y), 0), height - 1)]
+                for x, y in points.reshape(-1, 2)]
+
+    def start(self, landmark_list):
+        """
+        Makes the frame of the last track() call a keyframe.
+
+        Args:
+            landmark_list (list): Landmarks Mediapipe found in it, in frame coordinates.
+        """
+        self._points = np.array(landmark_list, dtype=np.float32).reshape(-1, 1, 2)
+        self._since_keyframe = 0
+        self.keyframes += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Keyframes, tracked frames and tracking losses.
+        """
+        frames = self.keyframes + self.tracked
+        return {
+            "keyframes": self.keyframes,
+            "tracked": self.tracked,
+            "lost": self.lost,
+            "tracked_ratio": round(self.tracked / frames, 3) if frames else 0.0,
+        }
+
+
+def create_landmark_tracker(keyframe_interval=None):
+    """
+    Args:
+        keyframe_interval (int): Interval to track at even if keyframe mode is disabled
+            in constants.py (e.g. a degraded quality profile).
+
+    Returns:
+        LandmarkFlowTracker: Tracker configured from constants.py, or None if disabled or if
+            the hand backend's keyframe landmarks would belong to an earlier frame.
+    """
+    if asynchronous_backend() or (not LANDMARK_FLOW_ENABLED and keyframe_interval is None):
+        return None
+    return LandmarkFlowTracker(keyframe_interval or LANDMARK_FLOW_KEYFRAME_INTERVAL,
+                               LANDMARK_FLOW_MIN_CONFIDENCE, LANDMARK_FLOW_MAX_FB_ERROR)
@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+import numpy as np
+
+from constants import ROI_ENABLED, ROI_MIN_SIZE, ROI_PADDING
+from mediapipe_helpers.hand_processor import asynchronous_backend, crops_hand
+
+# Region (x1, y1, x2, y2) of a frame of frame_width x frame_height pixels
+Roi = namedtuple("Roi", ["x1", "y1", "x2", "y2", "frame_width", "frame_height"])
+
+
+def crop(image, roi):
+    """
+    Cuts a region out of a full frame.
+
+    Args:
+        image (np.ndarray): Full frame.
+        roi (Roi): Region of the frame.
+
+    Returns:
+        np.ndarray: Contiguous copy of the region, as Mediapipe expects.
+    """
+    return np.ascontiguousarray(image[roi.y1:roi.y2, roi.x1:roi.x2])
+
+
+class RoiTracker:
+    def __init__(self, padding=0.5, min_size=64):
+        """
+        Keeps a square region of interest around the hand of the previous frame, so the
+        next frame only needs that crop processed.
+        The region is anchored when a hand is found and stays put while that hand is
+        tracked: Mediapipe follows the hand in the coordinates of its previous input, so
+        moving the crop would cost a palm detection. It is anchored again once the hand
+        is lost in the crop and found on the full frame.
+
+        Args:
+            padding (float): Extra space around the hand box, relative to its longer side.
+            min_size (int): Smallest side of the region in pixels.
+        """
+        self.padding = padding
+        self.min_size = min_size
+        self.roi = None
+
+    def reset(self):
+        self.roi = None
+
+    def update(self, brect, frame_width, frame_height):
+        """
+        Anchors the region on the hand found in the last frame, unless it already is.
+
+        Args:
+            brect (list): Hand bounding box [x1, y1, x2, y2] in frame coordinates,
+                or None if no hand was found.
+            frame_width (int): Width of the full frame.
+            frame_height (int): Height of the full frame.
+
+        Returns:
+            Roi: The region for the next frame, or None to process the full frame.
+        """
+        if brect is None:
+            self.roi = None
+            return None
+
+        roi = self.roi
+        if roi is not None and (roi.frame_width, roi.frame_height) == (frame_width, frame_height):
+            return roi  # Still tracking the hand it was anchored on
+
+        x1, y1, x2, y2 = brect
+        # Square around the hand, shifted (and if needed shrunk) to stay inside the frame
+        side = max(x2 - x1, y2 - y1)
+        side = int(max(self.min_size, side * (1 + 2 * self.padding)))
+        side = min(side, frame_width, frame_height)
+        center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
+        left = min(max(0, center_x - side // 2), frame_width - side)
+        top = min(max(0, center_y - side // 2), frame_height - side)
+
+        if side * side >= frame_width * frame_height // 2:
+            # The region would cover most of the frame: not worth cropping
+            self.roi = None
+        else:
+            self.roi = Roi(left, top, left + side, top + side, frame_width, frame_height)
+        return self.roi
+
+
+def create_roi_tracker():
+    """
+    Returns:
+        RoiTracker: Tracker configured from constants.py, or None if disabled, if the hand
+            backend's results lag behind the frames (the crop would follow an old hand) or
+            if the backend crops the hand itself.
+    """
+    if not ROI_ENABLED or asynchronous_backend() or crops_hand():
+        return None
+    return RoiTracker(ROI_PADDING, ROI_MIN_SIZE)
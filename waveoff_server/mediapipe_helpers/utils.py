@@ -1,16 +1,32 @@
+from collections import namedtuple
+
 import numpy as np
 import cv2 as cv
 
-def calc_bounding_rect(image, landmarks):
-    image_width, image_height = image.shape[1], image.shape[0]
-    landmark_array = np.array([[min(int(p.x * image_width), image_width - 1),
-                                min(int(p.y * image_height), image_height - 1)]
-                               for p in landmarks.landmark], dtype=int)
-    x, y, w, h = cv.boundingRect(landmark_array)
+# Same shape as the result of mp.solutions.hands.Hands.process, as far as the pipeline
+# uses it, for backends that do not run the legacy graph: multi_hand_landmarks is a
+# list of hands, each with .landmark holding 21 points with normalized x, y and z
+Landmark = namedtuple("Landmark", ["x", "y", "z"])
+HandLandmarks = namedtuple("HandLandmarks", ["landmark"])
+HandResults = namedtuple("HandResults", ["multi_hand_landmarks", "multi_handedness"])
+
+NO_HANDS = HandResults(None, None)
+
+def _region(image, roi):
+    # Landmarks are normalized to the image Mediapipe saw: the full frame, or a region of it
+    if roi is None:
+        return 0, 0, image.shape[1], image.shape[0], image.shape[1], image.shape[0]
+    return roi.x1, roi.y1, roi.x2 - roi.x1, roi.y2 - roi.y1, roi.frame_width, roi.frame_height
+
+def calc_bounding_rect(image, landmarks, roi=None):
+    return calc_landmark_bounding_rect(calc_landmark_list(image, landmarks, roi))
+
+def calc_landmark_bounding_rect(landmark_list):
+    x, y, w, h = cv.boundingRect(np.array(landmark_list, dtype=int))
     return [x, y, x + w, y + h]
 
-def calc_landmark_list(image, landmarks):
-    image_width, image_height = image.shape[1], image.shape[0]
-    return [[min(int(p.x * image_width), image_width - 1),
-             min(int(p.y * image_height), image_height - 1)]
-            for p in landmarks.landmark]
\ No newline at end of file
+def calc_landmark_list(image, landmarks, roi=None):
+    left, top, region_width, region_height, image_width, image_height = _region(image, roi)
+    return [[min(left + int(p.x * region_width), image_width - 1),
+             min(top + int(p.y * region_height), image_height - 1)]
+            for p in landmarks.landmark]
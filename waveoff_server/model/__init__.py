@@ -1,2 +1,4 @@
 from model.keypoint_classifier.keypoint_classifier import KeyPointClassifier
-from model.point_history_classifier.point_history_classifier import PointHistoryClassifier
\ No newline at end of file
+from model.point_history_classifier.point_history_classifier import PointHistoryClassifier
+from model.batching_classifier import BatchingClassifier
+from model.hand_landmark.hand_landmark_model import HandLandmarkModel
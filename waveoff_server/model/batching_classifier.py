@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+class BatchingClassifier(object):
+    def __init__(
+        self,
+        classifier,
+        max_delay_ms=2.0,
+        max_batch_size=64,
+    ):
+        """
+        Shares one classifier between sessions and runs the feature vectors they
+        submit within max_delay_ms of each other as a single batched invoke.
+        A request is not held back when nothing else is queued and the previous one
+        arrived more than max_delay_ms earlier, as waiting would not batch anything.
+        Drop-in replacement for calling the classifier directly.
+        """
+        self.classifier = classifier
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()  # batch size -> number of invokes
+        self.max_wait_ms = 0.0
+        self.immediate = 0  # Requests dispatched without waiting for others
+
+        self._thread = threading.Thread(target=self._run, name="batching-classifier", daemon=True)
+        self._thread.start()
+
+    def __call__(
+        self,
+        features,
+    ):
+        future = Future()
+        self._queue.put((features, time.monotonic(), future))
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            invokes = sum(self.batch_sizes.values())
+            items = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                "invokes": invokes,
+                "items": items,
+                "mean_batch_size": round(items / invokes, 2) if invokes else 0.0,
+                "batch_sizes": dict(self.batch_sizes),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "immediate": self.immediate,
+            }
+
+    def _run(self):
+        last_arrival = float("-inf")
+        while True:
+            # Wait for the first request, then collect others until its deadline
+            batch = [self._queue.get()]
+            # Requests further apart than the delay (a lone session, or sessions out of
+            # step with each other) would not batch: dispatch without waiting
+            immediate = self._queue.empty() and batch[0][1] - last_arrival > self.max_delay
+            deadline = batch[0][1] + (0.0 if immediate else self.max_delay)
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            last_arrival = max(arrival for _, arrival, _ in batch)
+
+            try:
+                results = self.classifier.classify_batch([features for features, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            now = time.monotonic()
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+                self.immediate += immediate
+                self.max_wait_ms = max(self.max_wait_ms, (now - batch[0][1]) * 1000.0)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+
+from model.tflite_batch import TfliteBatchModel
+
+
+def mediapipe_model_path(variant='full'):
+    """
+    Path of the hand landmark network shipped with the mediapipe package
+    ('full' or 'lite', the models behind model_complexity 1 and 0).
+    """
+    import mediapipe
+    return os.path.join(os.path.dirname(mediapipe.__file__), 'modules', 'hand_landmark',
+                        f'hand_landmark_{variant}.tflite')
+
+
+class HandLandmarkModel(TfliteBatchModel):
+    def __init__(
+        self,
+        model_path=None,
+        num_threads=1,
+    ):
+        """
+        Mediapipe's hand landmark network on its own, without the graph around it,
+        so several hand crops can run through it in one invoke.
+        """
+        super().__init__(model_path or mediapipe_model_path(), num_threads)
+        self.input_size = int(self.input_details[0]['shape'][1])  # Square crops, 224 pixels
+
+    def __call__(
+        self,
+        crop,
+    ):
+        return self.classify_batch([crop])[0]
+
+    def classify_batch(
+        self,
+        crops,
+    ):
+        """
+        Runs input_size x input_size RGB crops (uint8) through the network with a single
+        invoke; named like the classifiers' method so a BatchingClassifier can share it.
+        Returns (landmarks, presence) per crop: 21 x 3 landmarks in crop pixels and
+        the hand presence score.
+        """
+        count = len(crops)
+        self._invoke_batch(np.multiply(crops, 1.0 / 255.0, dtype=np.float32))
+
+        landmarks = self._output('Identity').reshape(self.batch_size, 21, 3)
+        presence = self._output('Identity_1').reshape(self.batch_size)
+        return [(landmarks[index], float(presence[index])) for index in range(count)]
+
+    def _output(self, name):
+        # Screen landmarks, hand presence, handedness and world landmarks, in that order
+        for details in self.output_details:
+            if details['name'] == name:
+                return self.interpreter.get_tensor(details['index'])
+        index = ['Identity', 'Identity_1', 'Identity_2', 'Identity_3'].index(name)
+        return self.interpreter.get_tensor(self.output_details[index]['index'])
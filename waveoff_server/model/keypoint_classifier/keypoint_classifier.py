@@ -1,27 +1,24 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import numpy as np
-import tensorflow as tf
 import csv
 
+from model.tflite_batch import TfliteBatchModel
 
-class KeyPointClassifier(object):
+
+class KeyPointClassifier(TfliteBatchModel):
     def __init__(
         self,
         model_path='model/keypoint_classifier/keypoint_classifier.tflite',
         num_threads=1,
     ):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
-
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        super().__init__(model_path, num_threads)
 
     def __call__(
         self,
         landmark_list,
     ):
+        self._resize_input(1)
         input_details_tensor_index = self.input_details[0]['index']
         self.interpreter.set_tensor(
             input_details_tensor_index,
@@ -36,6 +33,18 @@ class KeyPointClassifier(object):
 
         return result_index
     
+    def classify_batch(
+        self,
+        landmark_lists,
+    ):
+        """
+        Classifies several landmark lists with a single invoke.
+        The input is padded to a power of two so the interpreter is only
+        re-allocated when the batch grows past the previous bucket.
+        """
+        results = self._invoke_batch(landmark_lists)
+        return np.argmax(results, axis=1).tolist()
+
     @staticmethod
     def load_labels(filepath='model/keypoint_classifier/keypoint_classifier_label.csv'):
         with open(filepath, encoding='utf-8-sig') as f:
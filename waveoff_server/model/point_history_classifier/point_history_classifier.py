@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import numpy as np
-import tensorflow as tf
 import csv
 
+from model.tflite_batch import TfliteBatchModel
 
-class PointHistoryClassifier(object):
+
+class PointHistoryClassifier(TfliteBatchModel):
     def __init__(
         self,
         model_path='model/point_history_classifier/point_history_classifier.tflite',
@@ -13,12 +14,7 @@ class PointHistoryClassifier(object):
         invalid_value=0,
         num_threads=1,
     ):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
-
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        super().__init__(model_path, num_threads)
 
         self.score_th = score_th
         self.invalid_value = invalid_value
@@ -27,6 +23,7 @@ class PointHistoryClassifier(object):
         self,
         point_history,
     ):
+        self._resize_input(1)
         input_details_tensor_index = self.input_details[0]['index']
         self.interpreter.set_tensor(
             input_details_tensor_index,
@@ -44,6 +41,21 @@ class PointHistoryClassifier(object):
 
         return result_index
 
+    def classify_batch(
+        self,
+        point_histories,
+    ):
+        """
+        Classifies several point histories with a single invoke.
+        The input is padded to a power of two so the interpreter is only
+        re-allocated when the batch grows past the previous bucket.
+        """
+        results = self._invoke_batch(point_histories)
+        result_indexes = np.argmax(results, axis=1)
+        scores = results[np.arange(len(results)), result_indexes]
+        result_indexes[scores < self.score_th] = self.invalid_value
+        return result_indexes.tolist()
+
     @staticmethod
     def load_labels(filepath='model/point_history_classifier/point_history_classifier_label.csv'):
         with open(filepath, encoding='utf-8-sig') as f:
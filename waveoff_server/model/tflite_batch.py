@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+import tensorflow as tf
+
+
+class TfliteBatchModel(object):
+    def __init__(
+        self,
+        model_path,
+        num_threads=1,
+    ):
+        """
+        TFLite interpreter whose input can run several samples in one invoke.
+        Base of the classifiers and the hand landmark model.
+        """
+        self.interpreter = tf.lite.Interpreter(model_path=model_path,
+                                               num_threads=num_threads)
+
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.batch_size = 1
+
+    def _invoke_batch(self, inputs):
+        """
+        Runs inputs (samples along the first axis) with a single invoke and returns the
+        first output for them. The input is padded to a power of two so the interpreter
+        is only re-allocated when the batch grows past the previous bucket; other
+        outputs can be read with interpreter.get_tensor() until the next invoke.
+        """
+        batch = np.asarray(inputs, dtype=np.float32)
+        count = len(batch)
+        self._resize_input(1 << (count - 1).bit_length())
+
+        padded = np.zeros((self.batch_size,) + batch.shape[1:], dtype=np.float32)
+        padded[:count] = batch
+        self.interpreter.set_tensor(self.input_details[0]['index'], padded)
+        self.interpreter.invoke()
+
+        return self.interpreter.get_tensor(self.output_details[0]['index'])[:count]
+
+    def _resize_input(self, batch_size):
+        if batch_size == self.batch_size:
+            return
+        input_shape = list(self.input_details[0]['shape'])
+        input_shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self.input_details[0]['index'], input_shape)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.batch_size = batch_size
@@ -1,101 +1,179 @@
 import json
-import cv2
+import threading
 from flask import Flask
 from flask_sock import Sock
-import numpy as np  # Import Sock from flask_sock for WebSocket support
 from helper.Logger import Logger
-import main as kpc
-import base64
-import time
-from constants import WIDTH, HEIGHT  # Import constants
-import os
+from mediapipe_helpers.hand_processor import inference_concurrency
+from constants import INFERENCE_WORKERS, SESSION_IDLE_TIMEOUT_S, WORKER_HEALTH_CHECK_S, WORKER_REBALANCE_DEPTH
+from constants import SCHEDULER_CONCURRENCY, SUBSCRIBER_QUEUE_SIZE, SUBSCRIBER_MAX_OVERFLOWS
 
-from server_image_conversion import base64_to_image, is_valid_base64
-from server_observer import Observer
+from server_archive import create_frame_archive
+from server_mailbox import LatestFrameMailbox
+from server_observer import QueuedSubscriber
+from server_scheduler import InferenceScheduler
+from server_session import Session, SessionRegistry, hand_processor_pool
+from server_workers import InferenceWorkerPool
 
-app = Flask(__name__)
-sock = Sock(app)  # Initialize Sock with the Flask app
+# Live sessions, one per connected phone
+session_registry = SessionRegistry()
 
+# Shared subsystems, created at start-up under __main__ only: spawned inference
+# workers import this module as __mp_main__ and must not start their own
+# Background archive of sampled frames (mirrored RGB, batched into .npz segments)
+frame_archive = None
 
-# Create an instance of the Observer
-result_observer = Observer()
+# Process pool running gesture recognition, when INFERENCE_WORKERS > 0
+worker_pool = None
+
+# Which session's frame is processed next: ringing phones first, fair shares for the rest
+scheduler = None
 
 # Define a notification function for the WebSocket
-def notify_client_via_ws(ws):
+def notify_client_via_ws(ws, send_lock):
     def send_result(notification):
         """
-        Send the notification data to the WebSocket client.
-        :param notification: The notification data to send.
+        Send the notification to the WebSocket client.
+        :param notification: The encoded notification (JSON text or binary result).
         """
-        ws.send(json.dumps(notification))
+        with send_lock:
+            ws.send(notification)
 
     return send_result
 
-@sock.route('/opencv')
+
+def disconnect_slow_client(ws):
+    def disconnect():
+        """
+        Close a connection whose client keeps falling behind on results.
+        """
+        Logger().log("RAHMANIA - Client too slow for results, disconnecting.")
+        ws.close(reason=1008, message="Client too slow")
+
+    return disconnect
+
+
+def process_frames(session, notifier):
+    """
+    Processor thread of a connection: always takes the newest frame from the
+    session mailbox, so stale frames are dropped instead of queueing up.
+    Its messages are posted to the connection's notifier, so it never waits on the network.
+    """
+    logger = Logger()
+    while True:
+        # Wake up for held back results and heartbeats even when no frames arrive
+        slot = session.mailbox.take(timeout=session.observer.next_tick())
+        if slot is None:
+            if session.mailbox.closed:
+                break
+            session.observer.tick()
+            continue
+        try:
+            # Call the process_image function
+            result = session.process(slot)
+
+            # Notify this session's observer with the result
+            session.observer.notify(result)
+
+            # Periodically report received / processed / dropped frame counts
+            stats = session.stats_report()
+            if stats is not None:
+                notifier.post(stats)
+
+            # Ask the client to slow down, speed up or shrink its frames
+            control = session.control_report()
+            if control is not None:
+                notifier.post(control)
+
+            # Ask the client to send only the crop around the hand, or full frames again
+            roi = session.roi_report()
+            if roi is not None:
+                notifier.post(roi)
+        except Exception as e:
+            logger.log("RAHMANIA - Error:" + str(e))
+            notifier.post(json.dumps({"error": f"Processing failed: {str(e)}"}))
+
+
 def ws_opencv(ws):
     logger = Logger()
     #logger.log("RAHMAN - WebSocket connection established.")
+
+    # Results and replies are sent from both the receiver and the processor thread
+    send_lock = threading.Lock()
+
+    # Per-connection state: pipeline, observer, frame buffers, archive sampling, stats
+    session = Session(LatestFrameMailbox(), frame_archive, worker_pool, scheduler)
+    session_registry.add(session)
     
-    # Subscribe the WebSocket notification function to the Observer
-    ws_notifier = notify_client_via_ws(ws)
-    result_observer.subscribe(ws_notifier)
+    # Subscribe the WebSocket to the session's Observer through a bounded queue
+    # drained by its own sender thread, so processing never waits on the network
+    ws_notifier = QueuedSubscriber(notify_client_via_ws(ws, send_lock),
+                                   SUBSCRIBER_QUEUE_SIZE, SUBSCRIBER_MAX_OVERFLOWS,
+                                   on_slow=disconnect_slow_client(ws),
+                                   encode=session.encode_notification)
+    session.observer.subscribe(ws_notifier)
+
+    processor = threading.Thread(target=process_frames, args=(session, ws_notifier), daemon=True)
+    processor.start()
 
     try:
         while True:
             try:
-                # Receive the Base64-encoded message
-                message = ws.receive()
+                # Receive a binary frame, a Base64-encoded frame or a handshake;
+                # idle sessions time out and are evicted
+                message = ws.receive(timeout=SESSION_IDLE_TIMEOUT_S)
                 if not message:
                     break
 
-                # Validate Base64 data
-                if not is_valid_base64(message):
-                    logger.log("RAHMANIA - Invalid Base64 data received.")
-                    ws.send(json.dumps({"error": "Invalid Base64 data"}))
-                    continue
-
-                # Decode Base64 data
-                byte_data = base64.b64decode(message)
-
-                #Reshape into image
-                try:
-                    image_data = np.frombuffer(byte_data, dtype=np.uint8).reshape((HEIGHT, WIDTH, 3))
-                    # logger.log(f"RAHMANIA - Image reshaped successfully: {image_data.shape}")
-                except ValueError as e:
-                    logger.log(f"RAHMANIA - Reshape error: {e}")
-                    ws.send(json.dumps({"error": f"Reshape error: {e}"}))
+                # Decode the frame into a pooled buffer (or answer a handshake)
+                reply, slot = session.receive(message)
+                if reply is not None:
+                    with send_lock:
+                        ws.send(reply)
+                if slot is None:
                     continue
 
-                # Save image
-                output_folder = "data"
-                if not os.path.exists(output_folder):
-                    os.makedirs(output_folder)
-                image_path = f"{output_folder}/{int(time.time() * 1000)}.png"
-                cv2.imwrite(image_path, image_data)
-
-                # Validate size
-                expected_size = WIDTH * HEIGHT * 3
-                if len(byte_data) != expected_size:
-                    logger.log(f"RAHMANIA - Incorrect byte data size: {len(byte_data)} (expected {expected_size})")
-                    ws.send(json.dumps({"error": f"Incorrect byte data size: {len(byte_data)}"}))
-                    continue
-
-                # Call the process_image function
-                result = kpc.process_image(byte_data, WIDTH, HEIGHT)
-                
-                # Notify the observer with the result
-                result_observer.notify(result)
+                # Latest frame wins: replaces any frame the processor has not started yet
+                session.submit(slot)
 
             except Exception as e:
                 logger.log("RAHMANIA - Error:" + str(e))
-                ws.send(json.dumps({"error": f"Processing failed: {str(e)}"}))
+                with send_lock:
+                    ws.send(json.dumps({"error": f"Processing failed: {str(e)}"}))
     finally:
-        # Unsubscribe the WebSocket notifier and flush pending notifications
-        result_observer.unsubscribe(ws_notifier)
-        result_observer.flush()
+        # Let the processor finish its current frame
+        session.stop()
+        processor.join()
+
+        # Flush the pending (coalesced) result to the WebSocket notifier before
+        # unsubscribing it; close() lets it drain what is queued
+        session.observer.flush()
+        session.observer.unsubscribe(ws_notifier)
+        ws_notifier.close()
+        session.close()
+        session_registry.remove(session)
+
+
+def create_app():
+    """
+    :return: Flask app serving the /opencv WebSocket endpoint.
+    """
+    app = Flask(__name__)
+    sock = Sock(app)  # Initialize Sock with the Flask app
+    sock.route('/opencv')(ws_opencv)
+    return app
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    frame_archive = create_frame_archive()
+    if INFERENCE_WORKERS > 0:
+        scheduler = InferenceScheduler(SCHEDULER_CONCURRENCY)
+        worker_pool = InferenceWorkerPool(INFERENCE_WORKERS, WORKER_REBALANCE_DEPTH, WORKER_HEALTH_CHECK_S)
+    else:
+        # In-process sessions: enough frames in flight to fill a batched landmark invoke
+        scheduler = InferenceScheduler(inference_concurrency(SCHEDULER_CONCURRENCY))
+        # Load Mediapipe graphs now rather than on the first connections
+        hand_processor_pool()
+    create_app().run(host="0.0.0.0", port=5000)
 
 # # Define a WebSocket route
 # @sock.route('/reverse')
@@ -0,0 +1,199 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from constants import (ARCHIVE_DIR, ARCHIVE_ENABLED, ARCHIVE_MAX_BYTES,
+                       ARCHIVE_MAX_SEGMENTS_PER_SESSION, ARCHIVE_QUEUE_SIZE, ARCHIVE_SEGMENT_FRAMES)
+from helper.Logger import Logger
+
+
+class ArchiveSampler:
+    def __init__(self, every_n=30, on_change=True):
+        """
+        Decides which frames of a session are archived.
+        :param every_n: Keep every Nth frame (0 disables periodic sampling).
+        :param on_change: Also keep frames whose result differs from the previous one.
+        """
+        self.every_n = every_n
+        self.on_change = on_change
+        self._count = 0
+        self._last_result = None
+
+    def should_archive(self, result):
+        """
+        :param result: Result produced for the current frame.
+        :return: True if the frame should be handed to the archive.
+        """
+        self._count += 1
+        changed = result != self._last_result
+        self._last_result = result
+        if self.on_change and changed:
+            return True
+        return self.every_n > 0 and self._count % self.every_n == 0
+
+
+class FrameArchive:
+    def __init__(self, output_folder="data", queue_size=256, segment_frames=64,
+                 max_segments_per_session=20, max_bytes=2 * 1024 ** 3):
+        """
+        Background frame archive. Callers only enqueue frames; a single writer thread
+        batches them per session into compressed .npz segments and enforces retention.
+        :param output_folder: Root folder, one sub-folder per session.
+        :param queue_size: Maximum number of frames waiting for the writer.
+        :param segment_frames: Number of frames per segment file.
+        :param max_segments_per_session: Oldest segments of a session beyond this are deleted.
+        :param max_bytes: Oldest segments are deleted while the archive is larger than this.
+        """
+        self.output_folder = output_folder
+        self.segment_frames = segment_frames
+        self.max_segments_per_session = max_segments_per_session
+        self.max_bytes = max_bytes
+
+        # Unbounded so close markers always queue behind the session's last frames;
+        # submit() bounds the frames
+        self._queue = queue.Queue()
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._segments = {}  # session_id -> list of (timestamp_ms, frame, result)
+        self._thread = None
+
+        # Written segments, kept by the writer so retention never rescans the archive
+        self._sizes = {}  # path -> bytes, oldest first
+        self._session_files = {}  # session folder -> deque of paths, oldest first
+        self._bytes = 0
+
+        self.submitted = 0
+        self.dropped = 0
+        self.segments_written = 0
+        self._logger = Logger()
+
+    def start(self):
+        """
+        Start the writer thread if it is not running yet.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="frame-archive", daemon=True)
+                self._thread.start()
+
+    def submit(self, session_id, frame, result):
+        """
+        Queue a frame for archiving without blocking. The frame is copied, so pooled
+        buffers can be reused immediately. Frames are dropped when the queue is full.
+        :param session_id: Identifier of the session the frame belongs to.
+        :param frame: HEIGHT x WIDTH x 3 image.
+        :param result: Result produced for the frame.
+        :return: True if the frame was queued, False if it was dropped.
+        """
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            return False
+        self._queue.put_nowait((session_id, int(time.time() * 1000), frame.copy(), result))
+        self.submitted += 1
+        return True
+
+    def close_session(self, session_id):
+        """
+        Ask the writer to flush the partial segment of a finished session, once the
+        frames it queued before are written.
+        :param session_id: Identifier of the closed session.
+        """
+        self._queue.put_nowait((session_id, None, None, None))
+
+    def _run(self):
+        self._scan()
+        while True:
+            session_id, timestamp_ms, frame, result = self._queue.get()
+            if frame is None:
+                self._flush(session_id)
+                continue
+            segment = self._segments.get(session_id)
+            if segment and segment[-1][1].shape != frame.shape:
+                # Resized stream (control messages, binary frames of another
+                # size): frames of one segment must stack into one array
+                self._flush(session_id)
+            segment = self._segments.setdefault(session_id, [])
+            segment.append((timestamp_ms, frame, result))
+            if len(segment) >= self.segment_frames:
+                self._flush(session_id)
+
+    def _scan(self):
+        # Segments left by earlier runs, oldest first; only scanned when the writer starts
+        segments = []
+        if os.path.isdir(self.output_folder):
+            for session_entry in os.scandir(self.output_folder):
+                if session_entry.is_dir():
+                    for entry in os.scandir(session_entry.path):
+                        if entry.name.endswith(".npz"):
+                            stat = entry.stat()
+                            segments.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(segments):
+            self._add_segment(path, size)
+
+    def _flush(self, session_id):
+        segment = self._segments.pop(session_id, None)
+        if not segment:
+            return
+        try:
+            session_folder = os.path.join(self.output_folder, str(session_id))
+            os.makedirs(session_folder, exist_ok=True)
+            path = os.path.join(session_folder, f"{segment[0][0]}.npz")
+            np.savez_compressed(
+                path,
+                frames=np.stack([frame for _, frame, _ in segment]),
+                timestamps_ms=np.array([timestamp_ms for timestamp_ms, _, _ in segment], dtype=np.int64),
+                results=np.array([json.dumps(result, default=str) for _, _, result in segment]),
+            )
+            self.segments_written += 1
+            self._add_segment(path, os.path.getsize(path))
+            self._apply_retention(session_folder)
+        except Exception as e:
+            # Never let one bad segment stop the writer thread (archiving would end for good)
+            self._logger.log(f"RAHMANIA - Archive write failed: {e!r}")
+
+    def _add_segment(self, path, size):
+        previous = self._sizes.get(path)
+        if previous is None:
+            self._session_files.setdefault(os.path.dirname(path), deque()).append(path)
+        else:
+            self._bytes -= previous  # Rewritten within the same millisecond
+        self._sizes[path] = size
+        self._bytes += size
+
+    def _remove_oldest(self, session_folder):
+        files = self._session_files[session_folder]
+        path = files.popleft()
+        if not files:
+            del self._session_files[session_folder]
+        self._bytes -= self._sizes.pop(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _apply_retention(self, session_folder):
+        # Per session: keep only the newest segments
+        while len(self._session_files.get(session_folder, ())) > self.max_segments_per_session:
+            self._remove_oldest(session_folder)
+
+        # Whole archive: delete the oldest segments while over the size limit. The oldest
+        # segment of the archive is also the oldest of its session.
+        while self._bytes > self.max_bytes and self._sizes:
+            self._remove_oldest(os.path.dirname(next(iter(self._sizes))))
+
+
+def create_frame_archive():
+    """
+    Build the archive configured in constants.py and start its writer if enabled.
+    :return: FrameArchive
+    """
+    frame_archive = FrameArchive(ARCHIVE_DIR, ARCHIVE_QUEUE_SIZE, ARCHIVE_SEGMENT_FRAMES,
+                                 ARCHIVE_MAX_SEGMENTS_PER_SESSION, ARCHIVE_MAX_BYTES)
+    if ARCHIVE_ENABLED:
+        frame_archive.start()
+    return frame_archive
@@ -0,0 +1,219 @@
+"""
+Asyncio server mode for the /opencv gesture endpoint.
+
+Serves the same protocol as server.py, but every connection is a coroutine
+instead of an OS thread, so thousands of idle or slow phones cost almost
+nothing. Gesture recognition is CPU bound and runs in an executor so the
+event loop keeps draining sockets. Uses uvloop when it is installed.
+
+Run from the waveoff_server directory:
+    python server_async.py
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+from constants import ASYNC_HOST, ASYNC_PORT, ASYNC_INFERENCE_THREADS, ASYNC_MAX_MESSAGE_BYTES
+from constants import INFERENCE_WORKERS, SESSION_IDLE_TIMEOUT_S, WORKER_HEALTH_CHECK_S, WORKER_REBALANCE_DEPTH
+from constants import SCHEDULER_CONCURRENCY, SUBSCRIBER_QUEUE_SIZE, SUBSCRIBER_MAX_OVERFLOWS
+from helper.Logger import Logger
+from mediapipe_helpers.hand_processor import inference_concurrency
+from server_archive import create_frame_archive
+from server_mailbox import AsyncLatestFrameMailbox
+from server_observer import AsyncQueuedSubscriber
+from server_scheduler import InferenceScheduler
+from server_session import Session, SessionRegistry, hand_processor_pool
+from server_workers import InferenceWorkerPool
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+# Live sessions, one per connected phone
+session_registry = SessionRegistry()
+
+# Shared subsystems, created at start-up under __main__ only: spawned inference
+# workers import this module as __mp_main__ and must not start their own
+# Background archive of sampled frames
+frame_archive = None
+
+# Process pool running gesture recognition, when INFERENCE_WORKERS > 0
+worker_pool = None
+
+# Which session's frame is processed next: ringing phones first, fair shares for the rest
+scheduler = None
+
+# Threads that run the CPU bound gesture recognition
+inference_executor = None
+
+
+async def send_quietly(websocket, text):
+    """
+    Send a message, ignoring connections that closed in the meantime.
+    """
+    try:
+        await websocket.send(text)
+    except websockets.ConnectionClosed:
+        pass
+
+
+# Define a notification function for the WebSocket
+def notify_client_via_ws(websocket):
+    async def send_result(notification):
+        """
+        Send the notification to the WebSocket client.
+        :param notification: The encoded notification (JSON text or binary result).
+        """
+        await websocket.send(notification)
+
+    return send_result
+
+
+def disconnect_slow_client(websocket):
+    async def disconnect():
+        """
+        Close a connection whose client keeps falling behind on results.
+        """
+        Logger().log("RAHMANIA - Client too slow for results, disconnecting.")
+        await websocket.close(code=1008, reason="Client too slow")
+
+    return disconnect
+
+
+def request_path(websocket):
+    # websockets >= 13 exposes the handshake request, older versions the path
+    request = getattr(websocket, "request", None)
+    return request.path if request is not None else websocket.path
+
+
+async def process_frames(session, notifier):
+    """
+    Processor task of a connection: always takes the newest frame from the
+    session mailbox, so stale frames are dropped instead of queueing up.
+    Its messages are posted to the connection's notifier, so it never waits on the network.
+    """
+    logger = Logger()
+    while True:
+        # Wake up for held back results and heartbeats even when no frames arrive
+        slot = await session.mailbox.take(timeout=session.observer.next_tick())
+        if slot is None:
+            if session.mailbox.closed:
+                break
+            session.observer.tick()
+            continue
+        try:
+            # Run gesture recognition off the event loop
+            result = await session.process_async(slot, inference_executor)
+
+            # Notify this session's observer with the result
+            session.observer.notify(result)
+
+            # Periodically report received / processed / dropped frame counts
+            stats = session.stats_report()
+            if stats is not None:
+                notifier.post(stats)
+
+            # Ask the client to slow down, speed up or shrink its frames
+            control = session.control_report()
+            if control is not None:
+                notifier.post(control)
+
+            # Ask the client to send only the crop around the hand, or full frames again
+            roi = session.roi_report()
+            if roi is not None:
+                notifier.post(roi)
+        except Exception as e:
+            logger.log("RAHMANIA - Error:" + str(e))
+            notifier.post(json.dumps({"error": f"Processing failed: {str(e)}"}))
+
+
+async def ws_opencv(websocket):
+    logger = Logger()
+    if request_path(websocket) != "/opencv":
+        await websocket.close(code=1008, reason="Unknown endpoint")
+        return
+
+    # Per-connection state: pipeline, observer, frame buffers, archive sampling, stats.
+    # Loading the Mediapipe graph is slow, so it happens off the event loop.
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(inference_executor, Session, AsyncLatestFrameMailbox(),
+                                         frame_archive, worker_pool, scheduler)
+    session_registry.add(session)
+
+    # Subscribe the WebSocket to the session's Observer through a bounded queue
+    # drained by its own sender task, so processing never waits on the network
+    ws_notifier = AsyncQueuedSubscriber(notify_client_via_ws(websocket),
+                                        SUBSCRIBER_QUEUE_SIZE, SUBSCRIBER_MAX_OVERFLOWS,
+                                        on_slow=disconnect_slow_client(websocket),
+                                        encode=session.encode_notification)
+    session.observer.subscribe(ws_notifier)
+
+    processor = asyncio.ensure_future(process_frames(session, ws_notifier))
+
+    try:
+        while True:
+            # Idle sessions time out and are evicted
+            try:
+                message = await asyncio.wait_for(websocket.recv(), SESSION_IDLE_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Idle timeout")
+                break
+
+            try:
+                # Decode the frame into a pooled buffer (or answer a handshake)
+                reply, slot = session.receive(message)
+                if reply is not None:
+                    await websocket.send(reply)
+                if slot is None:
+                    continue
+
+                # Latest frame wins: replaces any frame the processor has not started yet
+                session.submit(slot)
+
+            except websockets.ConnectionClosed:
+                break
+            except Exception as e:
+                logger.log("RAHMANIA - Error:" + str(e))
+                await send_quietly(websocket, json.dumps({"error": f"Processing failed: {str(e)}"}))
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        # Let the processor finish its current frame
+        session.stop()
+        await processor
+
+        # Flush the pending (coalesced) result to the WebSocket notifier before
+        # unsubscribing it; close() lets it drain what is queued
+        session.observer.flush()
+        session.observer.unsubscribe(ws_notifier)
+        ws_notifier.close()
+        session.close()
+        session_registry.remove(session)
+
+
+async def serve(host=ASYNC_HOST, port=ASYNC_PORT):
+    async with websockets.serve(ws_opencv, host, port, max_size=ASYNC_MAX_MESSAGE_BYTES):
+        await asyncio.Future()  # Run forever
+
+
+if __name__ == "__main__":
+    frame_archive = create_frame_archive()
+    if INFERENCE_WORKERS > 0:
+        scheduler = InferenceScheduler(SCHEDULER_CONCURRENCY)
+        inference_executor = ThreadPoolExecutor(max_workers=ASYNC_INFERENCE_THREADS,
+                                                thread_name_prefix="inference")
+        worker_pool = InferenceWorkerPool(INFERENCE_WORKERS, WORKER_REBALANCE_DEPTH, WORKER_HEALTH_CHECK_S)
+    else:
+        # In-process sessions: enough frames in flight to fill a batched landmark invoke
+        scheduler = InferenceScheduler(inference_concurrency(SCHEDULER_CONCURRENCY))
+        inference_executor = ThreadPoolExecutor(max_workers=inference_concurrency(ASYNC_INFERENCE_THREADS),
+                                                thread_name_prefix="inference")
+        # Load Mediapipe graphs now rather than on the first connections
+        hand_processor_pool()
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(serve())
@@ -0,0 +1,160 @@
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from server_image_conversion import decode_frame
+from server_shared_memory import SharedFrameRing
+
+
+class FrameSlot:
+    def __init__(self, index, width, height, ring=None):
+        """
+        A pair of preallocated HEIGHT x WIDTH x 3 buffers.
+        :param index: Position of the slot in its pool.
+        :param width: Width of the frames in pixels.
+        :param height: Height of the frames in pixels.
+        :param ring: SharedFrameRing holding the RGB buffer of this slot (optional).
+        """
+        self.index = index
+        self.ring = ring
+        self.sequence = 0      # Sequence number of the frame currently held
+        self.timestamp_ms = 0  # Capture timestamp of that frame
+        self.roi = None        # Region of the full frame the frame shows, if it is a client crop
+        self.stage = np.empty((height, width, 3), dtype=np.uint8)  # Decoded / color converted frame
+        # Mirrored RGB frame for Mediapipe, in shared memory when the pool has a ring
+        self.rgb = ring.frames[index] if ring is not None else np.empty((height, width, 3), dtype=np.uint8)
+
+    def shared_ref(self, sequence):
+        """
+        :return: SharedFrameRef of the RGB buffer, or None if it is not in shared memory.
+        """
+        return self.ring.ref(self.index, sequence) if self.ring is not None else None
+
+    def fits(self, width, height):
+        return self.rgb.shape[:2] == (height, width)
+
+    def load(self, payload, pixel_format, width, height):
+        """
+        Decodes a frame payload into this slot and leaves the mirrored RGB frame in `rgb`.
+        Flip and color conversion write into the slot buffers, so no frame sized array
+        is allocated for raw BGR and NV21 payloads.
+        :param payload: Frame payload (bytes-like).
+        :param pixel_format: One of the PIXEL_FORMAT_* constants.
+        :param width: Width of the frame in pixels.
+        :param height: Height of the frame in pixels.
+        :return: (np.ndarray, bool) - the decoded, unmirrored frame and whether it is RGB.
+        """
+        image, is_rgb = decode_frame(payload, pixel_format, width, height, out=self.stage)
+        if is_rgb:
+            cv2.flip(image, 1, dst=self.rgb)
+        else:
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.stage)
+            cv2.flip(self.stage, 1, dst=self.rgb)
+        return image, is_rgb
+
+
+class FramePool:
+    def __init__(self, width, height, size=2, shared=False, overflow_sizes=2):
+        """
+        Per-session pool of preallocated frame slots.
+        :param width: Width of the frames in pixels.
+        :param height: Height of the frames in pixels.
+        :param size: Number of slots allocated up front.
+        :param shared: Put the RGB buffers in a SharedFrameRing so worker processes
+                       can read frames without copying.
+        :param overflow_sizes: Other frame sizes (client crops, resolution changes) whose
+                               free slots are kept for reuse.
+        """
+        self.width = width
+        self.height = height
+        self._size = size
+        self.ring = SharedFrameRing(size, width, height) if shared else None
+        self._free = deque(FrameSlot(i, width, height, self.ring) for i in range(size))
+        self._overflow = {}  # (width, height) -> free slots of other sizes, oldest size first
+        self._overflow_sizes = overflow_sizes
+        self._lock = threading.Lock()  # Slots also come back from the worker pool's result thread
+        self._closed = False
+        self.quarantined = 0  # Slots a worker still read after the session gave up on the frame
+        self.allocations = 0  # Slots allocated after start-up (should stay at 0)
+
+    def acquire(self, width=None, height=None):
+        """
+        Take a free slot, allocating a new one only if the pool is exhausted or no slot
+        of this frame size is free. Slots of other sizes than the pool's are kept apart
+        from the ring and are never in shared memory.
+        :return: FrameSlot
+        :raises ValueError: If the frame has more pixels than a slot of the pool's size.
+        """
+        width = width or self.width
+        height = height or self.height
+        if width * height > self.width * self.height:
+            raise ValueError(f"Frame of {width}x{height} is larger than {self.width}x{self.height}")
+        with self._lock:
+            if (width, height) == (self.width, self.height):
+                free = self._free
+            else:
+                free = self._overflow.get((width, height))
+            if free:
+                return free.popleft()
+            self.allocations += 1
+            self._size += 1
+            index = self._size - 1
+        return FrameSlot(index, width, height)
+
+    def release(self, slot):
+        """
+        Return a slot to the pool once its frame has been processed.
+        :param slot: FrameSlot obtained from acquire.
+        """
+        with self._lock:
+            if self._closed:
+                return  # A quarantined slot coming back after the session ended
+            if slot.ring is not None:
+                self._free.appendleft(slot)  # Shared memory slots go out first
+            elif slot.fits(self.width, self.height):
+                self._free.append(slot)
+            else:
+                size = (slot.rgb.shape[1], slot.rgb.shape[0])
+                if size not in self._overflow:
+                    while len(self._overflow) >= self._overflow_sizes:
+                        self._overflow.pop(next(iter(self._overflow)))  # Forget the oldest size
+                    self._overflow[size] = deque()
+                self._overflow[size].append(slot)
+
+    def release_later(self, slot):
+        """
+        For a frame handed to a worker process: the slot must not be reused before both
+        the session and the worker are done with it, as the worker reads it in place
+        (or pickles it on the queue's feeder thread). The session may give up first,
+        on a timeout or a disconnect; the slot then stays out of the pool until the
+        worker's result arrives or the worker is found dead.
+        :param slot: FrameSlot obtained from acquire.
+        :return: (callable, callable) - done callbacks for the session and the worker; the
+                 slot is released by whichever is called last.
+        """
+        holders = [2]
+
+        def done(session):
+            with self._lock:
+                holders[0] -= 1
+                last = holders[0] == 0
+                if last and not session:
+                    self.quarantined += 1
+            if last:
+                self.release(slot)
+
+        return (lambda: done(True)), (lambda: done(False))
+
+    def close(self):
+        """
+        Free the shared memory ring, if any. Slots released afterwards are dropped.
+        """
+        with self._lock:
+            self._closed = True
+            self._free.clear()
+            self._overflow.clear()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
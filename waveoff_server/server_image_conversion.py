@@ -4,6 +4,8 @@ import numpy as np
 import cv2
 import time
 
+from server_protocol import COMPRESSED_PIXEL_FORMATS, PIXEL_FORMAT_BGR, PIXEL_FORMAT_NV21
+
 def base64_to_image(base64_data, output_image_folder, width, height):
     """
     Converts a Base64-encoded image stored in a text file into a PNG image file.
@@ -39,3 +41,66 @@ def is_valid_base64(data):
         return True
     except binascii.Error:
         return False
+
+
+def decode_base64(data):
+    """
+    Validates and decodes Base64 data in a single pass.
+
+    Args:
+        data (str | bytes): Base64-encoded data.
+
+    Returns:
+        bytes | None: Decoded bytes, or None if the data is not valid Base64.
+    """
+    try:
+        return base64.b64decode(data, validate=True)
+    except binascii.Error:
+        return None
+
+
+def decode_frame(payload, pixel_format, width, height, out=None):
+    """
+    Turns a frame payload into an image ready for MediaPipe.
+
+    Raw BGR payloads are wrapped without copying. JPEG and WebP payloads are
+    decoded with cv2.imdecode. NV21 payloads (1.5 bytes per pixel) are converted
+    straight to RGB with a single cvtColor, skipping the BGR intermediate.
+
+    Args:
+        payload (bytes-like): Frame payload.
+        pixel_format (int): One of the PIXEL_FORMAT_* constants.
+        width (int): Expected width of the image in pixels.
+        height (int): Expected height of the image in pixels.
+        out (np.ndarray): Optional HEIGHT x WIDTH x 3 buffer that NV21 frames are
+            converted into instead of a new array.
+
+    Returns:
+        tuple: (np.ndarray, bool) - HEIGHT x WIDTH x 3 image and whether it is RGB
+        (True) or BGR (False).
+    """
+    if pixel_format == PIXEL_FORMAT_BGR:
+        expected_size = width * height * 3
+        if len(payload) != expected_size:
+            raise ValueError(f"Incorrect byte data size: {len(payload)} (expected {expected_size})")
+        return np.frombuffer(payload, dtype=np.uint8).reshape((height, width, 3)), False
+
+    if pixel_format == PIXEL_FORMAT_NV21:
+        if width % 2 or height % 2:
+            raise ValueError(f"NV21 frames need even dimensions, got {width}x{height}")
+        expected_size = width * height * 3 // 2
+        if len(payload) != expected_size:
+            raise ValueError(f"Incorrect byte data size: {len(payload)} (expected {expected_size})")
+        yuv = np.frombuffer(payload, dtype=np.uint8).reshape((height * 3 // 2, width))
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB_NV21, dst=out), True
+
+    if pixel_format in COMPRESSED_PIXEL_FORMATS:
+        image = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode compressed frame")
+        if image.shape[:2] != (height, width):
+            raise ValueError(f"Incorrect decoded size: {image.shape[1]}x{image.shape[0]} "
+                             f"(expected {width}x{height})")
+        return image, False
+
+    raise ValueError(f"Unsupported pixel format: {pixel_format}")
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+
+class LatestFrameMailbox:
+    def __init__(self):
+        """
+        Single-slot mailbox shared by a receiver thread and a processor thread.
+        Putting a frame overwrites any frame that was not taken yet, so the
+        processor always works on the newest frame and latency stays bounded.
+        """
+        self._item = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """
+        Store the newest frame without blocking.
+        :param item: The frame to store.
+        :return: The overwritten frame, or None if the slot was empty.
+        """
+        with self._condition:
+            evicted, self._item = self._item, item
+            if evicted is not None:
+                self.dropped += 1
+            self._condition.notify()
+            return evicted
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def take(self, timeout=None):
+        """
+        Wait for a frame and remove it from the mailbox.
+        :param timeout: Seconds to wait at most, or None to wait for a frame.
+        :return: The newest frame, or None once the mailbox is closed or on timeout.
+        """
+        with self._condition:
+            if self._item is None and not self._closed:
+                self._condition.wait_for(lambda: self._item is not None or self._closed, timeout)
+            if self._closed or self._item is None:
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        """
+        Wake up the processor and stop accepting frames.
+        :return: The frame that was never taken, or None.
+        """
+        with self._condition:
+            self._closed = True
+            item, self._item = self._item, None
+            self._condition.notify_all()
+            return item
+
+
+class AsyncLatestFrameMailbox:
+    def __init__(self):
+        """
+        Asyncio counterpart of LatestFrameMailbox, for a receiver coroutine and a
+        processor coroutine running on the same event loop.
+        """
+        self._item = None
+        self._closed = False
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item):
+        evicted, self._item = self._item, item
+        if evicted is not None:
+            self.dropped += 1
+        self._event.set()
+        return evicted
+
+    @property
+    def closed(self):
+        return self._closed
+
+    async def take(self, timeout=None):
+        while self._item is None and not self._closed:
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self._closed:
+            return None
+        item, self._item = self._item, None
+        return item
+
+    def close(self):
+        self._closed = True
+        item, self._item = self._item, None
+        self._event.set()
+        return item
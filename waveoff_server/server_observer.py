@@ -1,59 +1,291 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
 class Observer:
-    def __init__(self):
-        self._observers = []  # List of subscribers
+    def __init__(self, min_interval_ms=0, heartbeat_ms=0):
+        """
+        Notifies subscribers when the result changes.
+        :param min_interval_ms: Changes within this window after a notification are
+                                coalesced into one notification (0 notifies every change).
+        :param heartbeat_ms: Interval of heartbeats carrying the current result and how
+                             long it has lasted while nothing changes (0 disables them).
+        """
+        self._observers = {}  # Subscribers (dict as an ordered set: O(1) unsubscribe)
         self._last_result = None  # Cache for the last result
         self._count = 0  # Count of consecutive unchanged results
+        self._pending = None  # Newest result not notified yet because of the interval
+        self._since = 0.0  # Time the last notified result started (end of the last window)
+        self._last_sent = 0.0  # Time of the last notification or heartbeat
+        self.configure(min_interval_ms, heartbeat_ms)
+
+    def configure(self, min_interval_ms, heartbeat_ms):
+        """
+        Change the coalescing window and heartbeat interval, e.g. after a client hello.
+        :param min_interval_ms: Coalescing window in milliseconds (0 disables it).
+        :param heartbeat_ms: Heartbeat interval in milliseconds (0 disables heartbeats).
+        """
+        self._min_interval = min_interval_ms / 1000
+        self._heartbeat = heartbeat_ms / 1000
 
     def subscribe(self, observer):
         """
         Subscribe an observer to the notifications.
         :param observer: Function or object to be notified.
         """
-        self._observers.append(observer)
+        self._observers[observer] = None
 
     def unsubscribe(self, observer):
         """
         Unsubscribe an observer from the notifications.
         :param observer: Function or object to remove.
         """
-        self._observers.remove(observer)
+        self._observers.pop(observer, None)
+
+    def _emit(self, notification):
+        for observer in list(self._observers):
+            observer(notification)
 
     def notify(self, result):
         """
         Notify all subscribers if the result has changed, with the count of unchanged results.
+        Changes within the coalescing window are held back and only the newest is sent.
         :param result: The result to notify about.
         """
-        if result == self._last_result:
-            # Increment count for unchanged results
-            self._count += 1
-        else:
+        if self._last_result is None:
+            # First result: nothing to report yet, start counting
+            self._last_result = result
+            self._count = 1
+            self._since = self._last_sent = time.monotonic()
+            return
+
+        # Flicker that settles back on the notified result within the window is dropped
+        self._pending = result if result != self._last_result else None
+        self._count += 1
+        self.tick()
+
+    def tick(self):
+        """
+        Send a held back change once the coalescing window has passed, and a heartbeat
+        when nothing was sent for the heartbeat interval. Called on every result and
+        periodically while no frames arrive.
+        """
+        if self._last_result is None:
+            return
+        now = time.monotonic()
+        if self._pending is not None and now - self._since >= self._min_interval:
             # Notify observers about the new result and the count of the previous result
-            if self._last_result is not None:
-                for observer in self._observers:
-                    observer({
-                        "result": result,
-                        "previous_result": self._last_result,
-                        "unchanged_count": self._count
-                    })
+            self._emit({
+                "result": self._pending,
+                "previous_result": self._last_result,
+                "unchanged_count": self._count - 1
+            })
             # Update to the new result and reset count
-            self._last_result = result
+            self._last_result, self._pending = self._pending, None
             self._count = 1  # Start counting the new result
+            self._since = self._last_sent = now
+        elif self._heartbeat and now - self._last_sent >= self._heartbeat:
+            self._emit({
+                "type": "heartbeat",
+                "result": self._last_result,
+                "duration_ms": int((now - self._since) * 1000)
+            })
+            self._last_sent = now
+
+    def next_tick(self):
+        """
+        :return: Seconds until tick() has something to send, or None if it never will
+                 without a new result.
+        """
+        if self._last_result is None:
+            return None
+        due = []
+        if self._pending is not None:
+            due.append(self._since + self._min_interval)
+        if self._heartbeat:
+            due.append(self._last_sent + self._heartbeat)
+        return max(0.0, min(due) - time.monotonic()) if due else None
 
     def flush(self):
         """
         Notify the final result count if the connection closes.
         """
         if self._last_result is not None:
-            for observer in self._observers:
-                observer({
-                    "result": None,
-                    "previous_result": self._last_result,
-                    "unchanged_count": self._count
-                })
-            self._last_result = None
+            self._emit({
+                "result": None,
+                "previous_result": self._pending or self._last_result,
+                "unchanged_count": self._count
+            })
+            self._last_result = self._pending = None
             self._count = 0
 
 
+class QueuedSubscriber:
+    def __init__(self, send, max_queue=8, max_overflows=3, on_slow=None, encode=None):
+        """
+        Observer subscriber with a bounded outbound queue and its own sender thread,
+        so the producer never blocks on network I/O.
+        When the queue is full the pending notifications are coalesced into the latest
+        one; after max_overflows consecutive overflows the consumer counts as too slow,
+        the subscriber closes itself and on_slow is called from the sender thread.
+        Other messages of the connection (stats, control, errors) go through post() and
+        the same sender, so they never block the producer either.
+        :param send: Function sending one notification (may block).
+        :param max_queue: Maximum number of pending notifications.
+        :param max_overflows: Consecutive overflows before the consumer is dropped.
+        :param on_slow: Function called once when the consumer is dropped (optional).
+        :param encode: Function turning a notification into the message to send, applied
+                       when the notification is produced (optional).
+        """
+        self._send = send
+        self._encode = encode
+        self.max_queue = max_queue
+        self.max_overflows = max_overflows
+        self._on_slow = on_slow
+        self._queue = deque()
+        self._messages = deque(maxlen=max_queue)  # Posted messages, the oldest dropped when full
+        self._condition = threading.Condition()
+        self._closed = False
+        self._too_slow = False
+        self._overflows = 0
+        self.coalesced = 0
+
+        self._thread = threading.Thread(target=self._run, name="result-sender", daemon=True)
+        self._thread.start()
+
+    def __call__(self, notification):
+        if self._encode is not None:
+            notification = self._encode(notification)
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._queue) >= self.max_queue:
+                # Coalesce to the latest state instead of queueing every transition
+                self.coalesced += len(self._queue)
+                self._queue.clear()
+                self._overflows += 1
+                if self._overflows >= self.max_overflows:
+                    self._too_slow = True
+                    self._closed = True
+            self._queue.append(notification)
+            self._condition.notify()
+
+    def post(self, message):
+        """
+        Queue a message that is not a notification. It is sent as is, ahead of pending
+        notifications, and never coalesced with them.
+        :param message: Encoded message (JSON text).
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._messages.append(message)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._messages and not self._closed:
+                    self._condition.wait()
+                if self._too_slow:
+                    break
+                if self._messages:
+                    notification = self._messages.popleft()
+                elif self._queue:
+                    notification = self._queue.popleft()
+                else:
+                    return
+            try:
+                self._send(notification)
+            except Exception:
+                return
+            with self._condition:
+                if not self._queue:
+                    self._overflows = 0  # Consumer caught up
+        if self._on_slow is not None:
+            self._on_slow()
+
+
+class AsyncQueuedSubscriber:
+    def __init__(self, send, max_queue=8, max_overflows=3, on_slow=None, encode=None):
+        """
+        Asyncio counterpart of QueuedSubscriber: the sender is a task on the running
+        event loop and send / on_slow are coroutine functions.
+        """
+        self._send = send
+        self._encode = encode
+        self.max_queue = max_queue
+        self.max_overflows = max_overflows
+        self._on_slow = on_slow
+        self._queue = deque()
+        self._messages = deque(maxlen=max_queue)
+        self._event = asyncio.Event()
+        self._closed = False
+        self._too_slow = False
+        self._overflows = 0
+        self.coalesced = 0
+
+        self._task = asyncio.ensure_future(self._run())
+
+    def __call__(self, notification):
+        if self._closed:
+            return
+        if self._encode is not None:
+            notification = self._encode(notification)
+        if len(self._queue) >= self.max_queue:
+            # Coalesce to the latest state instead of queueing every transition
+            self.coalesced += len(self._queue)
+            self._queue.clear()
+            self._overflows += 1
+            if self._overflows >= self.max_overflows:
+                self._too_slow = True
+                self._closed = True
+        self._queue.append(notification)
+        self._event.set()
+
+    def post(self, message):
+        """
+        See QueuedSubscriber.post.
+        """
+        if self._closed:
+            return
+        self._messages.append(message)
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def _run(self):
+        while True:
+            while not self._queue and not self._messages and not self._closed:
+                self._event.clear()
+                await self._event.wait()
+            if self._too_slow:
+                break
+            if self._messages:
+                notification = self._messages.popleft()
+            elif self._queue:
+                notification = self._queue.popleft()
+            else:
+                return
+            try:
+                await self._send(notification)
+            except Exception:
+                return
+            if not self._queue:
+                self._overflows = 0  # Consumer caught up
+        if self._on_slow is not None:
+            await self._on_slow()
+
+
 # class Observer:
 #     def __init__(self):
 #         self._observers = []  # List of subscribers
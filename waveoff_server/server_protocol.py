@@ -0,0 +1,356 @@
+import json
+import struct
+from collections import namedtuple
+
+from constants import (DEFAULT_FRAME_QUALITY, MAX_FRAME_HEIGHT, MAX_FRAME_WIDTH, RESULT_HEARTBEAT_MS,
+                       RESULT_MAX_INTERVAL_MS, RESULT_MIN_INTERVAL_MS)
+
+# Binary frame header layout (little endian):
+#   magic (4s) | version (B) | pixel_format (B) | roi_id (H) |
+#   sequence (I) | capture_timestamp_ms (Q) | width (H) | height (H)
+FRAME_MAGIC = b"WVOF"
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBHIQHH")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+# Pixel formats carried in the binary frame header
+PIXEL_FORMAT_BGR = 0
+PIXEL_FORMAT_JPEG = 1
+PIXEL_FORMAT_WEBP = 2
+PIXEL_FORMAT_NV21 = 3
+
+PIXEL_FORMAT_NAMES = {
+    PIXEL_FORMAT_BGR: "bgr",
+    PIXEL_FORMAT_JPEG: "jpeg",
+    PIXEL_FORMAT_WEBP: "webp",
+    PIXEL_FORMAT_NV21: "nv21",
+}
+PIXEL_FORMAT_IDS = {name: pixel_format for pixel_format, name in PIXEL_FORMAT_NAMES.items()}
+
+# Pixel formats whose payload is a compressed image rather than raw pixels
+COMPRESSED_PIXEL_FORMATS = (PIXEL_FORMAT_JPEG, PIXEL_FORMAT_WEBP)
+
+# Range of the encoder quality a client may request for compressed frames
+MIN_QUALITY = 10
+MAX_QUALITY = 100
+
+# Result encodings a client can negotiate on connect
+RESULTS_JSON = "json"
+RESULTS_BINARY = "binary"
+RESULT_ENCODINGS = (RESULTS_JSON, RESULTS_BINARY)
+
+# Binary result layout (little endian):
+#   message_type (B) | hand_sign (b) | previous_hand_sign (b) | gesture (b) |
+#   unchanged_count (H) | sequence (I) | capture_timestamp_ms (Q) | server_timestamp_ms (Q)
+# Label fields are indexes into the label tables sent in the welcome, LABEL_NONE if absent.
+RESULT_MESSAGE = 1
+RESULT = struct.Struct("<BbbbHIQQ")
+LABEL_NONE = -1
+
+# Binary heartbeat layout (little endian):
+#   message_type (B) | hand_sign (b) | duration_ms (I) | server_timestamp_ms (Q)
+HEARTBEAT_MESSAGE = 2
+HEARTBEAT = struct.Struct("<BbIQ")
+
+# JSON messages a client may send instead of a frame
+MESSAGE_HELLO = "hello"
+MESSAGE_CALL_STATE = "call_state"
+CLIENT_MESSAGES = (MESSAGE_HELLO, MESSAGE_CALL_STATE)
+
+# roi_id of frames showing the whole camera image rather than a requested crop
+ROI_FULL_FRAME = 0
+
+# Frame transports a client can negotiate on connect
+TRANSPORT_BASE64 = "base64"
+TRANSPORT_BINARY = "binary"
+TRANSPORTS = (TRANSPORT_BINARY, TRANSPORT_BASE64)
+
+FrameHeader = namedtuple(
+    "FrameHeader",
+    ["version", "pixel_format", "sequence", "timestamp_ms", "width", "height", "roi_id"],
+)
+
+
+class ProtocolError(ValueError):
+    """Raised when a message does not follow the /opencv protocol."""
+
+
+def _raw_payload_size(pixel_format, width, height):
+    # Bytes of an uncompressed frame, None for compressed formats
+    if pixel_format == PIXEL_FORMAT_BGR:
+        return width * height * 3
+    if pixel_format == PIXEL_FORMAT_NV21:
+        return width * height * 3 // 2
+    return None
+
+
+def pack_frame_header(sequence, timestamp_ms, width, height, pixel_format=PIXEL_FORMAT_BGR,
+                      roi_id=ROI_FULL_FRAME):
+    """
+    Builds the fixed size header that prefixes every binary frame.
+
+    Args:
+        sequence (int): Frame sequence number.
+        timestamp_ms (int): Capture timestamp in milliseconds.
+        width (int): Width of the image in pixels.
+        height (int): Height of the image in pixels.
+        pixel_format (int): One of the PIXEL_FORMAT_* constants.
+        roi_id (int): Id of the requested crop the frame shows, or ROI_FULL_FRAME.
+
+    Returns:
+        bytes: Packed header.
+    """
+    return FRAME_HEADER.pack(FRAME_MAGIC, PROTOCOL_VERSION, pixel_format, roi_id,
+                             sequence, timestamp_ms, width, height)
+
+
+def parse_frame(message):
+    """
+    Splits a binary frame into its header and pixel payload without copying.
+
+    Args:
+        message (bytes): Binary WebSocket message.
+
+    Returns:
+        tuple: (FrameHeader, memoryview) - parsed header and payload view.
+    """
+    if len(message) < FRAME_HEADER_SIZE:
+        raise ProtocolError(f"Frame too short: {len(message)} bytes")
+
+    magic, version, pixel_format, roi_id, sequence, timestamp_ms, width, height = \
+        FRAME_HEADER.unpack_from(message)
+    if magic != FRAME_MAGIC:
+        raise ProtocolError("Bad frame magic")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+    if pixel_format not in PIXEL_FORMAT_NAMES:
+        raise ProtocolError(f"Unsupported pixel format: {pixel_format}")
+    if not (0 < width <= MAX_FRAME_WIDTH and 0 < height <= MAX_FRAME_HEIGHT):
+        # Buffers are allocated from these values before the payload is decoded
+        raise ProtocolError(f"Unsupported frame size: {width}x{height} "
+                            f"(at most {MAX_FRAME_WIDTH}x{MAX_FRAME_HEIGHT})")
+
+    payload = memoryview(message)[FRAME_HEADER_SIZE:]
+    expected_size = _raw_payload_size(pixel_format, width, height)
+    if expected_size is not None and len(payload) != expected_size:
+        raise ProtocolError(f"Payload of {len(payload)} bytes for a {width}x{height} "
+                            f"{PIXEL_FORMAT_NAMES[pixel_format]} frame (expected {expected_size})")
+
+    header = FrameHeader(version, pixel_format, sequence, timestamp_ms, width, height, roi_id)
+    return header, payload
+
+
+def default_options():
+    """
+    Returns the session options used until a client sends a hello: Base64 text
+    frames of raw BGR pixels, which is what legacy clients send. Legacy clients get
+    coalesced results but no heartbeats or frame rate control messages, which they
+    would not understand.
+    """
+    return {
+        "transport": TRANSPORT_BASE64,
+        "pixel_format": PIXEL_FORMAT_NAMES[PIXEL_FORMAT_BGR],
+        "quality": DEFAULT_FRAME_QUALITY,
+        "results": RESULTS_JSON,
+        "min_interval_ms": RESULT_MIN_INTERVAL_MS,
+        "heartbeat_ms": 0,
+        "control": False,
+        "roi": False,
+    }
+
+
+def is_json_message(message):
+    """
+    Returns True if a text message is a JSON message (hello, call state) rather than
+    a Base64 frame. Base64 frames never start with '{', so legacy clients are never
+    mistaken for one.
+    """
+    return isinstance(message, str) and message.startswith("{")
+
+
+def parse_message(message):
+    """
+    Parses a JSON message sent by the client.
+
+    Args:
+        message (str): JSON text with a "type" of CLIENT_MESSAGES.
+
+    Returns:
+        dict: The decoded message.
+    """
+    try:
+        decoded = json.loads(message)
+    except ValueError as e:
+        raise ProtocolError(f"Invalid message: {e}")
+    if not isinstance(decoded, dict) or decoded.get("type") not in CLIENT_MESSAGES:
+        raise ProtocolError("Unknown message type")
+    return decoded
+
+
+def parse_handshake(hello):
+    """
+    Parses the client hello sent right after connecting.
+
+    Args:
+        hello (dict): Message returned by parse_message, such as
+            {"type": "hello", "transport": "binary", "pixel_format": "jpeg", "quality": 70,
+             "results": "binary", "min_interval_ms": 100, "heartbeat_ms": 1000,
+             "control": true, "roi": true}.
+
+    Returns:
+        dict: The negotiated session options.
+    """
+
+    transport = hello.get("transport", TRANSPORT_BASE64)
+    if transport not in TRANSPORTS:
+        # Unknown transports fall back to Base64, which every client supports
+        transport = TRANSPORT_BASE64
+
+    pixel_format = hello.get("pixel_format", PIXEL_FORMAT_NAMES[PIXEL_FORMAT_BGR])
+    if pixel_format not in PIXEL_FORMAT_NAMES.values():
+        pixel_format = PIXEL_FORMAT_NAMES[PIXEL_FORMAT_BGR]
+
+    # Encoder quality the client should use for compressed frames
+    quality = _bounded_int(hello.get("quality"), DEFAULT_FRAME_QUALITY, MIN_QUALITY, MAX_QUALITY)
+
+    results = hello.get("results", RESULTS_JSON)
+    if results not in RESULT_ENCODINGS:
+        results = RESULTS_JSON
+
+    # Result coalescing window and heartbeat interval
+    min_interval_ms = _bounded_int(hello.get("min_interval_ms"), RESULT_MIN_INTERVAL_MS,
+                                   0, RESULT_MAX_INTERVAL_MS)
+    heartbeat_ms = _bounded_int(hello.get("heartbeat_ms"), RESULT_HEARTBEAT_MS,
+                                0, RESULT_MAX_INTERVAL_MS)
+
+    # Whether the client follows {"type": "control"} frame rate / resolution requests
+    control = hello.get("control", True) is True
+
+    # Whether the client can send only the crop around the hand; frames carry their
+    # size and crop id in the binary header only
+    roi = hello.get("roi", False) is True and transport == TRANSPORT_BINARY
+
+    return {"transport": transport, "pixel_format": pixel_format, "quality": quality,
+            "results": results, "min_interval_ms": min_interval_ms, "heartbeat_ms": heartbeat_ms,
+            "control": control, "roi": roi}
+
+
+def parse_call_state(message):
+    """
+    Parses a call state message, sent by the client whenever the phone starts or
+    stops ringing: {"type": "call_state", "ringing": true}.
+
+    Args:
+        message (dict): Message returned by parse_message.
+
+    Returns:
+        bool: Whether the phone is ringing.
+    """
+    return message.get("ringing") is True
+
+
+def build_roi_request(roi_id, roi=None, output_size=None):
+    """
+    Builds the message asking the client to send only a crop of its camera image.
+
+    Args:
+        roi_id (int): Id the client puts in the header of frames showing the crop,
+            or ROI_FULL_FRAME to go back to full frames.
+        roi (Roi): Region of the mirrored frame the server works on.
+        output_size (int): Side in pixels the crop should be scaled to.
+
+    Returns:
+        str: JSON message with the region in the client's own (unmirrored) image,
+            normalized to 0..1.
+    """
+    if roi_id == ROI_FULL_FRAME or roi is None:
+        return json.dumps({"type": "roi", "id": ROI_FULL_FRAME})
+    return json.dumps({
+        "type": "roi",
+        "id": roi_id,
+        "x": round((roi.frame_width - roi.x2) / roi.frame_width, 4),
+        "y": round(roi.y1 / roi.frame_height, 4),
+        "width": round((roi.x2 - roi.x1) / roi.frame_width, 4),
+        "height": round((roi.y2 - roi.y1) / roi.frame_height, 4),
+        "output_width": output_size,
+        "output_height": output_size,
+    })
+
+
+def _bounded_int(value, default, lowest, highest):
+    try:
+        value = int(default if value is None else value)
+    except (TypeError, ValueError):
+        value = default
+    return max(lowest, min(highest, value))
+
+
+def build_welcome(options, width, height, labels):
+    """
+    Builds the server reply to a client hello.
+
+    Args:
+        options (dict): Negotiated options returned by parse_handshake.
+        width (int): Expected frame width.
+        height (int): Expected frame height.
+        labels (dict): Label tables, e.g. {"hand_sign": [...], "gesture": [...]}, that
+            binary results index into. Sent once here instead of with every result.
+
+    Returns:
+        str: JSON welcome message.
+    """
+    return json.dumps({
+        "type": "welcome",
+        "version": PROTOCOL_VERSION,
+        "transport": options["transport"],
+        "pixel_format": options["pixel_format"],
+        "quality": options["quality"],
+        "results": options["results"],
+        "min_interval_ms": options["min_interval_ms"],
+        "heartbeat_ms": options["heartbeat_ms"],
+        "control": options["control"],
+        "roi": options["roi"],
+        "labels": labels,
+        "width": width,
+        "height": height,
+        "pixel_formats": sorted(PIXEL_FORMAT_NAMES.values()),
+        "header_size": FRAME_HEADER_SIZE,
+    })
+
+
+def pack_result(hand_sign, previous_hand_sign, gesture, unchanged_count, sequence,
+                capture_timestamp_ms, server_timestamp_ms):
+    """
+    Builds a compact binary result message.
+
+    Args:
+        hand_sign (int): Label index of the new hand sign, or LABEL_NONE.
+        previous_hand_sign (int): Label index of the previous hand sign, or LABEL_NONE.
+        gesture (int): Label index of the finger gesture, or LABEL_NONE.
+        unchanged_count (int): Frames the previous hand sign lasted (capped at 65535).
+        sequence (int): Sequence number of the frame that produced the result.
+        capture_timestamp_ms (int): Capture timestamp of that frame in milliseconds.
+        server_timestamp_ms (int): Time the result was produced in milliseconds.
+
+    Returns:
+        bytes: Packed result.
+    """
+    return RESULT.pack(RESULT_MESSAGE, hand_sign, previous_hand_sign, gesture,
+                       min(unchanged_count, 0xFFFF), sequence & 0xFFFFFFFF,
+                       capture_timestamp_ms, server_timestamp_ms)
+
+
+def pack_heartbeat(hand_sign, duration_ms, server_timestamp_ms):
+    """
+    Builds a compact binary heartbeat message.
+
+    Args:
+        hand_sign (int): Label index of the current hand sign, or LABEL_NONE.
+        duration_ms (int): How long the current hand sign has lasted in milliseconds.
+        server_timestamp_ms (int): Time the heartbeat was produced in milliseconds.
+
+    Returns:
+        bytes: Packed heartbeat.
+    """
+    return HEARTBEAT.pack(HEARTBEAT_MESSAGE, hand_sign, min(duration_ms, 0xFFFFFFFF),
+                          server_timestamp_ms)
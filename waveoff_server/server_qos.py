@@ -0,0 +1,73 @@
+import time
+from collections import deque
+
+
+class QosController:
+    def __init__(self, levels, deadline_s=0.066, miss_ratio=0.3, headroom=0.5, window=10, hold_s=2.0):
+        """
+        Steps a session down the degradation ladder (QOS_LADDER in constants.py) while
+        its frames miss their deadline, and back up once they finish well within it.
+        Each step is decided on a full window of frames measured at the current level,
+        so a change is never judged on frames of the previous one.
+        :param levels: Number of levels of the ladder; 0 is full quality.
+        :param deadline_s: Time a frame may take from leaving the mailbox to its result.
+        :param miss_ratio: Share of the window over the deadline that steps one level down.
+        :param headroom: Share of the deadline every frame of the window must stay under
+                         to step one level up.
+        :param window: Frames each decision looks at.
+        :param hold_s: Minimum time at a level before stepping back up, so a session does
+                       not oscillate between two levels.
+        """
+        self.levels = levels
+        self.deadline_s = deadline_s
+        self.miss_ratio = miss_ratio
+        self.headroom = headroom
+        self.hold_s = hold_s
+
+        self.level = 0
+        self._latencies = deque(maxlen=window)
+        self._since = time.monotonic()  # When the current level was entered
+        self.steps_down = 0
+        self.steps_up = 0
+        self.missed = 0
+
+    def observe(self, elapsed_s):
+        """
+        Record one processed frame.
+        :param elapsed_s: Time from taking the frame out of the mailbox to its result,
+                          waiting for a turn included, in seconds.
+        :return: True if the level changed.
+        """
+        if elapsed_s > self.deadline_s:
+            self.missed += 1
+        self._latencies.append(elapsed_s)
+        if len(self._latencies) < self._latencies.maxlen:
+            return False
+
+        misses = sum(1 for latency in self._latencies if latency > self.deadline_s)
+        if misses >= self.miss_ratio * len(self._latencies) and self.level < self.levels - 1:
+            self._step(1)
+            self.steps_down += 1
+            return True
+        if self.level > 0 and max(self._latencies) < self.deadline_s * self.headroom \
+                and time.monotonic() - self._since >= self.hold_s:
+            self._step(-1)
+            self.steps_up += 1
+            return True
+        return False
+
+    def _step(self, delta):
+        self.level += delta
+        self._latencies.clear()
+        self._since = time.monotonic()
+
+    def stats(self):
+        """
+        :return: dict - current level, steps taken and frames over the deadline.
+        """
+        return {
+            "level": self.level,
+            "steps_down": self.steps_down,
+            "steps_up": self.steps_up,
+            "missed": self.missed,
+        }
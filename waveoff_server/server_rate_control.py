@@ -0,0 +1,140 @@
+import time
+
+
+class FrameRateController:
+    def __init__(self, width, height, idle_fps=5, active_fps=30, min_fps=2, idle_after_s=1.0,
+                 max_queue_depth=2, headroom=0.8, overload_fps=15, overload_scale=0.5,
+                 interval_s=1.0, resizable=True, poor_quality_fps=1, poor_quality_after_s=1.0):
+        """
+        Decides the frame rate and resolution a client should stream at, from how long
+        no hand has been seen, the measured processing latency and the queue depth in
+        front of the pipeline.
+        :param width: Full frame width.
+        :param height: Full frame height.
+        :param idle_fps: Frame rate while no hand is in view.
+        :param active_fps: Frame rate while a hand is in view.
+        :param min_fps: Lowest frame rate ever requested.
+        :param idle_after_s: Seconds without a hand before the session counts as idle.
+        :param max_queue_depth: Frames waiting for inference above which the server is
+                                considered behind.
+        :param headroom: Fraction of the measured processing capacity a client may use.
+        :param overload_fps: Below this frame rate an active session also asks for
+                             smaller frames instead of dropping further.
+        :param overload_scale: Resolution scale requested when overloaded.
+        :param interval_s: Minimum time between load driven changes.
+        :param resizable: Whether the client can send frames of another size (binary
+                          frames carry their size, Base64 frames do not).
+        :param poor_quality_fps: Frame rate while frames are too dark or blurred to use.
+        :param poor_quality_after_s: Seconds of unusable frames before backing off to it.
+        """
+        self.full_size = (width, height)
+        self.idle_fps = idle_fps
+        self.active_fps = active_fps
+        self.min_fps = min_fps
+        self.idle_after_s = idle_after_s
+        self.max_queue_depth = max_queue_depth
+        self.headroom = headroom
+        self.overload_fps = overload_fps
+        self.overload_scale = overload_scale
+        self.interval_s = interval_s
+        self.resizable = resizable
+        self.priority = False
+        self.poor_quality_fps = poor_quality_fps
+        self.poor_quality_after_s = poor_quality_after_s
+
+        self.latency_ms = None  # Moving average of the processing latency
+        self.fps = active_fps
+        self.size = self.full_size
+        self._last_hand = time.monotonic()
+        self._last_change = 0.0
+        self._changed = False
+        self._poor_since = None  # Start of the current run of unusable frames
+
+    def observe(self, result, latency_s, queue_depth=0, usable=True):
+        """
+        Record one processed frame.
+        :param result: The gesture result of the frame.
+        :param latency_s: Time spent processing the frame, in seconds.
+        :param queue_depth: Frames waiting for inference when the frame finished.
+        :param usable: False if the frame was too dark, flat or blurred to contain a hand.
+        """
+        latency_ms = latency_s * 1000
+        self.latency_ms = latency_ms if self.latency_ms is None \
+            else 0.8 * self.latency_ms + 0.2 * latency_ms
+
+        now = time.monotonic()
+        hand = result is not None and result.get("hand_sign", "None") != "None"
+        was_idle = now - self._last_hand >= self.idle_after_s
+        if hand:
+            self._last_hand = now
+        recovered = usable and self._poor_since is not None
+        if usable:
+            self._poor_since = None
+        elif self._poor_since is None:
+            self._poor_since = now
+
+        # A hand showing up or usable frames coming back are acted on at once,
+        # everything else at most every interval_s
+        if not (hand and was_idle) and not recovered and now - self._last_change < self.interval_s:
+            return
+
+        fps, size = self._decide(now, queue_depth)
+        if fps != self.fps or size != self.size:
+            self.fps, self.size = fps, size
+            self._last_change = now
+            self._changed = True
+
+    @property
+    def idle(self):
+        return time.monotonic() - self._last_hand >= self.idle_after_s
+
+    def set_priority(self, priority):
+        """
+        Priority sessions (a ringing phone) stream at the active rate and full size even
+        without a hand in view and do not back off for queued frames of other sessions.
+        :param priority: Whether the session has priority.
+        """
+        self.priority = priority
+        self._last_change = 0.0  # Decide again on the next frame
+
+    def _decide(self, now, queue_depth):
+        if self._poor_since is not None and now - self._poor_since >= self.poor_quality_after_s \
+                and not self.priority:
+            # Pocket, face down or covered: check back rarely until frames are usable again
+            return self.poor_quality_fps, self.full_size
+        if now - self._last_hand >= self.idle_after_s and not self.priority:
+            return self.idle_fps, self.full_size
+
+        fps = self.active_fps
+        if self.latency_ms:
+            # Never ask for more frames than the pipeline can process
+            fps = min(fps, int(1000 / self.latency_ms * self.headroom))
+        if queue_depth > self.max_queue_depth and not self.priority:
+            # Frames are piling up in front of inference: back off from the current rate
+            fps = min(fps, int(self.fps * self.headroom))
+        fps = max(self.min_fps, fps)
+
+        size = self.full_size
+        if fps < self.overload_fps and self.resizable and not self.priority:
+            width, height = self.full_size
+            # Even dimensions so NV21 frames stay valid
+            size = (int(width * self.overload_scale) & ~1, int(height * self.overload_scale) & ~1)
+        return fps, size
+
+    def changed(self):
+        """
+        :return: True once after the frame rate or resolution changed.
+        """
+        changed, self._changed = self._changed, False
+        return changed
+
+    def control(self):
+        """
+        :return: dict - the current request to the client.
+        """
+        return {
+            "type": "control",
+            "fps": self.fps,
+            "width": self.size[0],
+            "height": self.size[1],
+        }
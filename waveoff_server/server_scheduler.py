@@ -0,0 +1,94 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+
+class InferenceScheduler:
+    def __init__(self, concurrency):
+        """
+        Decides which session runs gesture recognition next when more frames are ready
+        than can be processed at once. Priority sessions (a phone that is ringing) always
+        go first; the rest share the remaining capacity by weighted fair queuing, so a
+        session gets frames in proportion to its weight no matter how fast it sends.
+        :param concurrency: Frames processed at the same time (threads or worker slots).
+        """
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._queue = []             # (class, virtual finish time, ticket, Future)
+        self._tickets = itertools.count()
+        self._running = 0
+        self._virtual_time = 0.0
+        self._finish = {}            # session_id -> virtual finish time of its last fair queued frame
+        self.granted = 0
+        self.granted_priority = 0
+
+    def acquire(self, session_id, weight=1.0, priority=False):
+        """
+        Queue a frame of a session for processing.
+        :param session_id: Identifier of the session.
+        :param weight: Share of the capacity relative to other sessions.
+        :param priority: Whether the frame goes ahead of all non priority frames.
+        :return: concurrent.futures.Future resolving once the frame may be processed.
+                 Call release() when done, or cancel() the future to give up waiting.
+        """
+        future = Future()
+        with self._lock:
+            finish = max(self._virtual_time, self._finish.get(session_id, 0.0)) + 1.0 / weight
+            if not priority:
+                # Frames that jumped the queue while ringing do not count against the session's share
+                self._finish[session_id] = finish
+            heapq.heappush(self._queue, (0 if priority else 1, finish, next(self._tickets), future))
+            self._grant()
+        return future
+
+    def release(self):
+        """
+        Mark a granted frame as done and let the next one run.
+        """
+        with self._lock:
+            self._running -= 1
+            self._grant()
+
+    def forget(self, session_id):
+        """
+        Drop the fair queuing state of a finished session.
+        :param session_id: Identifier of the session.
+        """
+        with self._lock:
+            self._finish.pop(session_id, None)
+
+    def waiting(self):
+        """
+        :return: int - frames waiting for their turn.
+        """
+        with self._lock:
+            return self._waiting()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "waiting": self._waiting(),
+                "granted": self.granted,
+                "granted_priority": self.granted_priority,
+            }
+
+    def _waiting(self):
+        # Called with the lock held; cancelled frames stay queued until they come up
+        return sum(1 for entry in self._queue if not entry[3].cancelled())
+
+    def _grant(self):
+        # Called with the lock held
+        while self._running < self.concurrency and self._queue:
+            frame_class, finish, _, future = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue  # The session stopped waiting
+            self._running += 1
+            self.granted += 1
+            if frame_class == 0:
+                self.granted_priority += 1
+            else:
+                # Virtual time follows the fair queue only, priority frames do not skew it
+                self._virtual_time = max(self._virtual_time, finish)
+            future.set_result(None)
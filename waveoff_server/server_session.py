@@ -0,0 +1,534 @@
+import asyncio
+import functools
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from main import GesturePipeline, gesture_labels, keypoint_labels, qos_profile
+from constants import WIDTH, HEIGHT
+from constants import ARCHIVE_ENABLED, ARCHIVE_EVERY_N, ARCHIVE_ON_CHANGE, STATS_INTERVAL_S
+from constants import (RATE_ACTIVE_FPS, RATE_CONTROL_INTERVAL_S, RATE_IDLE_AFTER_S, RATE_IDLE_FPS,
+                       RATE_MAX_QUEUE_DEPTH, RATE_MIN_FPS, RATE_OVERLOAD_FPS, RATE_OVERLOAD_SCALE,
+                       RATE_POOR_QUALITY_AFTER_S, RATE_POOR_QUALITY_FPS)
+from constants import SCHEDULER_ACTIVE_WEIGHT, SCHEDULER_IDLE_WEIGHT, WORKER_RESULT_TIMEOUT_S
+from constants import (QOS_DEADLINE_MS, QOS_ENABLED, QOS_HEADROOM, QOS_HOLD_S, QOS_LADDER,
+                       QOS_MISS_RATIO, QOS_WINDOW)
+from constants import ROI_CLIENT_CROP_SIZE
+from constants import CLASSIFIER_BATCHING, CLASSIFIER_BATCH_MAX_DELAY_MS, CLASSIFIER_BATCH_MAX_SIZE
+from model import BatchingClassifier, KeyPointClassifier, PointHistoryClassifier
+from mediapipe_helpers.hand_processor_pool import create_hand_processor_pool
+from mediapipe_helpers.landmark_flow import create_landmark_tracker
+from mediapipe_helpers.roi import create_roi_tracker
+from helper.Logger import Logger
+from utils.motion_gate import create_motion_gate
+from utils.quality_gate import create_quality_gate
+from server_archive import ArchiveSampler
+from server_frame_pool import FramePool
+from server_image_conversion import decode_base64
+from server_observer import Observer
+from server_qos import QosController
+from server_rate_control import FrameRateController
+from server_protocol import (LABEL_NONE, MESSAGE_HELLO, PIXEL_FORMAT_IDS, RESULTS_BINARY,
+                             ROI_FULL_FRAME, TRANSPORT_BINARY, ProtocolError, build_roi_request,
+                             build_welcome, default_options, is_json_message, pack_heartbeat,
+                             pack_result, parse_call_state, parse_frame, parse_handshake,
+                             parse_message)
+
+
+# Classifiers shared by all in-process sessions, created on first use
+_batching_classifiers = None
+_batching_classifiers_lock = threading.Lock()
+
+
+def batching_classifiers():
+    """
+    :return: (BatchingClassifier, BatchingClassifier) - keypoint and point history
+             classifiers that batch feature vectors across sessions.
+    """
+    global _batching_classifiers
+    with _batching_classifiers_lock:
+        if _batching_classifiers is None:
+            _batching_classifiers = (
+                BatchingClassifier(KeyPointClassifier(),
+                                   CLASSIFIER_BATCH_MAX_DELAY_MS, CLASSIFIER_BATCH_MAX_SIZE),
+                BatchingClassifier(PointHistoryClassifier(),
+                                   CLASSIFIER_BATCH_MAX_DELAY_MS, CLASSIFIER_BATCH_MAX_SIZE),
+            )
+        return _batching_classifiers
+
+
+# Warm Mediapipe instances of all in-process sessions, created on first use
+_hand_processor_pool = None
+_hand_processor_pool_lock = threading.Lock()
+
+
+def hand_processor_pool():
+    """
+    :return: HandProcessorPool shared by in-process sessions. Call at start-up to
+             warm it up before the first connection.
+    """
+    global _hand_processor_pool
+    with _hand_processor_pool_lock:
+        if _hand_processor_pool is None:
+            _hand_processor_pool = create_hand_processor_pool()
+    return _hand_processor_pool
+
+
+# Label tables sent in the welcome and the codes binary results use for them
+LABELS = {"hand_sign": keypoint_labels, "gesture": gesture_labels}
+HAND_SIGN_CODES = {label: index for index, label in enumerate(keypoint_labels)}
+GESTURE_CODES = {label: index for index, label in enumerate(gesture_labels)}
+
+
+class Session:
+    def __init__(self, mailbox, frame_archive=None, worker_pool=None, scheduler=None,
+                 width=WIDTH, height=HEIGHT):
+        """
+        State of one /opencv connection, independent of the WebSocket server running it.
+        :param mailbox: Latest-frame mailbox between the receiver and the processor
+                        (LatestFrameMailbox or AsyncLatestFrameMailbox).
+        :param frame_archive: FrameArchive that sampled frames are handed to (optional).
+        :param worker_pool: InferenceWorkerPool running gesture recognition (optional);
+                            without one the session runs its own pipeline in-process.
+        :param scheduler: InferenceScheduler shared by the sessions of the server (optional).
+        :param width: Expected frame width.
+        :param height: Expected frame height.
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.width = width
+        self.height = height
+        self.frame_archive = frame_archive
+        self.logger = Logger()
+        self.created_at = time.monotonic()
+        self.last_activity = self.created_at
+
+        # Base64 text frames until the client negotiates otherwise
+        self.options = default_options()
+
+        # Results of this session are delivered to this session's subscribers only
+        self.observer = Observer(self.options["min_interval_ms"], self.options["heartbeat_ms"])
+
+        # Tracker, classifiers and gesture histories of this phone only; with a
+        # worker pool they live in the worker process the session is pinned to
+        self.worker_pool = worker_pool
+        self.scheduler = scheduler
+        self.pipeline = None
+        if worker_pool is None:
+            classifiers = batching_classifiers() if CLASSIFIER_BATCHING else (None, None)
+            self.pipeline = GesturePipeline(*classifiers, roi_tracker=create_roi_tracker(),
+                                            hand_processor=hand_processor_pool().acquire(),
+                                            motion_gate=create_motion_gate(),
+                                            quality_gate=create_quality_gate(),
+                                            landmark_tracker=create_landmark_tracker())
+
+        # Crops the client was asked to send instead of full frames, by id
+        self._client_rois = {}
+        self._roi_ids = itertools.count(1)
+        self._requested_roi = None
+
+        # Preallocated buffers that every frame of this connection is decoded into:
+        # one being decoded, one waiting in the mailbox and one being processed.
+        # With a worker pool they are a shared memory ring the workers read in place.
+        self.frame_pool = FramePool(width, height, size=3, shared=worker_pool is not None)
+        self.mailbox = mailbox
+
+        # Frame counters reported to the client every STATS_INTERVAL_S
+        self.frames_received = 0
+        self.frames_processed = 0
+        self._last_stats_report = time.monotonic()
+
+        # Frame behind the latest result, for binary result messages
+        self.last_sequence = 0
+        self.last_timestamp_ms = 0
+
+        # Frame rate and resolution this client is asked to stream at
+        self.rate_controller = FrameRateController(
+            width, height, RATE_IDLE_FPS, RATE_ACTIVE_FPS, RATE_MIN_FPS, RATE_IDLE_AFTER_S,
+            RATE_MAX_QUEUE_DEPTH, overload_fps=RATE_OVERLOAD_FPS,
+            overload_scale=RATE_OVERLOAD_SCALE, interval_s=RATE_CONTROL_INTERVAL_S,
+            resizable=False, poor_quality_fps=RATE_POOR_QUALITY_FPS,
+            poor_quality_after_s=RATE_POOR_QUALITY_AFTER_S)
+        self._dropped_seen = 0
+
+        # Quality profile this session runs at: stepped down while frames miss their deadline
+        self.qos = QosController(len(QOS_LADDER), QOS_DEADLINE_MS / 1000, QOS_MISS_RATIO, QOS_HEADROOM,
+                                 QOS_WINDOW, QOS_HOLD_S) if QOS_ENABLED else None
+
+        # Set while the phone is ringing: frames go ahead of other sessions
+        self.ringing = False
+
+        # Which frames of this connection go to the archive
+        self.archive_sampler = ArchiveSampler(ARCHIVE_EVERY_N, ARCHIVE_ON_CHANGE)
+
+    def receive(self, message):
+        """
+        Handle one incoming message: a hello, a call state, a binary frame or a Base64 frame.
+        Frames are decoded into a pooled slot which must be passed to process().
+        :param message: Text or binary WebSocket message.
+        :return: (reply, slot) - JSON text to send back or None, and the FrameSlot
+                 holding the decoded frame or None.
+        """
+        self.last_activity = time.monotonic()
+        try:
+            if is_json_message(message):
+                decoded = parse_message(message)
+                if decoded["type"] != MESSAGE_HELLO:
+                    self.set_ringing(parse_call_state(decoded))
+                    return None, None
+
+                # Negotiate the frame transport
+                self.options = parse_handshake(decoded)
+                self.observer.configure(self.options["min_interval_ms"], self.options["heartbeat_ms"])
+                self.rate_controller.resizable = self.options["transport"] == TRANSPORT_BINARY
+                # Client crops are only followed by the in-process pipeline
+                self.options["roi"] = self.options["roi"] and self.pipeline is not None \
+                    and self.pipeline.roi_tracker is not None
+                return build_welcome(self.options, self.width, self.height, LABELS), None
+
+            if isinstance(message, (bytes, bytearray)):
+                # Binary frame: fixed header followed by the pixel payload
+                header, byte_data = parse_frame(message)
+                pixel_format, width, height = header.pixel_format, header.width, header.height
+                sequence, timestamp_ms = header.sequence, header.timestamp_ms
+                roi = None
+                if header.roi_id != ROI_FULL_FRAME:
+                    roi = self._client_rois.get(header.roi_id)
+                    if roi is None:
+                        raise ProtocolError(f"Unknown ROI: {header.roi_id}")
+            else:
+                # Base64 frame: validate and decode in a single pass
+                byte_data = decode_base64(message)
+                if byte_data is None:
+                    self.logger.log("RAHMANIA - Invalid Base64 data received.")
+                    return json.dumps({"error": "Invalid Base64 data"}), None
+                pixel_format = PIXEL_FORMAT_IDS[self.options["pixel_format"]]
+                width, height = self.width, self.height
+                sequence, timestamp_ms = self.frames_received + 1, int(time.time() * 1000)
+                roi = None
+        except ProtocolError as e:
+            self.logger.log(f"RAHMANIA - Protocol error: {e}")
+            return json.dumps({"error": f"Protocol error: {e}"}), None
+
+        # Decode raw, compressed or NV21 pixels into a pooled buffer
+        try:
+            slot = self.frame_pool.acquire(width, height)
+        except ValueError as e:
+            self.logger.log(f"RAHMANIA - Frame error: {e}")
+            return json.dumps({"error": f"Frame error: {e}"}), None
+        try:
+            slot.load(byte_data, pixel_format, width, height)
+        except ValueError as e:
+            self.frame_pool.release(slot)
+            self.logger.log(f"RAHMANIA - Decode error: {e}")
+            return json.dumps({"error": f"Decode error: {e}"}), None
+        slot.sequence, slot.timestamp_ms, slot.roi = sequence, timestamp_ms, roi
+        return None, slot
+
+    def submit(self, slot):
+        """
+        Hand a decoded frame to the processor, replacing any frame it has not taken yet.
+        :param slot: FrameSlot returned by receive().
+        """
+        self.frames_received += 1
+        evicted = self.mailbox.put(slot)
+        if evicted is not None:
+            self.frame_pool.release(evicted)
+
+    def set_ringing(self, ringing):
+        """
+        Give the session priority for gesture recognition and a full frame budget
+        while the phone is ringing.
+        :param ringing: Whether the phone is ringing.
+        """
+        if ringing != self.ringing:
+            self.logger.log(f"RAHMANIA - Session {self.id} ringing: {ringing}")
+        self.ringing = ringing
+        self.rate_controller.set_priority(ringing)
+
+    def process(self, slot):
+        """
+        Run gesture recognition on a decoded frame and release its slot.
+        Blocking; asyncio servers use process_async instead.
+        :param slot: FrameSlot returned by receive().
+        :return: dict - the gesture result.
+        """
+        release = functools.partial(self.frame_pool.release, slot)
+        try:
+            taken = time.monotonic()
+            # Wait for this session's turn
+            if self.scheduler is not None:
+                self._schedule().result()
+            started = time.monotonic()
+            try:
+                if self.worker_pool is None:
+                    # Call the process_image function on the mirrored RGB frame
+                    result = self.pipeline.process_image(slot.rgb, is_rgb=True, crop_roi=slot.roi)
+                else:
+                    # The worker may still read the slot after a timeout: it is only reused
+                    # once both are done with it
+                    release, worker_done = self.frame_pool.release_later(slot)
+                    # Never wait forever on a worker: a stuck frame must not hold its turn
+                    result = self.worker_pool.submit(self.id, self._worker_frame(slot), self.qos_level,
+                                                     on_done=worker_done).result(timeout=WORKER_RESULT_TIMEOUT_S)
+            finally:
+                if self.scheduler is not None:
+                    self.scheduler.release()
+            finished = time.monotonic()
+            return self._record(slot, result, finished - started, finished - taken)
+        finally:
+            release()
+
+    async def process_async(self, slot, executor):
+        """
+        Awaitable counterpart of process(): CPU bound work runs in the executor,
+        or in the worker pool if the session has one.
+        :param slot: FrameSlot returned by receive().
+        :param executor: Executor for in-process gesture recognition.
+        :return: dict - the gesture result.
+        """
+        release = functools.partial(self.frame_pool.release, slot)
+        try:
+            taken = time.monotonic()
+            # Wait for this session's turn
+            if self.scheduler is not None:
+                turn = self._schedule()
+                try:
+                    await asyncio.wrap_future(turn)
+                except asyncio.CancelledError:
+                    if not turn.cancel():
+                        self.scheduler.release()  # Granted just before the cancellation
+                    raise
+            started = time.monotonic()
+            try:
+                if self.worker_pool is None:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        executor, functools.partial(self.pipeline.process_image, slot.rgb,
+                                                    is_rgb=True, crop_roi=slot.roi))
+                else:
+                    release, worker_done = self.frame_pool.release_later(slot)  # See process()
+                    result = await asyncio.wait_for(asyncio.wrap_future(
+                        self.worker_pool.submit(self.id, self._worker_frame(slot), self.qos_level,
+                                                on_done=worker_done)),
+                        WORKER_RESULT_TIMEOUT_S)
+            finally:
+                if self.scheduler is not None:
+                    self.scheduler.release()
+            finished = time.monotonic()
+            return self._record(slot, result, finished - started, finished - taken)
+        finally:
+            release()
+
+    def _schedule(self):
+        # Ringing sessions first, then fair shares weighted by hand presence
+        weight = SCHEDULER_IDLE_WEIGHT if self.rate_controller.idle else SCHEDULER_ACTIVE_WEIGHT
+        return self.scheduler.acquire(self.id, weight, priority=self.ringing)
+
+    @staticmethod
+    def _worker_frame(slot):
+        # Slot index and sequence number only, unless the slot is outside the shared ring
+        ref = slot.shared_ref(slot.sequence)
+        return ref if ref is not None else slot.rgb
+
+    @property
+    def qos_level(self):
+        return self.qos.level if self.qos is not None else 0
+
+    def _record(self, slot, result, latency_s, elapsed_s):
+        self.frames_processed += 1
+
+        # Trade recognition quality for time before the frame rate has to give
+        if self.qos is not None and self.qos.observe(elapsed_s):
+            self.logger.log(f"RAHMANIA - Session {self.id} quality level: {self.qos.level}")
+            if self.pipeline is not None:
+                self.pipeline.set_profile(qos_profile(self.qos.level))
+
+        # Frames that piled up while this one was processed: overwritten in the
+        # mailbox, plus whatever is queued on the session's worker
+        dropped = self.mailbox.dropped
+        queue_depth = dropped - self._dropped_seen
+        self._dropped_seen = dropped
+        if self.worker_pool is not None:
+            queue_depth += self.worker_pool.queue_depth(self.id)
+        if self.scheduler is not None and not self.ringing:
+            # Frames of all sessions waiting for their turn: everyone but ringing phones backs off
+            queue_depth += self.scheduler.waiting()
+        self.rate_controller.observe(result, latency_s, queue_depth, self._frame_usable())
+
+        self.last_sequence, self.last_timestamp_ms = slot.sequence, slot.timestamp_ms
+
+        # Hand sampled frames to the background archive (never blocks on disk)
+        # Client crops are not archived, only full frames
+        if ARCHIVE_ENABLED and self.frame_archive is not None and slot.roi is None \
+                and self.archive_sampler.should_archive(result):
+            self.frame_archive.submit(self.id, slot.rgb, result)
+        return result
+
+    def _frame_usable(self):
+        # Quality verdict on the last frame; worker pipelines keep theirs to themselves
+        if self.pipeline is None or self.pipeline.quality_gate is None:
+            return True
+        return self.pipeline.quality_gate.last_reason is None
+
+    def encode_notification(self, notification):
+        """
+        Encode an Observer notification in the result format the client negotiated:
+        JSON text by default, or a compact binary struct with label indexes.
+        Called when the notification is produced, so it carries the frame behind it.
+        :param notification: Notification dict from the Observer.
+        :return: str or bytes - the message to send.
+        """
+        if self.options["results"] != RESULTS_BINARY:
+            return json.dumps(notification)
+
+        if notification.get("type") == "heartbeat":
+            result = notification["result"] or {}
+            return pack_heartbeat(HAND_SIGN_CODES.get(result.get("hand_sign"), LABEL_NONE),
+                                  notification["duration_ms"], int(time.time() * 1000))
+
+        result = notification["result"] or {}
+        previous_result = notification["previous_result"] or {}
+        return pack_result(
+            HAND_SIGN_CODES.get(result.get("hand_sign"), LABEL_NONE),
+            HAND_SIGN_CODES.get(previous_result.get("hand_sign"), LABEL_NONE),
+            GESTURE_CODES.get(result.get("gesture_type"), LABEL_NONE),
+            notification["unchanged_count"],
+            self.last_sequence,
+            self.last_timestamp_ms,
+            int(time.time() * 1000),
+        )
+
+    def stats_report(self):
+        """
+        :return: JSON stats message if STATS_INTERVAL_S has passed since the last one, else None.
+        """
+        now = time.monotonic()
+        if now - self._last_stats_report < STATS_INTERVAL_S:
+            return None
+        self._last_stats_report = now
+        return json.dumps(dict(type="stats", **self.stats()))
+
+    def control_report(self):
+        """
+        :return: JSON control message with the frame rate and resolution the client
+                 should stream at, if it changed and the client negotiated control, else None.
+        """
+        if not self.rate_controller.changed() or not self.options["control"]:
+            return None
+        return json.dumps(self.rate_controller.control())
+
+    def roi_report(self):
+        """
+        :return: JSON message asking the client to send only the crop around the hand,
+                 or full frames again once the hand is lost, if the region changed and
+                 the client negotiated "roi", else None.
+        """
+        if not self.options["roi"]:
+            return None
+        roi = self.pipeline.roi
+        if roi == self._requested_roi:
+            return None
+        self._requested_roi = roi
+        if roi is None:
+            return build_roi_request(ROI_FULL_FRAME)
+
+        # Frames in flight may still show one of the previous crops
+        roi_id = next(self._roi_ids) % 0xFFFF + 1
+        self._client_rois[roi_id] = roi
+        while len(self._client_rois) > 4:
+            self._client_rois.pop(next(iter(self._client_rois)))
+        return build_roi_request(roi_id, roi, ROI_CLIENT_CROP_SIZE)
+
+    def stats(self):
+        """
+        :return: dict - frame counters of this session.
+        """
+        stats = {
+            "session_id": self.id,
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.mailbox.dropped,
+            "ringing": self.ringing,
+            "age_s": round(time.monotonic() - self.created_at, 1),
+        }
+        if self.qos is not None:
+            # Position on the degradation ladder
+            stats["qos"] = self.qos.stats()
+        if self.pipeline is not None:
+            # Palm detection vs. tracking in this session's own Mediapipe graph
+            stats["hand_processor"] = self.pipeline.hand_processor.stats()
+        if self.pipeline is not None and isinstance(self.pipeline.keypoint_classifier, BatchingClassifier):
+            # Batches the classifiers shared by all in-process sessions reached
+            stats["classifier_batching"] = {
+                "keypoint": self.pipeline.keypoint_classifier.stats(),
+                "point_history": self.pipeline.point_history_classifier.stats(),
+            }
+        if self.pipeline is not None and self.pipeline.roi_tracker is not None:
+            # Crops around the hand, full frame retries after a miss and tracking restarts
+            stats["roi"] = self.pipeline.roi_stats()
+        if self.pipeline is not None and self.pipeline.motion_gate is not None:
+            # Frames answered with the previous result because nothing moved
+            stats["motion_gate"] = self.pipeline.motion_gate.stats()
+        if self.pipeline is not None and self.pipeline.quality_gate is not None:
+            # Frames rejected as too dark, washed out, flat or blurred
+            stats["quality_gate"] = self.pipeline.quality_gate.stats()
+        if self.pipeline is not None and self.pipeline.landmark_tracker is not None:
+            # Frames that went through Mediapipe vs. followed the optical flow
+            stats["landmark_flow"] = self.pipeline.landmark_tracker.stats()
+        return stats
+
+    def stop(self):
+        """
+        Stop accepting frames and wake up the processor so it can exit.
+        """
+        pending = self.mailbox.close()
+        if pending is not None:
+            self.frame_pool.release(pending)
+
+    def close(self):
+        """
+        Flush whatever this session still has pending in shared subsystems.
+        Call once the processor has exited.
+        """
+        if self.frame_archive is not None:
+            self.frame_archive.close_session(self.id)
+        if self.worker_pool is not None:
+            self.worker_pool.close_session(self.id)
+        if self.scheduler is not None:
+            self.scheduler.forget(self.id)
+        if self.pipeline is not None:
+            # Back to the pool with its tracking state reset
+            self.pipeline.hand_processor.release()
+        self.frame_pool.close()
+
+
+class SessionRegistry:
+    def __init__(self):
+        """
+        Live sessions of a server process. Sessions are added on connect and removed
+        on disconnect or idle timeout.
+        """
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            self._sessions[session.id] = session
+
+    def remove(self, session):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
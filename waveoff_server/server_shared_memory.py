@@ -0,0 +1,66 @@
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# What a worker receives instead of a pickled frame: where the frame lives in shared memory
+SharedFrameRef = namedtuple("SharedFrameRef", ["name", "slots", "height", "width", "index", "sequence"])
+
+
+class SharedFrameRing:
+    def __init__(self, slots, width, height):
+        """
+        Ring of HEIGHT x WIDTH x 3 frames in one shared memory block, owned by the
+        front-end. Frames are decoded straight into it and workers read them in place.
+        :param slots: Number of frames in the ring.
+        :param width: Width of the frames in pixels.
+        :param height: Height of the frames in pixels.
+        """
+        self.slots = slots
+        self.width = width
+        self.height = height
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * height * width * 3)
+        self.name = self._shm.name
+        self.frames = np.ndarray((slots, height, width, 3), dtype=np.uint8, buffer=self._shm.buf)
+
+    def ref(self, index, sequence):
+        """
+        :return: SharedFrameRef pointing at a slot of this ring.
+        """
+        return SharedFrameRef(self.name, self.slots, self.height, self.width, index, sequence)
+
+    def close(self):
+        """
+        Release and unlink the shared memory block.
+        """
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # Slot views are still referenced; the mapping goes away with them
+        self._shm.unlink()
+
+
+class SharedFrameView:
+    def __init__(self, ref):
+        """
+        Worker side of a SharedFrameRing: attaches to the block named in a SharedFrameRef.
+        :param ref: Any SharedFrameRef of the ring.
+        """
+        self.name = ref.name
+        self._shm = shared_memory.SharedMemory(name=ref.name)
+        self.frames = np.ndarray((ref.slots, ref.height, ref.width, 3), dtype=np.uint8,
+                                 buffer=self._shm.buf)
+
+    def frame(self, ref):
+        """
+        :return: np.ndarray - view of the referenced slot, no copy.
+        """
+        return self.frames[ref.index]
+
+    def close(self):
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
@@ -0,0 +1,266 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from helper.Logger import Logger
+from server_shared_memory import SharedFrameRef, SharedFrameView
+
+# Requests sent to a worker process
+FRAME = "frame"
+CLOSE = "close"
+
+
+def _worker_main(worker_index, requests, responses):
+    """
+    Body of an inference worker process. Keeps one GesturePipeline (own HandProcessor,
+    KeyPointClassifier and PointHistoryClassifier) per session pinned to this worker,
+    so Mediapipe tracking state stays warm between frames. Frames arrive either pickled
+    or as a SharedFrameRef into the session's shared memory ring.
+    """
+    from main import GesturePipeline, qos_profile
+    from mediapipe_helpers.batched_landmarks import disable_landmark_batching
+    from mediapipe_helpers.hand_processor_pool import create_hand_processor_pool
+    from mediapipe_helpers.landmark_flow import create_landmark_tracker
+    from mediapipe_helpers.roi import create_roi_tracker
+    from utils.motion_gate import create_motion_gate
+    from utils.quality_gate import create_quality_gate
+
+    disable_landmark_batching()  # Frames run one at a time here: nothing to batch with
+    hand_processors = create_hand_processor_pool()
+    pipelines = {}
+    views = {}  # session_id -> SharedFrameView
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        kind, session_id, request_id, frame, qos_level = request
+        if kind == CLOSE:
+            pipeline = pipelines.pop(session_id, None)
+            if pipeline is not None:
+                pipeline.hand_processor.release()
+            view = views.pop(session_id, None)
+            if view is not None:
+                view.close()
+            continue
+
+        try:
+            if isinstance(frame, SharedFrameRef):
+                # Read the frame in place from the front-end's ring
+                view = views.get(session_id)
+                if view is None or view.name != frame.name:
+                    if view is not None:
+                        view.close()
+                    view = views[session_id] = SharedFrameView(frame)
+                frame = view.frame(frame)
+
+            pipeline = pipelines.get(session_id)
+            if pipeline is None:
+                pipeline = pipelines[session_id] = GesturePipeline(
+                    roi_tracker=create_roi_tracker(), hand_processor=hand_processors.acquire(),
+                    motion_gate=create_motion_gate(),
+                    quality_gate=create_quality_gate(), landmark_tracker=create_landmark_tracker())
+            pipeline.set_profile(qos_profile(qos_level))
+            result = pipeline.process_image(frame, is_rgb=True)
+            responses.put((request_id, worker_index, result, None))
+        except Exception as e:
+            responses.put((request_id, worker_index, None, str(e)))
+
+
+class InferenceWorkerPool:
+    def __init__(self, num_workers, rebalance_depth=4, health_check_s=1.0):
+        """
+        Pool of processes running gesture recognition outside the GIL of the server.
+        Sessions are pinned to a worker and only moved when that worker saturates.
+        A worker that dies (crash, OOM kill) fails its pending frames and is replaced;
+        its sessions start over on the next frame.
+        :param num_workers: Number of worker processes.
+        :param rebalance_depth: In-flight frames at which a worker counts as saturated.
+        :param health_check_s: Interval at which dead workers are looked for.
+        """
+        self.rebalance_depth = rebalance_depth
+        self.health_check_s = health_check_s
+        self._logger = Logger()
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._pending = {}          # request_id -> (Future, session_id, worker index, on_done)
+        self._assignments = {}      # session_id -> worker index
+        self._session_in_flight = {}
+        self._in_flight = [0] * num_workers
+        self._sessions = [0] * num_workers
+        self.processed = [0] * num_workers
+        self.rebalanced = 0
+        self.restarted = 0
+        self._closing = False
+
+        # Spawn instead of fork: Mediapipe and TFLite state must not be inherited
+        self._context = multiprocessing.get_context("spawn")
+        self._responses = self._context.Queue()
+        self._requests = [None] * num_workers
+        self._processes = [None] * num_workers
+        for worker_index in range(num_workers):
+            self._start_worker(worker_index)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="inference-results", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, session_id, frame, qos_level=0, on_done=None):
+        """
+        Queue a mirrored RGB frame on the worker the session is pinned to.
+        :param session_id: Identifier of the session.
+        :param frame: SharedFrameRef of the frame, or a HEIGHT x WIDTH x 3 RGB image to pickle.
+                      Either must stay untouched until on_done is called.
+        :param qos_level: Level of the degradation ladder to process the frame at.
+        :param on_done: Called from the result thread once the worker no longer reads the frame:
+                        when its result arrives or the worker is found dead, also if the session
+                        stopped waiting for the future (timeout or disconnect).
+        :return: concurrent.futures.Future resolving to the gesture result.
+        """
+        future = Future()
+        with self._lock:
+            worker_index = self._worker_for(session_id)
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (future, session_id, worker_index, on_done)
+            self._in_flight[worker_index] += 1
+            self._session_in_flight[session_id] = self._session_in_flight.get(session_id, 0) + 1
+            requests = self._requests[worker_index]  # Not a replaced worker's queue
+        requests.put((FRAME, session_id, request_id, frame, qos_level))
+        return future
+
+    def close_session(self, session_id):
+        """
+        Drop the pipeline of a finished session in its worker.
+        :param session_id: Identifier of the session.
+        """
+        with self._lock:
+            worker_index = self._assignments.pop(session_id, None)
+            self._session_in_flight.pop(session_id, None)
+            if worker_index is None:
+                return
+            self._sessions[worker_index] -= 1
+            requests = self._requests[worker_index]
+        requests.put((CLOSE, session_id, None, None, None))
+
+    def queue_depth(self, session_id):
+        """
+        :return: int - frames in flight on the worker the session is pinned to.
+        """
+        with self._lock:
+            worker_index = self._assignments.get(session_id)
+            return 0 if worker_index is None else self._in_flight[worker_index]
+
+    def stats(self):
+        """
+        :return: dict - sessions, in-flight and processed frames per worker.
+        """
+        with self._lock:
+            return {
+                "sessions": list(self._sessions),
+                "in_flight": list(self._in_flight),
+                "processed": list(self.processed),
+                "rebalanced": self.rebalanced,
+                "restarted": self.restarted,
+            }
+
+    def shutdown(self):
+        self._closing = True  # Workers exiting now are not replaced
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+
+    def _start_worker(self, worker_index):
+        # A fresh queue too: the dead worker may have left the old one half read
+        requests = self._context.Queue()
+        process = self._context.Process(target=_worker_main, name=f"inference-{worker_index}",
+                                        args=(worker_index, requests, self._responses), daemon=True)
+        process.start()
+        self._requests[worker_index] = requests
+        self._processes[worker_index] = process
+
+    def _replace_dead_workers(self):
+        for worker_index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            with self._lock:
+                failed = [(request_id, future, on_done)
+                          for request_id, (future, _, index, on_done) in self._pending.items()
+                          if index == worker_index]
+                for request_id, _, _ in failed:
+                    del self._pending[request_id]
+                # Its sessions lost their pipelines; they are pinned again on their next frame
+                orphans = [session_id for session_id, index in self._assignments.items()
+                           if index == worker_index]
+                for session_id in orphans:
+                    del self._assignments[session_id]
+                    self._session_in_flight.pop(session_id, None)
+                self._in_flight[worker_index] = 0
+                self._sessions[worker_index] = 0
+                self._start_worker(worker_index)
+                self.restarted += 1
+            self._logger.log(f"RAHMANIA - Worker {worker_index} died (exit code {process.exitcode}), "
+                             f"restarted; {len(failed)} frames failed, {len(orphans)} sessions moved.")
+            for _, future, on_done in failed:
+                if on_done is not None:
+                    on_done()
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(RuntimeError(f"Inference worker {worker_index} died"))
+
+    def _least_loaded(self):
+        return min(range(len(self._processes)),
+                   key=lambda index: (self._in_flight[index], self._sessions[index]))
+
+    def _worker_for(self, session_id):
+        # Called with the lock held
+        worker_index = self._assignments.get(session_id)
+        if worker_index is None:
+            worker_index = self._least_loaded()
+            self._assignments[session_id] = worker_index
+            self._sessions[worker_index] += 1
+            return worker_index
+
+        # Move the session off a saturated worker, but only between frames so its
+        # results never arrive out of order
+        if self._in_flight[worker_index] >= self.rebalance_depth \
+                and not self._session_in_flight.get(session_id):
+            target = self._least_loaded()
+            if self._in_flight[target] + 1 < self._in_flight[worker_index]:
+                self._requests[worker_index].put((CLOSE, session_id, None, None, None))
+                self._sessions[worker_index] -= 1
+                self._sessions[target] += 1
+                self._assignments[session_id] = target
+                self.rebalanced += 1
+                worker_index = target
+        return worker_index
+
+    def _dispatch(self):
+        next_check = time.monotonic() + self.health_check_s
+        while True:
+            # Look for dead workers even while the others keep answering
+            if time.monotonic() >= next_check and not self._closing:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + self.health_check_s
+            try:
+                request_id, worker_index, result, error = self._responses.get(timeout=self.health_check_s)
+            except queue.Empty:
+                continue
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+                if pending is None:
+                    continue  # Already failed when its worker was found dead
+                future, session_id, _, on_done = pending
+                self._in_flight[worker_index] -= 1
+                self.processed[worker_index] += 1
+                if session_id in self._session_in_flight:
+                    self._session_in_flight[session_id] -= 1
+            if on_done is not None:
+                on_done()  # Before the session can see the result and reuse the frame
+            if not future.set_running_or_notify_cancel():
+                continue  # The session stopped waiting (timeout or disconnect)
+            if error is None:
+                future.set_result(result)
+            else:
+                self._logger.log(f"RAHMANIA - Worker {worker_index} error: {error}")
+                future.set_exception(RuntimeError(error))
@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("tensorflow")  # Imported by the model package
+
+from model.batching_classifier import BatchingClassifier
+
+
+class FakeClassifier:
+    def __init__(self):
+        self.batches = []
+        self.invoked = threading.Event()
+        self.gate = threading.Event()
+
+    def classify_batch(self, batch):
+        self.invoked.set()
+        self.gate.wait(timeout=5)  # Requests pile up behind the first invoke
+        self.batches.append(list(batch))
+        return [features * 10 for features in batch]
+
+
+def test_answers_each_request_in_order():
+    classifier = FakeClassifier()
+    classifier.gate.set()
+    batching = BatchingClassifier(classifier, max_delay_ms=1.0)
+    assert batching(4) == 40
+    assert batching.stats()["immediate"] == 1  # Alone: not held back
+
+
+def test_splits_batches_at_the_maximum_size():
+    classifier = FakeClassifier()
+    batching = BatchingClassifier(classifier, max_delay_ms=50.0, max_batch_size=4)
+    with ThreadPoolExecutor(max_workers=11) as executor:
+        first = executor.submit(batching, 0)
+        assert classifier.invoked.wait(timeout=5)  # The dispatcher blocks in the first invoke
+        results = [executor.submit(batching, features) for features in range(1, 11)]
+        while batching._queue.qsize() < 10:
+            threading.Event().wait(0.001)
+        classifier.gate.set()
+        assert first.result(timeout=5) == 0
+        assert [future.result(timeout=5) for future in results] == [features * 10 for features in range(1, 11)]
+
+    assert [len(batch) for batch in classifier.batches] == [1, 4, 4, 2]
+    stats = batching.stats()
+    assert stats["items"] == 11
+    assert stats["batch_sizes"] == {1: 1, 4: 2, 2: 1}
+
+
+def test_failed_invoke_fails_the_whole_batch():
+    class Failing:
+        def classify_batch(self, batch):
+            raise RuntimeError("invoke failed")
+
+    batching = BatchingClassifier(Failing())
+    with pytest.raises(RuntimeError, match="invoke failed"):
+        batching(1)
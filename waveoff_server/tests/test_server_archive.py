@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from server_archive import FrameArchive
+
+
+def frame():
+    return np.zeros((4, 8, 3), dtype=np.uint8)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_close_flushes_frames_queued_before_it(tmp_path):
+    archive = FrameArchive(str(tmp_path), queue_size=4, segment_frames=64)
+    for _ in range(4):
+        archive.submit("phone", frame(), {"hand_sign": "Open"})
+    assert not archive.submit("phone", frame(), None)  # Queue full: dropped
+    archive.close_session("phone")  # Still queued, behind the frames
+
+    archive.start()
+    wait_for(lambda: archive.segments_written == 1)
+    wait_for(archive._queue.empty)
+    assert archive._segments == {}
+    segment = np.load(next((tmp_path / "phone").iterdir()))
+    assert len(segment["frames"]) == 4
+
+
+def test_retention_without_rescanning(tmp_path):
+    archive = FrameArchive(str(tmp_path), segment_frames=1, max_segments_per_session=2)
+    archive.start()
+    for _ in range(3):
+        archive.submit("phone", frame(), None)
+        time.sleep(0.002)  # One segment per millisecond timestamp
+    wait_for(lambda: archive.segments_written == 3)
+    assert len(list((tmp_path / "phone").iterdir())) == 2
+
+    archive.max_bytes = archive._bytes * 5 // 4  # Room for two segments, not three
+    archive.submit("tablet", frame(), None)
+    wait_for(lambda: archive.segments_written == 4)
+    assert len(list((tmp_path / "phone").iterdir())) + len(list((tmp_path / "tablet").iterdir())) == 2
+    assert archive._bytes == sum(path.stat().st_size for path in tmp_path.glob("*/*.npz"))
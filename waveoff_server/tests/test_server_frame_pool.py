@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from server_frame_pool import FramePool
+
+WIDTH, HEIGHT = 16, 8
+
+
+def test_reuses_released_slots():
+    pool = FramePool(WIDTH, HEIGHT, size=2)
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    pool.release(first)
+    assert pool.acquire() is first
+    assert pool.allocations == 0
+
+
+def test_allocates_when_exhausted():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    pool.acquire()
+    extra = pool.acquire()
+    assert extra.fits(WIDTH, HEIGHT)
+    assert pool.allocations == 1
+    pool.release(extra)
+    assert pool.acquire() is extra
+    assert pool.allocations == 1
+
+
+def test_other_sizes_do_not_replace_pool_slots():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    crop = pool.acquire(8, 8)
+    assert crop.fits(8, 8)
+    pool.release(crop)
+
+    full = pool.acquire()
+    assert full.fits(WIDTH, HEIGHT)  # The pool's own slot is still there
+    assert pool.acquire(8, 8) is crop  # and the crop slot is reused
+    assert pool.allocations == 1
+
+
+def test_keeps_only_recent_overflow_sizes():
+    pool = FramePool(WIDTH, HEIGHT, size=1, overflow_sizes=2)
+    for size in ((8, 8), (4, 4), (2, 2)):
+        pool.release(pool.acquire(*size))
+    allocations = pool.allocations
+    pool.acquire(8, 8)  # Forgotten: allocated again
+    assert pool.allocations == allocations + 1
+    pool.acquire(2, 2)
+    assert pool.allocations == allocations + 1
+
+
+def test_refuses_frames_larger_than_a_slot():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    with pytest.raises(ValueError):
+        pool.acquire(WIDTH + 2, HEIGHT)
+    assert pool.allocations == 0
+    assert pool.acquire(HEIGHT, WIDTH).fits(HEIGHT, WIDTH)  # Portrait frames of the same area
+
+
+def test_release_later_waits_for_both_holders():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    slot = pool.acquire()
+    session_done, worker_done = pool.release_later(slot)
+    worker_done()
+    assert pool.acquire() is not slot  # The session still records the result
+    session_done()
+    assert pool.acquire() is slot
+    assert pool.quarantined == 0
+
+
+def test_slot_quarantined_after_a_timeout():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    slot = pool.acquire()
+    session_done, worker_done = pool.release_later(slot)
+    session_done()  # Gave up while the worker still reads the frame
+    assert pool.acquire() is not slot
+    worker_done()
+    assert pool.quarantined == 1
+    assert pool.acquire() is slot
+
+
+def test_drops_slots_released_after_close():
+    pool = FramePool(WIDTH, HEIGHT, size=1)
+    slot = pool.acquire()
+    session_done, worker_done = pool.release_later(slot)
+    session_done()
+    pool.close()
+    worker_done()
+    assert not pool._free
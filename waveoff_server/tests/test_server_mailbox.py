@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from server_mailbox import AsyncLatestFrameMailbox, LatestFrameMailbox
+
+
+def test_latest_frame_wins():
+    mailbox = LatestFrameMailbox()
+    assert mailbox.put("first") is None
+    assert mailbox.put("second") == "first"  # Returned so its buffer can be released
+    assert mailbox.put("third") == "second"
+    assert mailbox.dropped == 2
+    assert mailbox.take(timeout=0) == "third"
+    assert mailbox.take(timeout=0) is None
+
+
+def test_take_waits_for_a_frame():
+    mailbox = LatestFrameMailbox()
+    threading.Timer(0.01, mailbox.put, args=("frame",)).start()
+    assert mailbox.take(timeout=5) == "frame"
+    assert mailbox.dropped == 0
+
+
+def test_close_wakes_the_processor():
+    mailbox = LatestFrameMailbox()
+    mailbox.put("frame")
+    assert mailbox.close() == "frame"  # Never taken: returned for release
+    assert mailbox.closed
+    assert mailbox.take() is None
+
+
+def test_async_latest_frame_wins():
+    async def scenario():
+        mailbox = AsyncLatestFrameMailbox()
+        mailbox.put("first")
+        assert mailbox.put("second") == "first"
+        assert await mailbox.take(timeout=1) == "second"
+        assert await mailbox.take(timeout=0.01) is None
+        asyncio.get_running_loop().call_later(0.01, mailbox.put, "third")
+        assert await mailbox.take(timeout=5) == "third"
+        mailbox.close()
+        assert await mailbox.take() is None
+        return mailbox.dropped
+
+    assert asyncio.run(scenario()) == 1
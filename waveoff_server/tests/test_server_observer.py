@@ -0,0 +1,135 @@
+import threading
+
+import pytest
+
+import server_observer
+from server_observer import Observer, QueuedSubscriber
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server_observer.time, "monotonic", clock)
+    return clock
+
+
+def observer(min_interval_ms=100, heartbeat_ms=0):
+    notifications = []
+    subject = Observer(min_interval_ms, heartbeat_ms)
+    subject.subscribe(notifications.append)
+    return subject, notifications
+
+
+def test_notifies_changes_with_the_unchanged_count(clock):
+    subject, notifications = observer(min_interval_ms=0)
+    for result in ("Open", "Open", "Open", "Close"):
+        subject.notify(result)
+    assert notifications == [{"result": "Close", "previous_result": "Open", "unchanged_count": 3}]
+
+
+def test_coalesces_changes_within_the_window(clock):
+    subject, notifications = observer(min_interval_ms=100)
+    subject.notify("Open")
+    clock.now += 0.01
+    subject.notify("Close")
+    subject.notify("Pointer")
+    assert notifications == []  # Held back until the window has passed
+    assert subject.next_tick() == pytest.approx(0.09)
+
+    clock.now += 0.09
+    subject.tick()
+    assert [n["result"] for n in notifications] == ["Pointer"]  # Only the newest change
+
+
+def test_drops_flicker_back_to_the_notified_result(clock):
+    subject, notifications = observer(min_interval_ms=100)
+    subject.notify("Open")
+    subject.notify("Close")
+    subject.notify("Open")
+    clock.now += 0.2
+    subject.tick()
+    assert notifications == []
+
+
+def test_heartbeat_while_unchanged(clock):
+    subject, notifications = observer(min_interval_ms=0, heartbeat_ms=1000)
+    subject.notify("Open")
+    clock.now += 0.5
+    subject.tick()
+    assert notifications == []
+    assert subject.next_tick() == pytest.approx(0.5)
+
+    clock.now += 0.5
+    subject.tick()
+    assert notifications == [{"type": "heartbeat", "result": "Open", "duration_ms": 1000}]
+    subject.tick()
+    assert len(notifications) == 1  # Next one a full interval later
+
+
+def test_flush_reports_the_pending_result(clock):
+    subject, notifications = observer(min_interval_ms=100)
+    subject.notify("Open")
+    subject.notify("Close")
+    subject.flush()
+    assert notifications == [{"result": None, "previous_result": "Close", "unchanged_count": 2}]
+    assert subject.next_tick() is None
+
+
+class Recorder:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self._open = threading.Event()
+        if not blocked:
+            self._open.set()
+
+    def unblock(self):
+        self._open.set()
+
+    def __call__(self, message):
+        self._open.wait(timeout=5)
+        self.sent.append(message)
+
+
+def drain(subscriber):
+    subscriber.close()
+    subscriber._thread.join(timeout=5)
+
+
+def test_posted_messages_go_ahead_of_notifications():
+    send = Recorder(blocked=True)
+    subscriber = QueuedSubscriber(send, max_queue=4)
+    subscriber("first")  # Taken by the sender, which blocks on it
+    subscriber("second")
+    subscriber.post("stats")
+    send.unblock()
+    drain(subscriber)
+    assert send.sent in (["first", "stats", "second"], ["stats", "first", "second"])
+    assert send.sent.index("stats") < send.sent.index("second")
+
+
+def test_posted_messages_are_not_coalesced_or_encoded():
+    send = Recorder(blocked=True)
+    subscriber = QueuedSubscriber(send, max_queue=2, max_overflows=10, encode=str.upper)
+    for notification in ("a", "b", "c", "d"):
+        subscriber(notification)
+    subscriber.post("control")
+    send.unblock()
+    drain(subscriber)
+    assert "control" in send.sent
+    assert subscriber.coalesced > 0
+
+
+def test_post_after_close_is_dropped():
+    send = Recorder()
+    subscriber = QueuedSubscriber(send)
+    drain(subscriber)
+    subscriber.post("late")
+    assert send.sent == []
@@ -0,0 +1,65 @@
+import pytest
+
+from constants import MAX_FRAME_HEIGHT, MAX_FRAME_WIDTH
+from server_protocol import (FRAME_HEADER_SIZE, PIXEL_FORMAT_BGR, PIXEL_FORMAT_JPEG, PIXEL_FORMAT_NV21,
+                             ROI_FULL_FRAME, ProtocolError, pack_frame_header, parse_frame)
+
+WIDTH, HEIGHT = 4, 2
+
+
+def frame(payload, pixel_format=PIXEL_FORMAT_BGR, width=WIDTH, height=HEIGHT, roi_id=ROI_FULL_FRAME):
+    return pack_frame_header(7, 1700000000123, width, height, pixel_format, roi_id) + payload
+
+
+def test_round_trip():
+    payload = bytes(range(WIDTH * HEIGHT * 3))
+    header, view = parse_frame(frame(payload, roi_id=3))
+    assert (header.sequence, header.timestamp_ms) == (7, 1700000000123)
+    assert (header.width, header.height) == (WIDTH, HEIGHT)
+    assert header.pixel_format == PIXEL_FORMAT_BGR
+    assert header.roi_id == 3
+    assert bytes(view) == payload
+
+
+def test_round_trip_nv21_and_compressed():
+    header, view = parse_frame(frame(bytes(WIDTH * HEIGHT * 3 // 2), PIXEL_FORMAT_NV21))
+    assert header.pixel_format == PIXEL_FORMAT_NV21
+    assert len(view) == WIDTH * HEIGHT * 3 // 2
+
+    # Compressed payloads have no fixed size
+    header, view = parse_frame(frame(b"\xff\xd8jpeg", PIXEL_FORMAT_JPEG))
+    assert bytes(view) == b"\xff\xd8jpeg"
+
+
+def test_rejects_bad_magic():
+    message = bytearray(frame(bytes(WIDTH * HEIGHT * 3)))
+    message[:4] = b"XXXX"
+    with pytest.raises(ProtocolError, match="magic"):
+        parse_frame(bytes(message))
+
+
+def test_rejects_short_header():
+    with pytest.raises(ProtocolError, match="too short"):
+        parse_frame(frame(b"")[:FRAME_HEADER_SIZE - 1])
+
+
+@pytest.mark.parametrize("pixel_format, size", [
+    (PIXEL_FORMAT_BGR, WIDTH * HEIGHT * 3 - 1),
+    (PIXEL_FORMAT_BGR, WIDTH * HEIGHT * 3 + 1),
+    (PIXEL_FORMAT_NV21, WIDTH * HEIGHT * 3),
+])
+def test_rejects_payload_of_the_wrong_length(pixel_format, size):
+    with pytest.raises(ProtocolError, match="Payload"):
+        parse_frame(frame(bytes(size), pixel_format))
+
+
+def test_rejects_unknown_pixel_format():
+    with pytest.raises(ProtocolError, match="pixel format"):
+        parse_frame(frame(b"", pixel_format=99))
+
+
+@pytest.mark.parametrize("width, height", [(0, HEIGHT), (WIDTH, 0), (MAX_FRAME_WIDTH + 1, HEIGHT),
+                                           (WIDTH, MAX_FRAME_HEIGHT + 1), (65535, 65535)])
+def test_rejects_frame_sizes_out_of_range(width, height):
+    with pytest.raises(ProtocolError, match="frame size"):
+        parse_frame(frame(b"\xff\xd8jpeg", PIXEL_FORMAT_JPEG, width, height))
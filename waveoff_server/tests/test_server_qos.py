@@ -0,0 +1,74 @@
+import pytest
+
+import server_qos
+from server_qos import QosController
+
+DEADLINE_S = 0.066
+MISS = 0.1      # Over the deadline
+FAST = 0.01     # Well within the headroom
+SLOW = 0.05     # Within the deadline, outside the headroom
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server_qos.time, "monotonic", clock)
+    return clock
+
+
+def controller(levels=4, window=5, hold_s=2.0):
+    return QosController(levels, DEADLINE_S, miss_ratio=0.3, headroom=0.5, window=window, hold_s=hold_s)
+
+
+def test_steps_down_after_a_window_of_misses(clock):
+    qos = controller()
+    assert not any(qos.observe(MISS) for _ in range(4))  # Window not full yet
+    assert qos.observe(MISS)
+    assert qos.level == 1
+    # The next decision waits for a full window measured at the new level
+    assert not any(qos.observe(MISS) for _ in range(4))
+    assert qos.observe(MISS)
+    assert qos.level == 2
+    assert qos.stats()["steps_down"] == 2
+
+
+def test_stays_below_the_miss_ratio(clock):
+    qos = controller()
+    assert not any(qos.observe(latency) for latency in (MISS, SLOW, SLOW, SLOW, SLOW))
+    assert qos.level == 0
+
+
+def test_stops_at_the_last_level(clock):
+    qos = controller(levels=2)
+    for _ in range(20):
+        qos.observe(MISS)
+    assert qos.level == 1
+
+
+def test_steps_up_only_after_hold(clock):
+    qos = controller()
+    for _ in range(5):
+        qos.observe(MISS)
+    assert qos.level == 1
+
+    assert not any(qos.observe(FAST) for _ in range(10))  # Headroom, but held at the level
+    clock.now += 2.0
+    assert qos.observe(FAST)
+    assert qos.level == 0
+    assert qos.stats()["steps_up"] == 1
+
+
+def test_needs_headroom_to_step_up(clock):
+    qos = controller(hold_s=0.0)
+    for _ in range(5):
+        qos.observe(MISS)
+    assert not any(qos.observe(SLOW) for _ in range(10))
+    assert qos.level == 1
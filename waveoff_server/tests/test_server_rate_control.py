@@ -0,0 +1,95 @@
+import pytest
+
+import server_rate_control
+from server_rate_control import FrameRateController
+
+HAND = {"hand_sign": "Open"}
+NO_HAND = {"hand_sign": "None"}
+FAST = 0.005    # Well within the active rate
+SLOW = 0.1      # 10 frames per second at most
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server_rate_control.time, "monotonic", clock)
+    return clock
+
+
+def controller(**kwargs):
+    return FrameRateController(256, 144, idle_fps=5, active_fps=30, min_fps=2, idle_after_s=1.0,
+                               max_queue_depth=2, headroom=0.8, overload_fps=15, overload_scale=0.5,
+                               interval_s=1.0, **kwargs)
+
+
+def test_idles_without_a_hand(clock):
+    rate = controller()
+    rate.observe(HAND, FAST)
+    assert (rate.fps, rate.changed()) == (30, False)
+
+    clock.now += 1.5
+    rate.observe(NO_HAND, FAST)
+    assert rate.idle
+    assert rate.changed()
+    assert rate.control() == {"type": "control", "fps": 5, "width": 256, "height": 144}
+
+
+def test_hand_restores_the_active_rate_at_once(clock):
+    rate = controller()
+    clock.now += 1.5
+    rate.observe(NO_HAND, FAST)
+    assert rate.fps == 5
+
+    clock.now += 0.1  # Within interval_s of the last change
+    rate.observe(HAND, FAST)
+    assert rate.fps == 30
+
+
+def test_slow_pipeline_lowers_rate_and_size(clock):
+    rate = controller()
+    for _ in range(20):
+        rate.observe(HAND, SLOW)
+    clock.now += 1.0
+    rate.observe(HAND, SLOW)
+    assert rate.fps == 8  # 10 frames per second with 0.8 headroom
+    assert rate.size == (128, 72)
+
+
+def test_not_resized_when_the_client_cannot(clock):
+    rate = controller(resizable=False)
+    for _ in range(20):
+        rate.observe(HAND, SLOW)
+    clock.now += 1.0
+    rate.observe(HAND, SLOW)
+    assert rate.fps == 8
+    assert rate.size == (256, 144)
+
+
+def test_backs_off_for_queued_frames_unless_ringing(clock):
+    rate = controller()
+    clock.now += 1.0
+    rate.observe(HAND, FAST, queue_depth=3)
+    assert rate.fps == 24
+
+    rate.set_priority(True)
+    rate.observe(HAND, FAST, queue_depth=3)
+    assert (rate.fps, rate.size) == (30, (256, 144))
+
+
+def test_poor_quality_frames(clock):
+    rate = controller(poor_quality_fps=1, poor_quality_after_s=1.0)
+    rate.observe(NO_HAND, FAST, usable=False)
+    clock.now += 1.0
+    rate.observe(NO_HAND, FAST, usable=False)
+    assert rate.fps == 1
+
+    rate.observe(HAND, FAST)  # Usable again: acted on at once
+    assert rate.fps == 30
@@ -0,0 +1,64 @@
+from server_scheduler import InferenceScheduler
+
+
+def run(scheduler, frames):
+    """
+    Grant order of queued frames, releasing each one as soon as it is granted.
+    :param frames: list of (session_id, Future).
+    """
+    order = []
+    pending = list(frames)
+    while pending:
+        granted = [(session_id, future) for session_id, future in pending if future.done()]
+        assert granted, "Nothing granted"
+        for entry in granted:
+            pending.remove(entry)
+            order.append(entry[0])
+            scheduler.release()
+    return order
+
+
+def test_shares_by_weight():
+    scheduler = InferenceScheduler(concurrency=1)
+    blocker = scheduler.acquire("blocker")
+    frames = [(session_id, scheduler.acquire(session_id, weight))
+              for _ in range(4) for session_id, weight in (("active", 2.0), ("idle", 1.0))]
+    assert not any(future.done() for _, future in frames)
+    assert blocker.done()
+    scheduler.release()
+    order = run(scheduler, frames)
+    assert order[:3].count("active") == 2  # Twice the share while both have frames waiting
+
+
+def test_priority_goes_first():
+    scheduler = InferenceScheduler(concurrency=1)
+    scheduler.acquire("other")
+    frames = [("other", scheduler.acquire("other")), ("ringing", scheduler.acquire("ringing", priority=True))]
+    scheduler.release()
+    assert run(scheduler, frames) == ["ringing", "other"]
+    assert scheduler.stats()["granted_priority"] == 1
+
+
+def test_ringing_does_not_use_up_the_fair_share():
+    scheduler = InferenceScheduler(concurrency=1)
+    for _ in range(5):
+        scheduler.acquire("phone", priority=True)
+        scheduler.release()
+    scheduler.acquire("blocker")
+    frames = [("phone", scheduler.acquire("phone")), ("other", scheduler.acquire("other"))]
+    scheduler.release()
+    # Once it stops ringing, the phone queues like a session that never rang
+    assert run(scheduler, frames) == ["phone", "other"]
+
+
+def test_cancelled_frames_are_not_waiting():
+    scheduler = InferenceScheduler(concurrency=1)
+    scheduler.acquire("a")
+    waiting = scheduler.acquire("b")
+    scheduler.acquire("c")
+    assert scheduler.waiting() == 2
+    assert waiting.cancel()
+    assert scheduler.waiting() == 1
+    assert scheduler.stats()["waiting"] == 1
+    scheduler.release()
+    assert scheduler.waiting() == 0
@@ -1,2 +1,4 @@
 from utils.cvfpscalc import CvFpsCalc
-from utils.pre_processing import pre_process_landmark, pre_process_point_history
\ No newline at end of file
+from utils.pre_processing import pre_process_landmark, pre_process_point_history
+from utils.motion_gate import MotionGate
+from utils.quality_gate import QualityGate
\ No newline at end of file
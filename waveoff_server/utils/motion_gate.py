@@ -0,0 +1,96 @@
+import cv2 as cv
+import numpy as np
+
+from constants import (MOTION_GATE_CHANGED_FRACTION, MOTION_GATE_ENABLED, MOTION_GATE_MAX_SKIPS,
+                       MOTION_GATE_PIXEL_THRESHOLD, MOTION_GATE_THUMB_SIZE)
+
+
+class MotionGate(object):
+    def __init__(self, thumb_size=(32, 18), pixel_threshold=12, changed_fraction=0.01, max_skips=10):
+        """
+        Cheap check whether a frame differs enough from the last processed frame to be
+        worth running Mediapipe on. Frames are compared as tiny grayscale thumbnails.
+
+        Args:
+            thumb_size (tuple): (width, height) of the thumbnails.
+            pixel_threshold (int): Gray level difference at which a thumbnail pixel counts as changed.
+            changed_fraction (float): Fraction of changed pixels at which a frame counts as moving.
+            max_skips (int): Consecutive static frames after which a frame is processed anyway,
+                so a result can never get stuck.
+        """
+        self.thumb_size = thumb_size
+        self.pixel_threshold = pixel_threshold
+        self.changed_pixels = max(1, int(thumb_size[0] * thumb_size[1] * changed_fraction))
+        self.max_skips = max_skips
+
+        self._small = None  # Downscaled color frame
+        self._thumb = np.empty((thumb_size[1], thumb_size[0]), dtype=np.uint8)
+        self._reference = np.empty_like(self._thumb)  # Thumbnail of the last processed frame
+        self._diff = np.empty_like(self._thumb)
+        self._has_reference = False
+        self._skips = 0
+
+        self.frames = 0
+        self.skipped = 0
+        self.forced = 0
+
+    @property
+    def skip_rate(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def is_static(self, image, is_rgb=False):
+        """
+        Compares a frame with the last processed one. Frames that are not static become
+        the new reference.
+
+        Args:
+            image (np.ndarray): Frame, BGR or RGB.
+            is_rgb (bool): True if the frame is RGB.
+
+        Returns:
+            bool: True if the previous result can be reused for this frame.
+        """
+        self.frames += 1
+        self._small = cv.resize(image, self.thumb_size, dst=self._small, interpolation=cv.INTER_AREA)
+        cv.cvtColor(self._small, cv.COLOR_RGB2GRAY if is_rgb else cv.COLOR_BGR2GRAY, dst=self._thumb)
+
+        if self._has_reference and self._skips < self.max_skips:
+            cv.absdiff(self._thumb, self._reference, dst=self._diff)
+            if np.count_nonzero(self._diff > self.pixel_threshold) < self.changed_pixels:
+                self._skips += 1
+                self.skipped += 1
+                return True
+        elif self._has_reference:
+            self.forced += 1
+
+        self._thumb, self._reference = self._reference, self._thumb
+        self._has_reference = True
+        self._skips = 0
+        return False
+
+    def reset(self):
+        self._has_reference = False
+        self._skips = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Frames checked, skipped and force-refreshed, and the skip rate.
+        """
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "forced": self.forced,
+            "skip_rate": round(self.skip_rate, 3),
+        }
+
+
+def create_motion_gate():
+    """
+    Returns:
+        MotionGate: Gate configured from constants.py, or None if disabled.
+    """
+    if not MOTION_GATE_ENABLED:
+        return None
+    return MotionGate(MOTION_GATE_THUMB_SIZE, MOTION_GATE_PIXEL_THRESHOLD,
+                      MOTION_GATE_CHANGED_FRACTION, MOTION_GATE_MAX_SKIPS)
@@ -9,12 +9,13 @@ def pre_process_landmark(landmark_list):
     return [v / max_value for v in flattened]
 
 
-def pre_process_point_history(image, point_history):
+def pre_process_point_history(image, point_history, frame_size=None):
     if not point_history or len(point_history) == 0:
         print("RAHMANIA - Point history is empty.")
         return []
 
-    image_width, image_height = image.shape[1], image.shape[0]
+    # Points are in full frame coordinates, also when only a crop of the frame was processed
+    image_width, image_height = frame_size or (image.shape[1], image.shape[0])
     base_x, base_y = point_history[0]
     normalized_history = [(float(x - base_x) / image_width, float(y - base_y) / image_height)
                           for x, y in point_history]
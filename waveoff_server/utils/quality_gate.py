@@ -0,0 +1,93 @@
+import cv2 as cv
+import numpy as np
+
+from constants import (QUALITY_GATE_ENABLED, QUALITY_MAX_LUMINANCE, QUALITY_MIN_CONTRAST,
+                       QUALITY_MIN_LUMINANCE, QUALITY_MIN_SHARPNESS, QUALITY_THUMB_SIZE)
+
+# Reasons a frame cannot contain a usable hand
+DARK = "dark"
+BRIGHT = "bright"
+FLAT = "flat"
+BLURRED = "blurred"
+
+
+class QualityGate(object):
+    def __init__(self, thumb_size=(128, 72), min_luminance=25, max_luminance=250, min_contrast=8.0,
+                 min_sharpness=20.0):
+        """
+        Rejects frames that cannot contain a hand (phone in a pocket, face down, covered
+        or shaking) before palm detection runs on them. Works on a downsampled grayscale
+        frame: mean luminance and standard deviation, and the variance of its Laplacian
+        as blur score.
+
+        Args:
+            thumb_size (tuple): (width, height) the frame is downsampled to.
+            min_luminance (int): Mean gray level below which a frame is too dark.
+            max_luminance (int): Mean gray level above which a frame is washed out.
+            min_contrast (float): Gray level standard deviation below which a frame is flat.
+            min_sharpness (float): Laplacian variance below which a frame is too blurred.
+        """
+        self.thumb_size = thumb_size
+        self.min_luminance = min_luminance
+        self.max_luminance = max_luminance
+        self.min_contrast = min_contrast
+        self.min_sharpness = min_sharpness
+
+        self._small = None
+        self._gray = np.empty((thumb_size[1], thumb_size[0]), dtype=np.uint8)
+        self._laplacian = np.empty((thumb_size[1], thumb_size[0]), dtype=np.int16)
+
+        self.last_reason = None  # Why the last frame was rejected, None if it was usable
+        self.frames = 0
+        self.rejected = {DARK: 0, BRIGHT: 0, FLAT: 0, BLURRED: 0}
+
+    def check(self, image, is_rgb=False):
+        """
+        Args:
+            image (np.ndarray): Frame, BGR or RGB.
+            is_rgb (bool): True if the frame is RGB.
+
+        Returns:
+            str: Why the frame cannot contain a hand (DARK, BRIGHT, FLAT or BLURRED),
+                or None if it is usable.
+        """
+        self.frames += 1
+        self._small = cv.resize(image, self.thumb_size, dst=self._small, interpolation=cv.INTER_AREA)
+        cv.cvtColor(self._small, cv.COLOR_RGB2GRAY if is_rgb else cv.COLOR_BGR2GRAY, dst=self._gray)
+
+        mean, std = cv.meanStdDev(self._gray)
+        reason = None
+        if mean[0, 0] < self.min_luminance:
+            reason = DARK
+        elif mean[0, 0] > self.max_luminance:
+            reason = BRIGHT
+        elif std[0, 0] < self.min_contrast:
+            reason = FLAT
+        else:
+            cv.Laplacian(self._gray, cv.CV_16S, dst=self._laplacian)
+            _, sharpness = cv.meanStdDev(self._laplacian)
+            if sharpness[0, 0] ** 2 < self.min_sharpness:
+                reason = BLURRED
+
+        if reason is not None:
+            self.rejected[reason] += 1
+        self.last_reason = reason
+        return reason
+
+    def stats(self):
+        """
+        Returns:
+            dict: Frames checked and rejected per reason.
+        """
+        return {"frames": self.frames, "rejected": dict(self.rejected)}
+
+
+def create_quality_gate():
+    """
+    Returns:
+        QualityGate: Gate configured from constants.py, or None if disabled.
+    """
+    if not QUALITY_GATE_ENABLED:
+        return None
+    return QualityGate(QUALITY_THUMB_SIZE, QUALITY_MIN_LUMINANCE, QUALITY_MAX_LUMINANCE,
+                       QUALITY_MIN_CONTRAST, QUALITY_MIN_SHARPNESS)